@@ -0,0 +1,117 @@
+""" Micro-benchmark: per-operation latency with a fresh connection per call vs. the shared Database
+
+    python bench_db.py [--rows 20000] [--repeat 300]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+import finance_db
+from finance_db import Database, init_db, get_categories, insert_transaction, bulk_insert
+
+INSERT_SQL = "INSERT INTO tranzactii (data,tip,categorie,suma,descriere) VALUES (?,?,?,?,?)"
+SUMMARY_SQL = ("SELECT COUNT(*), SUM(CASE WHEN tip=0 THEN bani END), SUM(CASE WHEN tip=0 THEN NULL ELSE bani END) "
+               "FROM operatiuni WHERE zi BETWEEN ? AND ?")
+PAGE_SQL = "SELECT id,data,tip,categorie,suma,descriere FROM tranzactii ORDER BY zi DESC, id DESC LIMIT 100"
+ROW_SQL = "SELECT id,data,tip,categorie,suma,descriere FROM tranzactii WHERE id=?"
+
+def fill(path, rows, pragmas=None):
+    db = Database(path, pragmas)
+    init_db(db)
+    rnd = random.Random(42)
+    cats = [c for c, _ in finance_db.DEFAULT_CATEGORIES]
+    start = date.today() - timedelta(days=3 * 365)
+    bulk_insert([(str(start + timedelta(days=rnd.randrange(3 * 365))), rnd.choice(["Venit", "Cheltuială"]),
+                  rnd.choice(cats), round(rnd.uniform(1, 500), 2), "bench") for _ in range(rows)], db=db)
+    db.close()
+
+# --- înainte: o conexiune nouă pentru fiecare operație, ca în versiunea inițială ---
+def old_ops(path, rows):
+    def connect():
+        return sqlite3.connect(path)
+
+    def get_cats():
+        conn = connect()
+        r = [x[0] for x in conn.execute('SELECT nume FROM categorii WHERE tip=? AND nume IS NOT NULL ORDER BY nume', (1,))]
+        conn.close()
+        return r
+
+    def add_tx():
+        conn = connect()
+        conn.execute('INSERT OR IGNORE INTO categorii (nume,tip) VALUES (?,?)', ("Mâncare", 1))
+        conn.commit()
+        conn.close()
+        conn = connect()
+        conn.execute(INSERT_SQL, (str(date.today()), "Cheltuială", "Mâncare", 12.5, "bench"))
+        conn.commit()
+        conn.close()
+
+    def query(sql, params=()):
+        def run():
+            conn = connect()
+            r = conn.execute(sql, params).fetchall()
+            conn.close()
+            return r
+        return run
+
+    return make_ops(get_cats, add_tx, query, rows)
+
+# --- după: conexiunea persistentă din finance_db ---
+def new_ops(db, rows):
+    def add_tx():
+        insert_transaction(str(date.today()), "Cheltuială", "Mâncare", 12.5, "bench", db=db)
+
+    def query(sql, params=()):
+        return lambda: db.fetchall(sql, params)
+
+    return make_ops(lambda: get_categories("Cheltuială", db=db), add_tx, query, rows)
+
+def make_ops(get_cats, add_tx, query, rows):
+    today = date.today()
+    month = (today.replace(day=1).toordinal(), today.toordinal())
+    rnd = random.Random(7)
+    return {
+        "get_categories": get_cats,
+        "add_transaction": add_tx,
+        "period_summary": query(SUMMARY_SQL, month),
+        "first_page": query(PAGE_SQL),
+        "get_transaction": lambda: query(ROW_SQL, (rnd.randint(1, rows),))(),
+    }
+
+def timeit(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return times[len(times) // 2], sum(times) / len(times)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=300)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_path = os.path.join(tmp, "before.db")
+        after_path = os.path.join(tmp, "after.db")
+        fill(before_path, args.rows, pragmas={})
+        fill(after_path, args.rows)
+        db = Database(after_path)
+        before = old_ops(before_path, args.rows)
+        after = new_ops(db, args.rows)
+
+        print(f"{'operație':<18}{'înainte (µs)':>16}{'după (µs)':>14}{'x':>8}")
+        for name in before:
+            b_med, _ = timeit(before[name], args.repeat)
+            a_med, _ = timeit(after[name], args.repeat)
+            print(f"{name:<18}{b_med * 1e6:>16.1f}{a_med * 1e6:>14.1f}{b_med / a_med:>8.1f}")
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+""" Benchmark: the original text/REAL layout vs. the normalized schema (migration v2), on the same data
+
+    python bench_schema.py [--rows 200000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+import finance_db
+from finance_db import Database, init_db, category_clause
+
+# layout-ul dinaintea migrării v2, cu indecșii lui
+LEGACY_SCHEMA = [
+    "CREATE TABLE tranzactii (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT, tip TEXT, categorie TEXT, suma REAL, descriere TEXT)",
+    "CREATE TABLE categorii (id INTEGER PRIMARY KEY AUTOINCREMENT, nume TEXT UNIQUE, tip TEXT)",
+    "CREATE INDEX idx_tranzactii_data ON tranzactii(data)",
+    "CREATE INDEX idx_tranzactii_categorie_data ON tranzactii(categorie, data)",
+]
+DAYS = 5 * 365
+
+def fill_legacy(path, rows):
+    conn = sqlite3.connect(path)
+    for sql in LEGACY_SCHEMA:
+        conn.execute(sql)
+    conn.executemany("INSERT INTO categorii (nume, tip) VALUES (?,?)", finance_db.DEFAULT_CATEGORIES)
+    rnd = random.Random(42)
+    cats = [c for c, _ in finance_db.DEFAULT_CATEGORIES]
+    start = date.today() - timedelta(days=DAYS)
+    conn.executemany("INSERT INTO tranzactii (data,tip,categorie,suma,descriere) VALUES (?,?,?,?,?)",
+                     ((str(start + timedelta(days=rnd.randrange(DAYS))), rnd.choice(["Venit", "Cheltuială"]),
+                       rnd.choice(cats), round(rnd.uniform(1, 500), 2), "bench") for _ in range(rows)))
+    conn.commit()
+    conn.close()
+
+def vacuumed_size(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path)
+
+def rolled_back(conn, statements):
+    """ Run write statements and undo them, so every repetition starts from the same data """
+    def run():
+        conn.execute("BEGIN")
+        for sql, params in statements:
+            conn.execute(sql, params)
+        conn.execute("ROLLBACK")
+    return run
+
+def query(conn, sql, params=()):
+    return lambda: conn.execute(sql, params).fetchall()
+
+def legacy_ops(conn):
+    today = date.today()
+    month = (str(today.replace(day=1) - timedelta(days=90)), str(today))
+    return {
+        "pagina_perioada": query(conn, "SELECT id,data,tip,categorie,suma,descriere FROM tranzactii WHERE data BETWEEN ? AND ? "
+                                       "ORDER BY data DESC, id DESC LIMIT 100", month),
+        "suma_perioada": query(conn, "SELECT COUNT(*), SUM(suma) FROM tranzactii WHERE data BETWEEN ? AND ?", month),
+        "filtru_categorie": query(conn, "SELECT COUNT(*), SUM(suma) FROM tranzactii WHERE categorie = ?", ("Mâncare",)),
+        "balanta": query(conn, "SELECT SUM(CASE WHEN tip='Venit' THEN suma ELSE -suma END) FROM tranzactii"),
+        "sterge_categorie": rolled_back(conn, [("UPDATE tranzactii SET categorie='Altele' WHERE categorie=?", ("Transport",)),
+                                               ("DELETE FROM categorii WHERE nume=?", ("Transport",))]),
+        "redenumeste_categorie": rolled_back(conn, [("UPDATE tranzactii SET categorie=? WHERE categorie=?", ("Drumuri", "Transport")),
+                                                    ("UPDATE categorii SET nume=? WHERE nume=?", ("Drumuri", "Transport"))]),
+    }
+
+def normalized_ops(db):
+    conn = db.conn
+    today = date.today()
+    month = ((today.replace(day=1) - timedelta(days=90)).toordinal(), today.toordinal())
+    cat, cat_params = category_clause("Mâncare", db)
+    other, transport = db.categories.id_of("Altele"), db.categories.id_of("Transport")
+    return {
+        "pagina_perioada": query(conn, "SELECT id,data,tip,categorie,suma,descriere FROM tranzactii WHERE zi BETWEEN ? AND ? "
+                                       "ORDER BY zi DESC, id DESC LIMIT 100", month),
+        "suma_perioada": query(conn, "SELECT COUNT(*), SUM(bani) FROM operatiuni WHERE zi BETWEEN ? AND ?", month),
+        "filtru_categorie": query(conn, f"SELECT COUNT(*), SUM(bani) FROM operatiuni WHERE {cat}", cat_params),
+        "balanta": query(conn, "SELECT SUM(CASE WHEN tip=0 THEN bani ELSE -bani END) FROM operatiuni"),
+        "sterge_categorie": rolled_back(conn, [("UPDATE categorii SET nume=NULL, mutata_in=? WHERE id=?", (other, transport))]),
+        "redenumeste_categorie": rolled_back(conn, [("UPDATE categorii SET nume=? WHERE id=?", ("Drumuri", transport))]),
+    }
+
+def timeit(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return times[len(times) // 2]
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=200000)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        normalized_path = os.path.join(tmp, "normalized.db")
+        fill_legacy(legacy_path, args.rows)
+        shutil.copy(legacy_path, normalized_path)
+        t0 = time.perf_counter()
+        db = Database(normalized_path, pragmas={})
+        init_db(db)
+        migrate_s = time.perf_counter() - t0
+        db.close()
+        legacy_size, normalized_size = vacuumed_size(legacy_path), vacuumed_size(normalized_path)
+        print(f"{args.rows} rânduri, migrare în {migrate_s:.2f} s")
+        print(f"dimensiune fișier: {legacy_size / 1e6:.2f} MB -> {normalized_size / 1e6:.2f} MB "
+              f"({normalized_size / legacy_size:.0%}, include tabelele de totaluri)")
+
+        legacy = sqlite3.connect(legacy_path, isolation_level=None)
+        db = Database(normalized_path, pragmas={})
+        before, after = legacy_ops(legacy), normalized_ops(db)
+        print(f"{'operație':<24}{'text (ms)':>12}{'întregi (ms)':>15}{'x':>8}")
+        for name in before:
+            b = timeit(before[name], args.repeat)
+            a = timeit(after[name], args.repeat)
+            print(f"{name:<24}{b * 1e3:>12.2f}{a * 1e3:>15.2f}{b / a:>8.1f}")
+        legacy.close()
+        db.close()
+
+if __name__ == "__main__":
+    main()
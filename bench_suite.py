@@ -0,0 +1,339 @@
+""" Benchmark suite over deterministic synthetic ledgers, with results saved as JSON
+
+    python bench_suite.py [--sizes 10000,100000,1000000] [--repeat 5] [--ledgers 24] [--out bench_results.json] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import finance_analytics
+import finance_backup
+import finance_io
+from finance_consolidate import consolidate, consolidated_page
+from finance_core import (get_db, use_database, init_db, get_categories, delete_category, delete_transactions, undo_delete, last_deleted,
+                          PERIOD_OPTIONS, build_filter, filter_bounds, filter_totals, summary_args, fetch_page, seek_key, balance, trend_report,
+                          DEFAULT_SORT)
+from finance_db import bulk_insert, add_category, closed_years, archive_year
+from finance_trace import tracer
+
+SEED = 42
+END_DATE = date(2025, 6, 30)      # fix, ca perioadele ("Luna curentă" etc.) să acopere aceleași rânduri la fiecare rulare
+YEARS = 5
+PAGE_LIMIT = 150                  # rândurile cerute de refresh_data: fereastra vizibilă + 2 * VirtualTree.BUFFER
+CUSTOM_RANGE = (date(2024, 3, 15), date(2024, 9, 14))
+CONSOLIDATE_ROWS = 20000          # tranzacții în fiecare registru al consolidării
+
+# -------------------- GENERATOR --------------------
+# cheltuieli: (categorie, pondere, mediana sumei în RON, descrieri)
+EXPENSES = [
+    ("Mâncare", 40, 45, ["Lidl", "Kaufland", "Mega Image", "piață", "restaurant", "livrare"]),
+    ("Transport", 18, 30, ["benzină", "bilet metrou", "taxi", "parcare", "abonament STB"]),
+    ("Facturi", 8, 180, ["curent", "gaz", "internet", "telefon", "întreținere"]),
+    ("Divertisment", 14, 60, ["cinema", "concert", "streaming", "carte", "jocuri"]),
+    ("Sănătate", 8, 90, ["farmacie", "analize", "stomatolog", "consultație"]),
+    ("Altele", 12, 70, ["cadou", "haine", "casă", "diverse"]),
+]
+INCOME = [
+    ("Investiții", 6, 400, ["dividende", "dobândă depozit", "vânzare acțiuni"]),
+    ("Cadouri", 4, 250, ["aniversare", "sărbători"]),
+]
+
+def generate_rows(rows, seed=SEED, end=END_DATE, years=YEARS):
+    """ Deterministic (data, tip, categorie, suma, descriere) rows in date order: a monthly salary
+    plus weighted everyday expenses and occasional income, amounts log-normal around each category's median """
+    rnd = random.Random(seed)
+    start = end.replace(year=end.year - years) + timedelta(days=1)
+    days = (end - start).days + 1
+    out = []
+    d = start.replace(day=10) if start.day <= 10 else (start.replace(day=28) + timedelta(days=4)).replace(day=10)
+    while d <= end and len(out) < rows:
+        out.append((d.isoformat(), "Venit", "Salariu", round(rnd.gauss(6500, 250), 2), "salariu"))
+        d = (d.replace(day=28) + timedelta(days=4)).replace(day=10)
+    kinds = [("Cheltuială",) + e for e in EXPENSES] + [("Venit",) + i for i in INCOME]
+    weights = [k[2] for k in kinds]
+    for kind in rnd.choices(kinds, weights, k=rows - len(out)):
+        tip, categorie, _, median, descrieri = kind
+        day = start + timedelta(days=rnd.randrange(days))
+        suma = round(min(median * rnd.lognormvariate(0, 0.6), median * 20), 2)
+        out.append((day.isoformat(), tip, categorie, suma, rnd.choice(descrieri)))
+    out.sort(key=lambda r: r[0])
+    return out
+
+def generate_ledger(path, rows, seed=SEED):
+    """ Create a finante.db-compatible file at path with `rows` transactions """
+    db = use_database(path)
+    init_db(db)
+    data = generate_rows(rows, seed)
+    for categorie, tip in {(r[2], r[1]) for r in data}:
+        add_category(categorie, tip, db=db)
+    for i in range(0, len(data), 100000):
+        bulk_insert(data[i:i + 100000], db=db)
+    db.close()
+
+def ledger(data_dir, rows, seed=SEED):
+    """ Path of the cached ledger for (rows, seed), generated on first use """
+    path = os.path.join(data_dir, f"ledger_{rows}_{seed}.db")
+    if not os.path.exists(path):
+        t0 = time.perf_counter()
+        generate_ledger(path + ".tmp", rows, seed)
+        os.replace(path + ".tmp", path)
+        print(f"  generat {path} în {time.perf_counter() - t0:.1f} s")
+    return path
+
+# -------------------- MEASUREMENT --------------------
+def measure(fn, repeat, setup=None):
+    """ Timings in ms of fn(); setup() runs untimed before each call and its result is passed to fn """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        t0 = time.perf_counter()
+        fn(arg) if setup else fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return {"median_ms": times[len(times) // 2], "min_ms": times[0], "mean_ms": sum(times) / len(times), "repeat": repeat}
+
+def refresh(period, category, search="", sort=DEFAULT_SORT):
+    """ The work refresh_data does on its worker: the filter, the totals and the first page """
+    where, params = build_filter(period, category, *CUSTOM_RANGE, today=END_DATE, search=search)
+    totals = filter_totals(period, category, *CUSTOM_RANGE, today=END_DATE, search=search)
+    return totals, fetch_page(where, params, limit=PAGE_LIMIT, bounds=filter_bounds(period, *CUSTOM_RANGE, END_DATE),
+                              sort=sort)
+
+def scroll_jump(offset, sort=DEFAULT_SORT):
+    """ A scrollbar drag: the row at offset, then the page starting there """
+    return fetch_page("", [], seek_key("", [], offset, sort=sort), "from", PAGE_LIMIT, sort=sort)
+
+def paging_while(work):
+    """ Run work on a thread while this thread keeps reading pages, like the UI during a background job;
+    returns the page read times (ms) """
+    done = []
+    worker = threading.Thread(target=lambda: done.append(work()))
+    worker.start()
+    times = []
+    while worker.is_alive():
+        t0 = time.perf_counter()
+        fetch_page("", [], limit=PAGE_LIMIT)
+        times.append((time.perf_counter() - t0) * 1000)
+        time.sleep(0.01)
+    worker.join()
+    return times
+
+def tree_values(rows):
+    """ VirtualTree.render's data preparation, without Tk """
+    return [(tid, data, tip, cat, f"{suma:.2f}", desc or "") for tid, data, tip, cat, suma, desc in rows]
+
+def tree_insert(rows):
+    """ (fill, root): fill() puts rows into a real ttk.Treeview; needs a display (e.g. Xvfb), else (None, None) """
+    try:
+        import tkinter
+        from tkinter import ttk
+        root = tkinter.Tk()
+    except Exception:
+        return None, None
+    tree = ttk.Treeview(root, columns=("id", "data", "tip", "categorie", "suma", "descriere"), show="headings")
+    values = tree_values(rows)
+
+    def fill():
+        tree.delete(*tree.get_children())
+        for v in values:
+            tree.insert("", "end", iid=str(v[0]), values=v)
+        root.update_idletasks()
+    return fill, root
+
+def run_size(path, repeat, tmp):
+    results = {}
+
+    def add(name, stats, **extra):
+        stats.update(extra)
+        results[name] = stats
+        print(f"  {name:<40}{stats['median_ms']:>12.2f} ms")
+
+    db = use_database(path)
+    init_db(db)     # registrele generate de o versiune mai veche se migrează la schema curentă
+    # citirile
+    for period in PERIOD_OPTIONS:
+        for category in ("Toate", "Mâncare"):
+            add(f"refresh[{period}|{category}]", measure(lambda: refresh(period, category), repeat))
+    # căutare: un cuvânt rar (salariul lunar), unul frecvent, unul care e și nume de categorie
+    for search in ("salariu", "lidl", "mâncare"):
+        for period in ("Toate", "Luna curentă"):
+            add(f"search[{search}|{period}]", measure(lambda: refresh(period, "Toate", search), repeat))
+    # același refresh cu măsurătorile pornite: costul instrumentării
+    tracer.enable()
+    add("refresh[Toate|Toate|trace]", measure(lambda: refresh("Toate", "Toate"), repeat))
+    tracer.disable()
+    tracer.reset()
+    total = db.fetchone("SELECT COUNT(*) FROM operatiuni")[0]
+    add("scroll_jump[mijloc]", measure(lambda: scroll_jump(total // 2), repeat))
+    # sortarea după o coloană din antet: prima pagină și saltul la mijloc
+    for sort in (("suma", True), ("descriere", False), ("categorie", False)):
+        add(f"refresh[Toate|Toate|{sort[0]}]", measure(lambda: refresh("Toate", "Toate", sort=sort), repeat))
+        add(f"scroll_jump[mijloc|{sort[0]}]", measure(lambda: scroll_jump(total // 2, sort), repeat))
+    add("balance[Toate]", measure(lambda: balance("Toate", db=db), repeat))
+    add("balance[2025]", measure(lambda: balance("Custom", "Toate", date(2025, 1, 1), END_DATE, db=db), repeat))
+    for period in ("Toate", "Anul curent"):
+        start, end, _ = summary_args(period, today=END_DATE)
+        add(f"report[{period}|calculat]", measure(lambda: finance_analytics.build_report(start, end, END_DATE, db), repeat))
+        add(f"report[{period}|cache]", measure(lambda: trend_report(period, today=END_DATE, db=db), repeat))
+    add("get_categories[rece]", measure(lambda _: get_categories(), repeat, setup=db.categories.invalidate))
+    add("get_categories[cald]", measure(get_categories, repeat))
+    page = fetch_page("", [], limit=PAGE_LIMIT)
+    add("tree_values[pagina]", measure(lambda: tree_values(page), repeat))
+    fill, root = tree_insert(page)
+    if fill:
+        add("tree_insert[pagina]", measure(fill, repeat))
+        root.destroy()
+    else:
+        results["tree_insert[pagina]"] = {"skipped": "fără display (rulați sub Xvfb pentru Treeview)"}
+    out = os.path.join(tmp, "export.csv")
+    add("export_csv[toate]", measure(lambda: finance_io.export_csv(out, db=db), max(1, repeat // 2)), rows=total)
+
+    # pornirea aplicației fără Tk: conexiune nouă, init_db pe un fișier la zi, categoriile, jurnalul, prima pagină
+    def cold_start():
+        fresh = use_database(path)
+        init_db(fresh)
+        fresh.categories.names()
+        last_deleted(fresh)
+        return fetch_page("", [], limit=PAGE_LIMIT)
+    add("startup[init_db+prima pagină]", measure(cold_start, repeat))
+    get_db().close()
+
+    # scrierile rulează pe o copie proaspătă la fiecare repetare
+    def fresh_copy():
+        copy = os.path.join(tmp, "copy.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(copy + suffix):
+                os.remove(copy + suffix)
+        shutil.copy(path, copy)
+        return use_database(copy)
+
+    for n in (1000, 10000):
+        n = min(n, total // 2)
+
+        def select_newest(n=n):
+            copy = fresh_copy()
+            return [r[0] for r in copy.fetchall("SELECT id FROM operatiuni ORDER BY zi DESC, id DESC LIMIT ?", (n,))]
+        add(f"delete_selected[{n}]", measure(lambda ids: delete_transactions(ids), max(1, repeat // 2), setup=select_newest))
+
+        def deleted_newest(n=n):
+            delete_transactions(select_newest(n))
+        add(f"undo_delete[{n}]", measure(lambda _: undo_delete(), max(1, repeat // 2), setup=deleted_newest))
+
+    def warm_copy():
+        fresh_copy().categories.names()
+    add("delete_category[Transport]", measure(lambda _: delete_category("Transport"), max(1, repeat // 2), setup=warm_copy))
+
+    # anii încheiați mutați în arhive: citirile trebuie să rămână apropiate de cele fără arhive
+    def archive_all(_):
+        return sum(archive_year(an, today=END_DATE) for an in closed_years(today=END_DATE))
+    add("archive[ani încheiați]", measure(archive_all, 1, setup=lambda: fresh_copy()))
+    for period in ("Toate", "Anul curent", "Custom"):
+        add(f"refresh[{period}|Toate|arhive]", measure(lambda: refresh(period, "Toate"), repeat))
+    add("search[lidl|Toate|arhive]", measure(lambda: refresh("Toate", "Toate", "lidl"), repeat))
+    add("scroll_jump[mijloc|arhive]", measure(lambda: scroll_jump(total // 2), repeat))
+    add("refresh[Toate|Toate|suma|arhive]", measure(lambda: refresh("Toate", "Toate", sort=("suma", True)), repeat))
+    add("scroll_jump[mijloc|suma|arhive]", measure(lambda: scroll_jump(total // 2, ("suma", True)), repeat))
+    add("export_csv[toate|arhive]", measure(lambda: finance_io.export_csv(out, db=get_db()), max(1, repeat // 2)), rows=total)
+    # copia de siguranță online (fișierul principal și arhivele): durata și cât întârzie citirile din interfață
+    folder = os.path.join(tmp, "backups")
+    pages = {"fără backup": paging_while(lambda: time.sleep(0.5))}
+    for label, compress in (("online", False), ("gzip", True)):
+        pages[label] = []
+        add(f"backup[{label}]", measure(lambda: pages[label].extend(
+            paging_while(lambda: finance_backup.backup(folder, compress, keep=1, db=get_db()))), max(1, repeat // 2)))
+    for label, times in pages.items():
+        times.sort()
+        add(f"page_during_backup[{label}|max]", {"median_ms": times[-1], "min_ms": times[0],
+                                                  "mean_ms": sum(times) / len(times), "repeat": len(times)})
+    snapshot = finance_backup.list_backups(folder)[0]["folder"]
+    # restaurarea scrie și arhivele lângă fișierul țintă: alt folder decât cel al copiei de lucru
+    os.makedirs(os.path.join(tmp, "restaurare"), exist_ok=True)
+    add("restore[verificat]", measure(lambda: finance_backup.restore(snapshot, os.path.join(tmp, "restaurare", "copy.db")), 1))
+    get_db().close()
+    use_database(path).close()
+    return results
+
+def run_consolidation(data_dir, ledgers, repeat):
+    """ The same totals over many ledgers (one seed each), in one process and in one process per core """
+    results = {}
+
+    def add(name, stats, **extra):
+        stats.update(extra)
+        results[name] = stats
+        print(f"  {name:<40}{stats['median_ms']:>12.2f} ms")
+
+    paths = [ledger(data_dir, CONSOLIDATE_ROWS, SEED + i) for i in range(ledgers)]
+    cores = os.cpu_count() or 1
+    # fără căutare fiecare registru citește tabelele de totaluri; cu o căutare, indexul FTS și rândurile găsite
+    for search in ("", "lidl"):
+        for workers in sorted({1, cores}):
+            add(f"consolidate[{search or 'totaluri'}|{workers} proc]",
+                measure(lambda: consolidate(paths, search=search, today=END_DATE, workers=workers), repeat),
+                ledgers=ledgers, workers=workers)
+    add("consolidated_page[prima pagină]",
+        measure(lambda: consolidated_page(paths, today=END_DATE, limit=PAGE_LIMIT, workers=cores), repeat),
+        ledgers=ledgers, workers=cores)
+    return results
+
+# -------------------- REPORT --------------------
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(), "seed": SEED}
+
+def compare(old, new):
+    """ Print median ratios new/old for every benchmark present in both runs """
+    print(f"\n{'rânduri':>9}  {'benchmark':<40}{'înainte':>12}{'acum':>12}{'raport':>9}")
+    for size, benches in new["results"].items():
+        for name, stats in benches.items():
+            prev = old.get("results", {}).get(size, {}).get(name)
+            if prev and "median_ms" in prev and "median_ms" in stats:
+                ratio = stats["median_ms"] / prev["median_ms"] if prev["median_ms"] else float("inf")
+                flag = "  <-- mai lent" if ratio > 1.25 else ""
+                print(f"{size:>9}  {name:<40}{prev['median_ms']:>12.2f}{stats['median_ms']:>12.2f}{ratio:>9.2f}{flag}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="10000,100000,1000000", help="numărul de tranzacții, separate prin virgulă")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "finante_bench"),
+                    help="unde se păstrează registrele generate între rulări")
+    ap.add_argument("--ledgers", type=int, default=24, help=f"registre de câte {CONSOLIDATE_ROWS} tranzacții pentru consolidare (0 = fără)")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--compare", help="un fișier JSON dintr-o rulare anterioară")
+    args = ap.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = {"environment": environment(), "results": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in (int(s) for s in args.sizes.split(",")):
+            print(f"{rows} tranzacții")
+            report["results"][str(rows)] = run_size(ledger(args.data_dir, rows), args.repeat, tmp)
+    if args.ledgers:
+        print(f"consolidare: {args.ledgers} registre")
+        report["results"]["consolidare"] = run_consolidation(args.data_dir, args.ledgers, args.repeat)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Rezultatele au fost scrise în {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import threading
+from array import array
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:     # fără NumPy aceleași calcule rulează pe array.array, rând cu rând
+    np = None
+
+from finance_db import get_db, day_number, day_text
+from finance_trace import span
+
+# rapoartele citesc agregat_zi (un rând pe zi, categorie și tip), nu operatiuni: aceleași sume,
+# de zeci de ori mai puține rânduri; coloanele de mai jos sunt încărcate ca vectori
+COLUMNS = ("zi", "categorie_id", "tip", "bani", "nr")
+EPOCH = date(1970, 1, 1).toordinal()
+ROLLING_MONTHS = 3
+PERCENTILES = (50, 90)
+TOP_CATEGORIES = 5
+CACHE_SIZE = 16
+
+# -------------------- COLUMNS --------------------
+def load_columns(start=None, end=None, db=None):
+    """ agregat_zi rows in a date range as {column: vector}, ordered by day """
+    db = db or get_db()
+    lo = day_number(start) if start else 0
+    hi = day_number(end) if end else date.max.toordinal()
+    rows = db.fetchall("SELECT zi, categorie_id, tip, bani, nr FROM agregat_zi WHERE zi BETWEEN ? AND ? ORDER BY zi",
+                       (lo, hi))
+    if np is not None:
+        data = np.array(rows, dtype=np.int64).reshape(-1, len(COLUMNS))
+        return {name: data[:, i] for i, name in enumerate(COLUMNS)}
+    cols = list(zip(*rows)) or [()] * len(COLUMNS)
+    return {name: array("q", col) for name, col in zip(COLUMNS, cols)}
+
+def month_index(zi):
+    """ Months since 1970-01 for every day number """
+    if np is not None:
+        return (zi - EPOCH).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    seen = {}
+    out = array("q")
+    for z in zi:
+        m = seen.get(z)
+        if m is None:
+            d = date.fromordinal(z)
+            m = seen[z] = (d.year - 1970) * 12 + d.month - 1
+        out.append(m)
+    return out
+
+def month_label(m):
+    return f"{1970 + m // 12}-{m % 12 + 1:02d}"
+
+def _month_of(d):
+    return (d.year - 1970) * 12 + d.month - 1
+
+# -------------------- VECTOR OPS --------------------
+def select(mask_col, code, values):
+    """ values where mask_col == code, 0 elsewhere """
+    if np is not None:
+        return np.where(mask_col == code, values, 0)
+    return array("q", (v if m == code else 0 for m, v in zip(mask_col, values)))
+
+def group_sum(keys, values, size):
+    """ Sum of values per key in range(size) """
+    if np is not None:
+        return np.bincount(keys, weights=values, minlength=size)[:size].astype(np.int64)
+    out = [0] * size
+    for k, v in zip(keys, values):
+        if 0 <= k < size:
+            out[k] += v
+    return out
+
+def rolling_mean(values, window):
+    """ Trailing mean over `window` items; the first items average what is available """
+    n = len(values)
+    if np is not None:
+        csum = np.concatenate(([0], np.cumsum(values, dtype=np.float64)))
+        idx = np.arange(1, n + 1)
+        lo = np.maximum(0, idx - window)
+        return csum[idx] - csum[lo], idx - lo
+    out, total = [], 0
+    for i, v in enumerate(values):
+        total += v
+        if i >= window:
+            total -= values[i - window]
+        out.append((total, min(i + 1, window)))
+    return [t for t, _ in out], [c for _, c in out]
+
+def percentiles(values, qs):
+    """ Linear-interpolated percentiles (NumPy's default method) """
+    if not len(values):
+        return [0.0] * len(qs)
+    if np is not None:
+        return [float(p) for p in np.percentile(values, qs)]
+    s = sorted(values)
+    out = []
+    for q in qs:
+        pos = (len(s) - 1) * q / 100
+        i = int(pos)
+        j = min(i + 1, len(s) - 1)
+        out.append(s[i] + (s[j] - s[i]) * (pos - i))
+    return out
+
+# -------------------- REPORT --------------------
+def build_report(start=None, end=None, today=None, db=None):
+    """ Monthly income/expenses with a rolling average and month-over-month change, a per-category
+    breakdown, the top spending categories and daily spending averages / percentiles, amounts in RON """
+    db = db or get_db()
+    today = today or date.today()
+    cols = load_columns(start, end, db)
+    zi, bani = cols["zi"], cols["bani"]
+    if not len(zi):
+        return {"luni": [], "categorii": [], "top_cheltuieli": [], "zilnic": {}, "medii": {}}
+    # intervalul afișat: perioada cerută, fără zilele care încă n-au venit
+    first = day_number(start) if start else int(zi[0])
+    last = min(day_number(end), max(today.toordinal(), int(zi[-1]))) if end else int(zi[-1])
+    m0, m1 = _month_of(date.fromordinal(first)), _month_of(date.fromordinal(last))
+    n_months, n_days = m1 - m0 + 1, last - first + 1
+
+    months = month_index(zi)
+    if np is not None:
+        months = months - m0
+        days = zi - first
+    else:
+        months = array("q", (m - m0 for m in months))
+        days = array("q", (z - first for z in zi))
+    venit = group_sum(months, select(cols["tip"], 0, bani), n_months)
+    chelt = group_sum(months, select(cols["tip"], 1, bani), n_months)
+    sums, counts = rolling_mean(chelt, ROLLING_MONTHS)
+    luni = []
+    for i in range(n_months):
+        v, c = int(venit[i]), int(chelt[i])
+        prev = int(chelt[i - 1]) if i else 0
+        luni.append({"luna": month_label(m0 + i), "venituri": v / 100, "cheltuieli": c / 100,
+                     "sold": (v - c) / 100, "medie_mobila": round(float(sums[i]) / int(counts[i]) / 100, 2),
+                     "variatie": round((c - prev) * 100 / prev, 1) if prev else None})
+
+    # categoriile șterse sunt numărate la categoria în care au fost mutate
+    categories = db.categories
+    id_names = {cid: name for name in categories.names() for cid in categories.ids_for(name)}
+    size = max(max(id_names, default=0), int(max(cols["categorie_id"]))) + 1
+    per_cat = {tip: (group_sum(cols["categorie_id"], select(cols["tip"], tip, bani), size),
+                     group_sum(cols["categorie_id"], select(cols["tip"], tip, cols["nr"]), size)) for tip in (0, 1)}
+    totals = {tip: int(sum(int(x) for x in per_cat[tip][0])) for tip in (0, 1)}
+    merged = {}
+    for tip in (0, 1):
+        s, n = per_cat[tip]
+        for cid in range(size):
+            if n[cid]:
+                key = (id_names.get(cid, "?"), tip)
+                b, c = merged.get(key, (0, 0))
+                merged[key] = (b + int(s[cid]), c + int(n[cid]))
+    categorii = sorted(({"categorie": name, "tip": "Venit" if tip == 0 else "Cheltuială", "suma": b / 100, "tranzactii": c,
+                         "pondere": round(b * 100 / totals[tip], 1) if totals[tip] else 0.0,
+                         "medie_lunara": round(b / n_months / 100, 2)}
+                        for (name, tip), (b, c) in merged.items()), key=lambda r: (r["tip"], -r["suma"]))
+    top = [r for r in categorii if r["tip"] == "Cheltuială"][:TOP_CATEGORIES]
+
+    daily = group_sum(days, select(cols["tip"], 1, bani), n_days)
+    p = percentiles(daily, PERCENTILES)
+    peak = max(range(n_days), key=daily.__getitem__)
+    zilnic = {"zile": n_days, "medie": round(totals[1] / n_days / 100, 2),
+              **{f"p{q}": round(v / 100, 2) for q, v in zip(PERCENTILES, p)},
+              "maxim": int(daily[peak]) / 100, "zi_maxima": day_text(first + peak)}
+    medii = {"venituri_lunar": round(totals[0] / n_months / 100, 2), "cheltuieli_lunar": round(totals[1] / n_months / 100, 2)}
+    return {"luni": luni, "categorii": categorii, "top_cheltuieli": top, "zilnic": zilnic, "medii": medii}
+
+# -------------------- CACHE --------------------
+_cache = {}
+_cache_lock = threading.Lock()
+
+def report(start=None, end=None, today=None, db=None):
+    """ build_report, cached until the next write to the database (see Database.data_version) """
+    db = db or get_db()
+    key = (db.data_version(), start, end, today or date.today())
+    with _cache_lock:
+        if key in _cache:
+            return _cache[key]
+    with span("report.build"):
+        result = build_report(start, end, today, db)
+    with _cache_lock:
+        # intrările altor versiuni nu mai pot fi cerute: rămân doar cele ale versiunii curente
+        for k in [k for k in _cache if k[0] != key[0]]:
+            del _cache[k]
+        while len(_cache) >= CACHE_SIZE:
+            del _cache[next(iter(_cache))]
+        _cache[key] = result
+    return result
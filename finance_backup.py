@@ -0,0 +1,251 @@
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+from finance_db import DB_FILE, SCHEMA_VERSION, get_db, use_database, init_db, archived_years
+from finance_trace import span
+
+# Copiile se fac cu API-ul de backup al SQLite, în pași mici, pe o conexiune separată: cititorul ține un
+# snapshot WAL pe toată durata copierii, așa că scrierile aplicației continuă, iar copia nu mai repornește
+# de la zero după fiecare scriere. Fiecare copie este un folder cu fișierul principal, arhivele anilor
+# încheiați (finance_db.archive_year) și manifest.json, scris ultimul: un folder fără manifest nu e o copie.
+BACKUP_DIR = "backups"          # lângă fișierul principal
+STEP_PAGES = 256                # 1 MB la pagini de 4 KB
+STEP_PAUSE = 0.002              # secunde între pași: discul și GIL-ul rămân și pentru interfață
+KEEP = 7
+INTERVAL_HOURS = 24
+COMPRESS_LEVEL = 1              # paginile SQLite se comprimă bine și la nivelul 1, de ~4 ori mai repede decât la 6
+COPY_CHUNK = 1 << 20
+MANIFEST = "manifest.json"
+RESTORE_SUFFIX = ".restaurare"
+PREVIOUS_SUFFIX = ".inainte-de-restaurare"
+
+class BackupCancelled(Exception):
+    pass
+
+# -------------------- SNAPSHOTS --------------------
+def backup_dir(db=None):
+    db = db or get_db()
+    return os.path.join(os.path.dirname(os.path.abspath(db.path)), BACKUP_DIR)
+
+def list_backups(folder=None, db=None):
+    """ Finished snapshots in folder, newest first, as manifests with their "folder" """
+    folder = folder or backup_dir(db)
+    if not os.path.isdir(folder):
+        return []
+    out = []
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name, MANIFEST)
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                out.append(dict(json.load(f), folder=os.path.dirname(path)))
+    out.sort(key=lambda m: m["creat"], reverse=True)
+    return out
+
+def rotate(keep=KEEP, folder=None, db=None):
+    """ Delete the snapshots beyond the newest keep ones (and leftovers of interrupted backups); returns their folders """
+    folder = folder or backup_dir(db)
+    snapshots = list_backups(folder)
+    removed = [m["folder"] for m in snapshots[keep:]]
+    finished = {m["folder"] for m in snapshots}
+    if os.path.isdir(folder):
+        removed += [path for path in (os.path.join(folder, name) for name in os.listdir(folder))
+                    if path.endswith(".partial") and path not in finished]
+    for path in removed:
+        shutil.rmtree(path, ignore_errors=True)
+    return removed
+
+def backup_due(interval_hours=INTERVAL_HOURS, folder=None, db=None):
+    """ True when the newest snapshot is older than interval_hours (or there is none) """
+    snapshots = list_backups(folder, db)
+    return not snapshots or time.time() - snapshots[0]["creat"] >= interval_hours * 3600
+
+def backup_size(db=None):
+    """ Bytes a snapshot will copy: the main file and the archives """
+    db = db or get_db()
+    files = [db.path] + list(archived_years(db).values())
+    return sum(os.path.getsize(f) for f in files if os.path.exists(f))
+
+# -------------------- BACKUP --------------------
+def _compress(path, level):
+    with open(path, "rb") as src, gzip.open(path + ".gz", "wb", compresslevel=level) as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK)
+    os.remove(path)
+    return path + ".gz"
+
+def backup(folder=None, compress=False, keep=KEEP, db=None, step_pages=STEP_PAGES, pause=STEP_PAUSE,
+           progress=None, cancel=None, compress_level=COMPRESS_LEVEL):
+    """ Online snapshot of the database and its archive files into a new folder under folder (backup_dir()),
+    copied step_pages at a time while the app keeps reading and writing; then the oldest snapshots beyond
+    keep are deleted. progress(bytes copied) is called after every step. Returns the manifest with stats:
+    seconds, steps and the longest step (max_step_ms) """
+    db = db or get_db()
+    folder = folder or backup_dir(db)
+    main = os.path.abspath(db.path)
+    stem = os.path.splitext(os.path.basename(main))[0]
+    target = os.path.join(folder, time.strftime(f"{stem}-%Y%m%d-%H%M%S"))
+    k = 1
+    while os.path.exists(target) or os.path.exists(target + ".partial"):
+        k += 1
+        target = os.path.join(folder, time.strftime(f"{stem}-%Y%m%d-%H%M%S-{k}"))
+    partial = target + ".partial"
+    os.makedirs(partial)
+    stats = {"steps": 0, "max_step_ms": 0.0, "bytes": 0}
+    t0 = time.perf_counter()
+    try:
+        with span("backup.snapshot", "db") as s, closing(sqlite3.connect(main, isolation_level=None,
+                                                                         check_same_thread=False)) as src:
+            sources = [("main", os.path.basename(main))]
+            for an, path in archived_years(db).items():
+                src.execute(f"ATTACH DATABASE ? AS arhiva_{an}", (path,))
+                sources.append((f"arhiva_{an}", os.path.basename(path)))
+            # snapshot-urile tuturor fișierelor încep între două tranzacții ale aplicației, cu aceeași instrucțiune
+            with db.transaction():
+                src.execute("BEGIN")
+                src.execute(" UNION ALL ".join(f"SELECT COUNT(*) FROM {schema}.sqlite_master" for schema, _ in sources)).fetchall()
+            page_size = src.execute("PRAGMA page_size").fetchone()[0]
+            done = last = 0
+
+            def step(status, remaining, total):
+                nonlocal last
+                now = time.perf_counter()
+                stats["steps"] += 1
+                stats["max_step_ms"] = max(stats["max_step_ms"], (now - last) * 1000)
+                if progress:
+                    progress(done + (total - remaining) * page_size)
+                if cancel is not None and cancel.is_set():
+                    raise BackupCancelled()
+                time.sleep(pause)
+                last = time.perf_counter()
+
+            pages = {}
+            for schema, fname in sources:
+                last = time.perf_counter()
+                with closing(sqlite3.connect(os.path.join(partial, fname))) as dst:
+                    src.backup(dst, pages=step_pages, progress=step, name=schema)
+                    pages[fname] = dst.execute("PRAGMA page_count").fetchone()[0]
+                done += pages[fname] * page_size
+            version = src.execute("PRAGMA main.user_version").fetchone()[0]
+            src.execute("COMMIT")
+            # comprimarea vine după COMMIT: snapshot-ul nu mai oprește checkpoint-urile WAL cât timp durează
+            files = {}
+            for fname, n in pages.items():
+                path = os.path.join(partial, fname)
+                if compress:
+                    path = _compress(path, compress_level)
+                files[fname] = {"fisier": os.path.basename(path), "pagini": n, "octeti": os.path.getsize(path)}
+            stats.update(bytes=done, seconds=time.perf_counter() - t0)
+            s.set(rows=stats["steps"], bytes=done)
+        manifest = {"creat": time.time(), "principal": os.path.basename(main), "versiune": version,
+                    "comprimat": bool(compress), "fisiere": files, **stats}
+        with open(os.path.join(partial, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(partial, target)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    rotate(keep, folder)
+    return dict(manifest, folder=target)
+
+# -------------------- RESTORE --------------------
+def _check(path):
+    """ Problems found by PRAGMA integrity_check in a database file, or [] """
+    try:
+        with closing(sqlite3.connect(path)) as c:
+            rows = [r[0] for r in c.execute("PRAGMA integrity_check")]
+            version = c.execute("PRAGMA user_version").fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        return [str(e)]
+    problems = [] if rows == ["ok"] else rows
+    if version > SCHEMA_VERSION:
+        problems.append(f"schema v{version}, mai nouă decât aplicația (v{SCHEMA_VERSION})")
+    return problems
+
+def restore(snapshot, path=None, db=None):
+    """ Replace the database (and its archives) with a snapshot folder. Every file is unpacked next to its
+    target and checked with PRAGMA integrity_check first; nothing is touched unless all of them pass.
+    The current files are kept as <file>.inainte-de-restaurare. Close the app's connections first
+    (db is closed here if given). Returns the list of restored files """
+    with open(os.path.join(snapshot, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    path = os.path.abspath(path or (db.path if db else DB_FILE))
+    folder = os.path.dirname(path)
+    # fișierul principal poate fi restaurat sub alt nume; arhivele își păstrează numele din tabela arhive
+    targets = {fname: path if fname == manifest["principal"] else os.path.join(folder, fname)
+               for fname in manifest["fisiere"]}
+    staged = {}
+    try:
+        with span("backup.restore", "db"):
+            for fname, info in manifest["fisiere"].items():
+                src = os.path.join(snapshot, info["fisier"])
+                tmp = staged[fname] = targets[fname] + RESTORE_SUFFIX
+                opener = gzip.open if src.endswith(".gz") else open
+                with opener(src, "rb") as fin, open(tmp, "wb") as fout:
+                    shutil.copyfileobj(fin, fout, COPY_CHUNK)
+                problems = _check(tmp)
+                if problems:
+                    raise ValueError(f"Copia {fname} este deteriorată: " + "; ".join(problems[:5]))
+    except BaseException:
+        for tmp in staged.values():
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+    if db is not None:
+        db.close()
+    for fname, tmp in staged.items():
+        target = targets[fname]
+        if os.path.exists(target):
+            # paginile din WAL intră în fișierul păstrat; un WAL rămas lângă copia restaurată ar strica-o
+            with closing(sqlite3.connect(target)) as c:
+                c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            os.replace(target, target + PREVIOUS_SUFFIX)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(target + suffix):
+                os.remove(target + suffix)
+        os.replace(tmp, target)
+    return list(targets.values())
+
+# -------------------- RUN --------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Copii de siguranță pentru finante.db")
+    ap.add_argument("--db", default=DB_FILE, help="fișierul bazei de date")
+    ap.add_argument("--dir", help=f"folderul copiilor (implicit {BACKUP_DIR}/ lângă baza de date)")
+    ap.add_argument("--compress", action="store_true", help="comprimă fișierele copiei cu gzip")
+    ap.add_argument("--keep", type=int, default=KEEP, help="câte copii se păstrează")
+    ap.add_argument("--if-due", type=float, metavar="ORE", help="face copia doar dacă ultima e mai veche de ORE")
+    ap.add_argument("--list", action="store_true", help="listează copiile existente")
+    ap.add_argument("--restore", metavar="FOLDER", help="înlocuiește baza de date cu o copie (verificată înainte)")
+    args = ap.parse_args(argv)
+
+    if args.restore:
+        try:
+            for path in restore(args.restore, args.db):
+                print(f"Restaurat {path}")
+        except ValueError as e:
+            print(f"Eroare: {e}", file=sys.stderr)
+            return 1
+        return 0
+    db = use_database(args.db)
+    init_db(db)
+    if args.list:
+        for m in list_backups(args.dir, db):
+            size = sum(f["octeti"] for f in m["fisiere"].values())
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(m['creat']))}  {size / 2**20:>9.1f} MB  "
+                  f"{len(m['fisiere'])} fișiere  {m['folder']}")
+        return 0
+    if args.if_due is not None and not backup_due(args.if_due, args.dir, db):
+        print("Ultima copie este destul de recentă.")
+        return 0
+    m = backup(args.dir, args.compress, args.keep, db)
+    print(f"Copie în {m['folder']}: {m['bytes'] / 2**20:.1f} MB în {m['seconds']:.2f} s, {m['steps']} pași, "
+          f"cel mai lung pas {m['max_step_ms']:.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import argparse
+import heapq
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from finance_db import SCHEMA_VERSION, Database, category_totals, day_number, to_bani
+from finance_core import (build_filter, filter_bounds, filter_totals, summary_args, fetch_page, add_period_arguments,
+                          period_arguments)
+
+# Fiecare registru (finante.db al unei persoane / firme) e citit în propriul proces, numai pentru citire, cu aceleași
+# funcții ca aplicația: totalurile vin din tabelele de agregate, căutarea din indexul FTS al registrului. Procesul
+# principal primește doar rezultate mici (sume, categorii, o pagină de rânduri) și le combină; niciun proces nu
+# încarcă toate rândurile.
+LAST_ID = sys.maxsize
+
+# -------------------- WORKERS --------------------
+def _open(path):
+    """ The ledger at path, opened read-only: consolidation never migrates or writes to somebody else's file """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Registrul nu există: {path}")
+    db = Database(path, readonly=True)
+    try:
+        if not db.fetchone("SELECT 1 FROM sqlite_master WHERE name = 'categorii'"):
+            raise ValueError(f"{path} nu este un registru (un an arhivat se citește prin registrul lui)")
+        version = db.fetchone("PRAGMA user_version")[0]
+        if version < SCHEMA_VERSION:
+            raise ValueError(f"{path} are schema v{version}: deschide-l o dată în aplicație ca să fie actualizat "
+                             f"(v{SCHEMA_VERSION})")
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"{path} are schema v{version}, mai nouă decât aplicația (v{SCHEMA_VERSION})")
+    except BaseException:
+        db.close()
+        raise
+    return db
+
+def _ledger_totals(task):
+    """ Worker: (count, income, expenses) of the filter and the period's category totals, amounts in bani """
+    path, period, category, custom_from, custom_to, search, today = task
+    db = _open(path)
+    try:
+        count, venit, chelt = filter_totals(period, category, custom_from, custom_to, today, search, db=db)
+        start, end, _ = summary_args(period, None, custom_from, custom_to, today)
+        # bani întregi: sumele din zeci de registre se adună fără erori de rotunjire
+        categories = {name: (n, to_bani(v), to_bani(c)) for name, (n, v, c) in category_totals(start, end, db=db).items()}
+    finally:
+        db.close()
+    return {"registru": path, "tranzactii": count, "venituri": to_bani(venit), "cheltuieli": to_bani(chelt),
+            "categorii": categories}
+
+def _ledger_page(task):
+    """ Worker: the first rows of a ledger after a position of the merged list, newest first """
+    path, period, category, custom_from, custom_to, search, today, key, limit = task
+    db = _open(path)
+    try:
+        where, params = build_filter(period, category, custom_from, custom_to, today, search, db=db)
+        return fetch_page(where, params, key, "after", limit, db=db, bounds=filter_bounds(period, custom_from, custom_to, today))
+    finally:
+        db.close()
+
+def _map(fn, tasks, workers=None):
+    """ fn over tasks in a process pool (one task per ledger), in order; workers=1 runs them in this process """
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        return [fn(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, tasks))
+
+# -------------------- CONSOLIDATION --------------------
+def consolidate(paths, period="Toate", category="Toate", custom_from=None, custom_to=None, search="", today=None,
+                workers=None):
+    """ Combined balance and category totals of several ledgers, each computed in its own process. The balance
+    follows the whole filter; the category totals cover the period, like category_report. Amounts in RON """
+    tasks = [(path, period, category, custom_from, custom_to, search, today) for path in paths]
+    parts = _map(_ledger_totals, tasks, workers)
+    categories = {}
+    for part in parts:
+        for name, (n, v, c) in part["categorii"].items():
+            t = categories.setdefault(name, [0, 0, 0])
+            t[0] += n
+            t[1] += v
+            t[2] += c
+    venit = sum(p["venituri"] for p in parts)
+    chelt = sum(p["cheltuieli"] for p in parts)
+    return {"tranzactii": sum(p["tranzactii"] for p in parts), "venituri": venit / 100, "cheltuieli": chelt / 100,
+            "balanta": (venit - chelt) / 100,
+            "categorii": {name: (n, v / 100, c / 100) for name, (n, v, c) in sorted(categories.items())},
+            "registre": [{"registru": p["registru"], "tranzactii": p["tranzactii"], "venituri": p["venituri"] / 100,
+                          "cheltuieli": p["cheltuieli"] / 100, "balanta": (p["venituri"] - p["cheltuieli"]) / 100}
+                         for p in parts]}
+
+def _merge_key(row):
+    # ordinea listei combinate: data descrescător, apoi registrul în ordinea dată, apoi id descrescător
+    ledger, tid, data = row[0], row[1], row[2]
+    return -day_number(data), ledger, -tid
+
+def consolidated_page(paths, period="Toate", category="Toate", custom_from=None, custom_to=None, search="", today=None,
+                      key=None, limit=100, workers=None):
+    """ One page of the ledgers' transactions merged by date, newest first, as (ledger index, id, data, tip,
+    categorie, suma, descriere); pass the last row as key for the next page. Every ledger sends at most limit
+    rows after key, read by keyset on its own date index """
+    tasks = []
+    for i, path in enumerate(paths):
+        after = None
+        if key is not None:
+            ledger, tid, data = key[0], key[1], key[2]
+            # registrele dinaintea celui din cheie au trecut deja de ziua cheii; cele de după o iau de la capăt
+            after = (tid, data) if i == ledger else (0, data) if i < ledger else (LAST_ID, data)
+        tasks.append((path, period, category, custom_from, custom_to, search, today, after, limit))
+    pages = _map(_ledger_page, tasks, workers)
+    merged = heapq.merge(*([(i,) + tuple(r) for r in rows] for i, rows in enumerate(pages)), key=_merge_key)
+    return [row for row, _ in zip(merged, range(limit))]
+
+# -------------------- RUN --------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Balanța și categoriile combinate ale mai multor registre finante.db")
+    ap.add_argument("ledgers", nargs="+", metavar="REGISTRU.db")
+    add_period_arguments(ap)
+    ap.add_argument("--category", default="Toate")
+    ap.add_argument("--search", default="", help="cuvinte căutate în descriere / categorie (prefix, fără diacritice)")
+    ap.add_argument("--workers", type=int, help="procese folosite (implicit: câte nuclee are calculatorul)")
+    ap.add_argument("--transactions", type=int, default=0, metavar="N", help="afișează și primele N tranzacții, după dată")
+    ap.add_argument("--json", action="store_true", help="rezultat JSON")
+    args = ap.parse_args(argv)
+    period, custom_from, custom_to = period_arguments(ap, args)
+    try:
+        result = consolidate(args.ledgers, period, args.category, custom_from, custom_to, args.search,
+                             workers=args.workers)
+        rows = consolidated_page(args.ledgers, period, args.category, custom_from, custom_to, args.search,
+                                 limit=args.transactions, workers=args.workers) if args.transactions else []
+    except (OSError, ValueError) as e:
+        print(f"Eroare: {e}", file=sys.stderr)
+        return 1
+    names = [os.path.basename(p) for p in args.ledgers]
+    if args.json:
+        result["categorii"] = {name: {"tranzactii": n, "venituri": v, "cheltuieli": c}
+                               for name, (n, v, c) in result["categorii"].items()}
+        result["tranzactii_recente"] = [dict(zip(("registru", "id", "data", "tip", "categorie", "suma", "descriere"),
+                                                 (names[r[0]],) + tuple(r[1:]))) for r in rows]
+        print(json.dumps(result, ensure_ascii=False))
+        return 0
+    print(f"{'registru':<24}{'nr':>10}{'venituri':>14}{'cheltuieli':>14}{'balanță':>14}")
+    for name, p in zip(names, result["registre"]):
+        print(f"{name:<24}{p['tranzactii']:>10}{p['venituri']:>14.2f}{p['cheltuieli']:>14.2f}{p['balanta']:>14.2f}")
+    print(f"{'TOTAL':<24}{result['tranzactii']:>10}{result['venituri']:>14.2f}{result['cheltuieli']:>14.2f}"
+          f"{result['balanta']:>14.2f}\n")
+    print(f"{'categorie':<24}{'nr':>10}{'venituri':>14}{'cheltuieli':>14}")
+    for name, (n, v, c) in result["categorii"].items():
+        print(f"{name:<24}{n:>10}{v:>14.2f}{c:>14.2f}")
+    if rows:
+        print()
+        for r in rows:
+            print(f"{r[2]}  {names[r[0]]:<20}{r[3]:<12}{r[4]:<16}{r[5]:>12.2f}  {r[6] or ''}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+
+from finance_trace import tracer
+
+# funcțiile din finance_db sunt reexportate: interfața grafică și scripturile importă doar finance_core
+from finance_db import (DB_FILE, get_db, use_database, init_db, get_categories, add_category, delete_category,
+                        rename_category, category_clause, aggregate_totals, category_totals, insert_transaction,
+                        update_transaction, delete_transactions, undo_delete, last_deleted, day_number, search_clause,
+                        search_terms, partitioned_rows, merged_rows, sort_value, partition_sources, partition_where,
+                        archived_years, closed_years, archive_year, unarchive_year, tip_code, to_bani)
+
+__all__ = [
+    # reexportate din finance_db
+    "DB_FILE", "get_db", "use_database", "init_db", "get_categories", "add_category", "delete_category",
+    "rename_category", "category_clause", "aggregate_totals", "category_totals", "insert_transaction",
+    "update_transaction", "delete_transactions", "undo_delete", "last_deleted", "day_number", "search_clause",
+    "search_terms", "partitioned_rows", "merged_rows", "sort_value", "partition_sources", "partition_where",
+    "archived_years", "closed_years", "archive_year", "unarchive_year", "tip_code", "to_bani",
+    # nucleul propriu-zis
+    "start_of_week", "end_of_week", "end_of_month", "PERIOD_OPTIONS", "period_bounds", "filter_bounds",
+    "build_filter", "text_matches", "row_matches", "and_where", "TX_COLUMNS", "TX_COLUMNS_SELECT", "SORT_COLUMNS",
+    "DEFAULT_SORT", "INDEXED_SORTS", "sort_key", "seek_key", "fetch_page", "get_transaction", "summary_args",
+    "balance", "filter_totals", "category_report", "trend_report", "export_transactions", "add_period_arguments",
+    "period_arguments", "main",
+]
+
+# -------------------- HELPERS FOR DATES --------------------
+def start_of_week(d):
+    # assuming week starts on Monday
+    return d - timedelta(days=d.weekday())
+
+def end_of_week(d):
+    return start_of_week(d) + timedelta(days=6)
+
+def end_of_month(d):
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+# -------------------- QUERY BUILDER --------------------
+PERIOD_OPTIONS = ["Toate", "Azi", "Săptămâna curentă", "Luna curentă", "Anul curent", "Custom"]
+
+def period_bounds(period, custom_from=None, custom_to=None, today=None):
+    """ Return (start, end) dates for a period option, or None for no date limit """
+    today = today or date.today()
+    if period == "Azi":
+        return today, today
+    if period == "Săptămâna curentă":
+        return start_of_week(today), end_of_week(today)
+    if period == "Luna curentă":
+        return today.replace(day=1), end_of_month(today)
+    if period == "Anul curent":
+        return date(today.year, 1, 1), date(today.year, 12, 31)
+    if period == "Custom" and custom_from and custom_to:
+        return custom_from, custom_to
+    return None
+
+def filter_bounds(period, custom_from=None, custom_to=None, today=None):
+    """ (first, last) day numbers of the period, or None: the archived years the row queries have to read """
+    bounds = period_bounds(period, custom_from, custom_to, today)
+    return (bounds[0].toordinal(), bounds[1].toordinal()) if bounds else None
+
+def build_filter(period, category="Toate", custom_from=None, custom_to=None, today=None, search="", db=None):
+    """ Build a parameterized WHERE clause for the period, category and text search filters """
+    clauses = []
+    params = []
+    if category and category != "Toate":
+        # id-ul categoriei (plus categoriile șterse mutate în ea) în loc de comparația pe text
+        clause, ids = category_clause(category, db)
+        clauses.append(clause)
+        params.extend(ids)
+    bounds = period_bounds(period, custom_from, custom_to, today)
+    if bounds:
+        # zi este numărul întreg al zilei, indexat
+        clauses.append("zi BETWEEN ? AND ?")
+        params.extend(d.toordinal() for d in bounds)
+    if search_terms(search):
+        # căutarea în descriere / categorie trece prin indexul FTS5 cautare
+        clause, search_params = search_clause(search, db)
+        clauses.append(clause)
+        params.extend(search_params)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where, params
+
+def text_matches(row, search):
+    """ Python twin of search_clause: every word of search starts a word of the description or category """
+    words = search_terms(f"{row[5] or ''} {row[3] or ''}")
+    return all(any(w.startswith(term) for w in words) for term in search_terms(search))
+
+def row_matches(row, period, category="Toate", custom_from=None, custom_to=None, today=None, search=""):
+    """ Python twin of build_filter for a single (id, data, tip, categorie, suma, descriere) row """
+    if category and category != "Toate" and row[3] != category:
+        return False
+    if search and not text_matches(row, search):
+        return False
+    bounds = period_bounds(period, custom_from, custom_to, today)
+    if bounds:
+        return bounds[0].strftime("%Y-%m-%d") <= row[1] <= bounds[1].strftime("%Y-%m-%d")
+    return True
+
+def and_where(where, clause):
+    return where + (" AND " if where else " WHERE ") + clause
+
+# -------------------- PAGED QUERIES --------------------
+# bounds = filter_bounds(...) al filtrului: cu anii arhivați, interogările citesc doar partițiile din perioadă
+TX_COLUMNS = "id,data,tip,categorie,suma,descriere"
+TX_COLUMNS_SELECT = f"SELECT {TX_COLUMNS} FROM tranzactii"
+
+# sort = (coloana afișată, descrescător); la valori egale ordinea continuă pe zi, id, în aceeași direcție.
+# data și categorie se citesc pe bucăți din idx_operatiuni_zi / idx_operatiuni_categorie_zi (câte o bucată pe
+# categorie, în ordinea numelor); celelalte au un index (coloană, zi) din SORT_INDEXES: (expresia din tranzactii, colaționare)
+SORT_COLUMNS = ("data", "tip", "categorie", "suma", "descriere")
+DEFAULT_SORT = ("data", True)
+INDEXED_SORTS = {"tip": ("tip_cod", None), "suma": ("bani", None), "descriere": ("descriere", "NOCASE")}
+
+def sort_key(row, sort=DEFAULT_SORT):
+    """ Python twin of a sort's ORDER BY for a (id, data, tip, categorie, suma, descriere) row;
+    the listing shows rows by ascending key, or descending when sort[1] is true """
+    column = sort[0]
+    if column == "data":
+        return row[1], row[0]
+    if column == "categorie":
+        return row[3], row[1], row[0]
+    return _sort_param(row, column), row[1], row[0]
+
+def _sort_param(row, column):
+    """ The indexed sort column's value for a row, as SQLite compares it """
+    if column == "tip":
+        return tip_code(row[2])
+    if column == "suma":
+        return to_bani(row[4])
+    return sort_value(row[5], INDEXED_SORTS[column][1])
+
+def _listing(columns, where, params, sort=DEFAULT_SORT, key=None, inclusive=False, backward=False, limit=None,
+             offset=0, bounds=None, db=None):
+    """ Rows matching where in the display order of sort, starting after key (a row; at key with inclusive);
+    backward reads the rows before key, nearest first """
+    db = db or get_db()
+    column, descending = sort
+    desc = descending != backward
+    order = "DESC" if desc else "ASC"
+    op = ("<" if desc else ">") + ("=" if inclusive else "")
+    params = list(params)
+    if key is not None:
+        zi, tid = day_number(key[1]), key[0]
+    if column == "data":
+        if key is not None:
+            where, params = and_where(where, f"(zi, id) {op} (?, ?)"), params + [zi, tid]
+            # anii de dincolo de cheie nu mai trebuie atașați
+            lo, hi = bounds or (1, date.max.toordinal())
+            bounds = (lo, min(hi, zi)) if desc else (max(lo, zi), hi)
+        return partitioned_rows(columns, where, params, bounds, order, limit, offset, db=db)
+    if column == "categorie":
+        slices = []
+        for name in sorted(db.categories.names(), reverse=desc):
+            if key is not None and (name > key[3] if desc else name < key[3]):
+                continue
+            clause, ids = category_clause(name, db)
+            if key is not None and name == key[3]:
+                clause, ids = f"{clause} AND (zi, id) {op} (?, ?)", ids + [zi, tid]
+            slices.append((clause, ids))
+        return partitioned_rows(columns, where, params, bounds, order, limit, offset, db=db, slices=slices)
+    expr, collate = INDEXED_SORTS[column]
+    if key is not None:
+        collation = f" COLLATE {collate}" if collate else ""
+        where = and_where(where, f"({expr}{collation}, zi, id) {op} (?, ?, ?)")
+        params += [_sort_param(key, column), zi, tid]
+    return merged_rows(columns, expr, collate, where, params, bounds, order, limit, offset, db=db)
+
+def seek_key(where, params, offset, bounds=None, db=None, sort=DEFAULT_SORT):
+    """ The row at a given position of the listing, to start a page from (fetch_page(..., key, "from")) """
+    return next(_listing(TX_COLUMNS, where, params, sort, limit=1, offset=offset, bounds=bounds, db=db), None)
+
+def fetch_page(where, params, key=None, direction="after", limit=100, db=None, bounds=None, sort=DEFAULT_SORT):
+    """ Keyset pagination in the display order of sort (newest first by default); key is a row of the listing.
+    direction: 'after' = rows following key, 'from' = key included, 'before' = rows preceding key """
+    if direction == "before" and key is not None:
+        rows = list(_listing(TX_COLUMNS, where, params, sort, key, backward=True, limit=limit, bounds=bounds, db=db))
+        rows.reverse()
+        return rows
+    return list(_listing(TX_COLUMNS, where, params, sort, key, direction == "from", limit=limit, bounds=bounds, db=db))
+
+def get_transaction(tid, db=None):
+    db = db or get_db()
+    row = db.fetchone(TX_COLUMNS_SELECT + " WHERE id=?", (tid,))
+    if row is None and archived_years(db):
+        row = next(partitioned_rows(TX_COLUMNS, " WHERE id=?", [tid], limit=1, db=db), None)
+    return row
+
+# -------------------- REPORTS --------------------
+def summary_args(period, category="Toate", custom_from=None, custom_to=None, today=None):
+    """ (start, end, category or None) for aggregate_totals """
+    start, end = period_bounds(period, custom_from, custom_to, today) or (None, None)
+    return start, end, None if category in (None, "Toate") else category
+
+def balance(period="Toate", category="Toate", custom_from=None, custom_to=None, search="", db=None):
+    """ (count, income, expenses, balance) for the filter, read from the summary tables unless searching """
+    count, venit, chelt = filter_totals(period, category, custom_from, custom_to, search=search, db=db)
+    return count, venit, chelt, round(venit - chelt, 2) + 0.0
+
+def filter_totals(period="Toate", category="Toate", custom_from=None, custom_to=None, today=None, search="", db=None):
+    """ (count, income, expenses) for the full filter; without a search this reads the summary tables """
+    totals = aggregate_totals(*summary_args(period, category, custom_from, custom_to, today), db=db)
+    if not search_terms(search):
+        return totals
+    db = db or get_db()
+    where, params = build_filter(period, category, custom_from, custom_to, today, db=db)
+    # fără ORDER BY, se citesc fie rândurile găsite de căutare, fie cele din perioadă / categorie: cele mai puține
+    clause, search_params = search_clause(search, db, scan_min=totals[0])
+    where = and_where(where, clause)
+    count = venit = chelt = 0
+    # căutarea nu are totaluri precalculate: se adună rândurile găsite în fișierul principal și în anii arhivați din perioadă
+    for source, schema in partition_sources(filter_bounds(period, custom_from, custom_to, today), db):
+        sql = "SELECT COUNT(*), SUM(CASE WHEN tip=0 THEN bani END), SUM(CASE WHEN tip=1 THEN bani END) FROM " + source
+        n, v, c = db.fetchone(sql + (partition_where(where, schema) if schema else where), params + search_params)
+        count, venit, chelt = count + n, venit + (v or 0), chelt + (c or 0)
+    return count, venit / 100, chelt / 100
+
+def category_report(period="Toate", custom_from=None, custom_to=None, db=None):
+    """ {category: (count, income, expenses)} for the period filter """
+    start, end, _ = summary_args(period, None, custom_from, custom_to)
+    return category_totals(start, end, db=db)
+
+def trend_report(period="Toate", custom_from=None, custom_to=None, today=None, db=None):
+    """ Monthly trends, category breakdown and spending percentiles for the period (see finance_analytics) """
+    import finance_analytics    # NumPy se încarcă doar când se cer rapoartele
+    start, end, _ = summary_args(period, None, custom_from, custom_to, today)
+    return finance_analytics.report(start, end, today, db=db)
+
+def export_transactions(path, period="Toate", category="Toate", custom_from=None, custom_to=None, search="", db=None,
+                        **kwargs):
+    """ Export the rows matching the filter to CSV (.gz = compressed); kwargs go to finance_io.export_csv """
+    import finance_io   # doar exportul are nevoie de csv / gzip
+    where, params = build_filter(period, category, custom_from, custom_to, search=search, db=db)
+    return finance_io.export_csv(path, where, params, db=db, bounds=filter_bounds(period, custom_from, custom_to), **kwargs)
+
+# -------------------- RUN --------------------
+def add_period_arguments(p):
+    """ --period / --from / --to on an argparse parser (also used by finance_consolidate.py) """
+    p.add_argument("--period", choices=PERIOD_OPTIONS, default="Toate", help="perioada (implicit: Toate)")
+    p.add_argument("--from", dest="date_from", type=date.fromisoformat, metavar="AAAA-LL-ZZ", help="început interval (cu --to)")
+    p.add_argument("--to", dest="date_to", type=date.fromisoformat, metavar="AAAA-LL-ZZ", help="sfârșit interval (cu --from)")
+
+def period_arguments(ap, args):
+    """ (period, custom_from, custom_to) from the arguments of add_period_arguments """
+    if args.date_from or args.date_to:
+        if not (args.date_from and args.date_to):
+            ap.error("--from și --to se folosesc împreună")
+        return "Custom", args.date_from, args.date_to
+    return args.period, None, None
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Rapoarte, export și import pentru finante.db, fără interfață grafică")
+    ap.add_argument("--db", default=DB_FILE, help="fișierul bazei de date")
+    ap.add_argument("--trace", metavar="FIȘIER.json", help="măsoară comanda și scrie un trace (chrome://tracing, Perfetto)")
+    sub = ap.add_subparsers(dest="command", required=True)
+    bal = sub.add_parser("balance", help="venituri, cheltuieli și balanța pe o perioadă")
+    add_period_arguments(bal)
+    bal.add_argument("--category", default="Toate")
+    bal.add_argument("--search", default="", help="cuvinte căutate în descriere / categorie (prefix, fără diacritice)")
+    bal.add_argument("--json", action="store_true", help="rezultat JSON")
+    cat = sub.add_parser("categories", help="totaluri pe categorii")
+    add_period_arguments(cat)
+    cat.add_argument("--json", action="store_true", help="rezultat JSON")
+    rep = sub.add_parser("report", help="tendințe lunare, categorii de top și percentile ale cheltuielilor zilnice")
+    add_period_arguments(rep)
+    rep.add_argument("--json", action="store_true", help="rezultat JSON")
+    exp = sub.add_parser("export", help="exportă tranzacțiile filtrate (.gz = comprimat)")
+    exp.add_argument("file")
+    add_period_arguments(exp)
+    exp.add_argument("--category", default="Toate")
+    exp.add_argument("--search", default="", help="cuvinte căutate în descriere / categorie (prefix, fără diacritice)")
+    imp = sub.add_parser("import", help="importă un CSV; opțiunile de mapare sunt cele din finance_io.py import")
+    imp.add_argument("file")
+    args, rest = ap.parse_known_args(argv)
+    if rest and args.command != "import":
+        ap.error(f"argumente necunoscute: {' '.join(rest)}")
+
+    if args.trace:
+        tracer.enable(args.trace)
+    if args.command == "import":
+        import finance_io
+        return finance_io.main(["--db", args.db, "import", args.file] + rest)
+    db = use_database(args.db)
+    init_db(db)
+    period, custom_from, custom_to = period_arguments(ap, args)
+    if args.command == "balance":
+        count, venit, chelt, sold = balance(period, args.category, custom_from, custom_to, args.search, db=db)
+        if args.json:
+            print(json.dumps({"tranzactii": count, "venituri": venit, "cheltuieli": chelt, "balanta": sold}))
+        else:
+            print(f"Tranzacții: {count}\nVenituri: {venit:.2f} RON\nCheltuieli: {chelt:.2f} RON\n"
+                  f"Balanță: {'+' if sold >= 0 else ''}{sold:.2f} RON")
+    elif args.command == "categories":
+        report = category_report(period, custom_from, custom_to, db=db)
+        if args.json:
+            print(json.dumps({name: {"tranzactii": n, "venituri": v, "cheltuieli": c} for name, (n, v, c) in report.items()},
+                             ensure_ascii=False))
+        else:
+            print(f"{'categorie':<20}{'nr':>8}{'venituri':>14}{'cheltuieli':>14}")
+            for name, (n, v, c) in report.items():
+                print(f"{name:<20}{n:>8}{v:>14.2f}{c:>14.2f}")
+    elif args.command == "report":
+        report = trend_report(period, custom_from, custom_to, db=db)
+        if args.json:
+            print(json.dumps(report, ensure_ascii=False))
+        else:
+            print(f"{'luna':<10}{'venituri':>14}{'cheltuieli':>14}{'medie 3 luni':>14}{'variație':>10}")
+            for m in report["luni"]:
+                change = f"{m['variatie']:+.1f}%" if m["variatie"] is not None else "-"
+                print(f"{m['luna']:<10}{m['venituri']:>14.2f}{m['cheltuieli']:>14.2f}{m['medie_mobila']:>14.2f}{change:>10}")
+            if report["luni"]:
+                daily = report["zilnic"]
+                print("\nTop cheltuieli: " + ", ".join(f"{c['categorie']} {c['suma']:.2f} ({c['pondere']}%)"
+                                                    for c in report["top_cheltuieli"]))
+                print(f"Pe zi: medie {daily['medie']:.2f}, mediană {daily['p50']:.2f}, p90 {daily['p90']:.2f} RON")
+    else:
+        n = export_transactions(args.file, period, args.category, custom_from, custom_to, args.search, db=db)
+        print(f"{n} tranzacții exportate în {args.file}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1291 @@
+import argparse
+import heapq
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from contextlib import closing, contextmanager
+from datetime import date, timedelta
+
+from finance_trace import span, count
+
+DB_FILE = "finante.db"
+
+# WAL: cititorii nu blochează scrierile; NORMAL este sigur în modul WAL
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,       # ~16 MB cache de pagini
+    "mmap_size": 268435456,     # 256 MB citiri prin mmap
+    "temp_store": "MEMORY",
+}
+# doar setări ale conexiunii: un fișier deschis numai pentru citire nu primește nicio scriere
+READONLY_PRAGMAS = {name: value for name, value in PRAGMAS.items() if name not in ("journal_mode", "synchronous")}
+STATEMENT_CACHE = 256
+READER_POOL = 4
+_serials = itertools.count(1)     # fiecare conexiune principală deschisă primește un număr unic
+
+# -------------------- CONNECTION MANAGER --------------------
+class Database:
+    """ One long-lived SQLite connection shared by the whole app """
+
+    def __init__(self, path=DB_FILE, pragmas=None, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.pragmas = (READONLY_PRAGMAS if readonly else PRAGMAS) if pragmas is None else pragmas
+        self._conn = None
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._pending = []       # evenimentele categoriilor din tranzacția curentă, trimise după COMMIT
+        self._readers = []
+        self._pool_lock = threading.Lock()     # doar pentru lista de cititori: nu așteaptă după tranzacții
+        self._categories = None
+        self._serial = None
+
+    def _connect(self):
+        # isolation_level=None: autocommit, tranzacțiile se deschid explicit în transaction()
+        # cached_statements: instrucțiunile pregătite sunt refolosite pe aceeași conexiune
+        target = self.path
+        if self.readonly:
+            # URI mode=ro: fișierul (și arhivele atașate) nu pot fi modificate pe această conexiune;
+            # urllib.request aduce http.client și ssl, deci se importă doar aici, nu la pornire
+            from urllib.request import pathname2url
+            target = f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro"
+        conn = sqlite3.connect(target, isolation_level=None, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE, uri=self.readonly)
+        count("db.connections")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = self._connect()
+            self._serial = next(_serials)
+        return self._conn
+
+    @property
+    def categories(self):
+        if self._categories is None:
+            self._categories = CategoryRegistry(self)
+        return self._categories
+
+    @contextmanager
+    def reader(self):
+        """ Pooled read-only connection; in WAL mode it reads next to the writer and never waits on its transactions """
+        with self._pool_lock:
+            conn = self._readers.pop() if self._readers else None
+        if conn is None:
+            self.conn  # schema / WAL sunt inițializate de conexiunea principală
+            conn = self._connect()
+        try:
+            yield ReadConnection(conn, self)
+        finally:
+            with self._pool_lock:
+                if len(self._readers) < READER_POOL:
+                    self._readers.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    # fiecare apel este un span "sql" când finance_trace e pornit; oprit, costul este o verificare
+    def execute(self, sql, params=()):
+        with self._lock, span(sql, "sql"):
+            return self.conn.execute(sql, params)
+
+    def executemany(self, sql, seq):
+        with self._lock, span(sql, "sql") as s:
+            cur = self.conn.executemany(sql, seq)
+            s.set(rows=cur.rowcount)
+            return cur
+
+    def fetchall(self, sql, params=()):
+        with self._lock, span(sql, "sql") as s:
+            rows = self.conn.execute(sql, params).fetchall()
+            s.set(rows=len(rows))
+            return rows
+
+    def fetchone(self, sql, params=()):
+        with self._lock, span(sql, "sql"):
+            return self.conn.execute(sql, params).fetchone()
+
+    def data_version(self):
+        """ A key that changes after every write to the file, by this connection or any other """
+        with self._lock:
+            conn = self.conn
+            # data_version vede commit-urile altor conexiuni / procese, total_changes scrierile acesteia
+            return self._serial, conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+    @contextmanager
+    def transaction(self):
+        """ BEGIN IMMEDIATE ... COMMIT, rolled back on error; nested calls join the outer transaction """
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self.conn
+                finally:
+                    self._depth -= 1
+                return
+            # span-ul acoperă și COMMIT, unde se scrie efectiv pe disc
+            with span("db.transaction", "db"):
+                self.conn.execute("BEGIN IMMEDIATE")
+                self._depth = 1
+                try:
+                    yield self.conn
+                except BaseException:
+                    self.conn.execute("ROLLBACK")
+                    if self._categories is not None:
+                        # categoriile adăugate în tranzacția anulată nu mai există; abonații nu au aflat de ele
+                        self._categories.invalidate()
+                    raise
+                else:
+                    self.conn.execute("COMMIT")
+                    events = self._pending
+                finally:
+                    self._depth = 0
+                    self._pending = []
+        # abonații află de categorii doar după COMMIT, în afara lacătului
+        for event in events:
+            self._categories._send(*event)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            with self._pool_lock:
+                readers, self._readers = self._readers, []
+            for conn in readers:
+                conn.close()
+
+class ReadConnection:
+    """ A pooled reader with the same query helpers as Database, so functions taking db= accept either """
+
+    def __init__(self, conn, db=None):
+        self.conn = conn
+        self.db = db
+
+    @property
+    def categories(self):
+        # registrul din memorie este al bazei principale
+        return self.db.categories
+
+    def execute(self, sql, params=()):
+        with span(sql, "sql"):
+            return self.conn.execute(sql, params)
+
+    def fetchall(self, sql, params=()):
+        with span(sql, "sql") as s:
+            rows = self.conn.execute(sql, params).fetchall()
+            s.set(rows=len(rows))
+            return rows
+
+    def fetchone(self, sql, params=()):
+        with span(sql, "sql"):
+            return self.conn.execute(sql, params).fetchone()
+
+    def data_version(self):
+        return self.db.data_version()
+
+    def interrupt(self):
+        # sigur de apelat din alt fir; query-ul în curs se oprește cu OperationalError
+        self.conn.interrupt()
+
+_default_db = None
+
+def get_db():
+    global _default_db
+    if _default_db is None:
+        _default_db = Database(DB_FILE)
+    return _default_db
+
+def use_database(path):
+    """ Point the shared connection at another database file """
+    global _default_db
+    if _default_db is not None:
+        _default_db.close()
+    _default_db = Database(path)
+    return _default_db
+
+# -------------------- ENCODING --------------------
+# operatiuni păstrează doar întregi: tip 0/1, suma în bani, data ca număr de zi (date.toordinal())
+TIP_NAMES = ("Venit", "Cheltuială")
+OTHER_CATEGORY = "Altele"
+ORDINAL_JD = 1721424.5      # date.toordinal() + ORDINAL_JD = ziua iuliană folosită de date() / julianday()
+
+SQL_TIP_CODE = "CASE {x} WHEN 'Venit' THEN 0 ELSE 1 END"
+SQL_TIP_NAME = "CASE {x} WHEN 0 THEN 'Venit' ELSE 'Cheltuială' END"
+SQL_DAY = f"CAST(julianday({{x}}) - {ORDINAL_JD} AS INTEGER)"
+SQL_DATE = f"date({{x}} + {ORDINAL_JD})"
+SQL_BANI = "CAST(round({x} * 100) AS INTEGER)"
+
+def tip_code(tip):
+    return 0 if tip == "Venit" else 1
+
+def day_number(d):
+    """ ISO date text or date -> the integer day stored in operatiuni.zi """
+    if isinstance(d, str):
+        d = date.fromisoformat(d)
+    return d.toordinal()
+
+def day_text(zi):
+    return date.fromordinal(zi).isoformat()
+
+def to_bani(suma):
+    # rotunjire la jumătate departe de zero, ca round() din SQLite
+    bani = int(abs(suma) * 100 + 0.5)
+    return -bani if suma < 0 else bani
+
+# -------------------- SCHEMA / MIGRATIONS --------------------
+DEFAULT_CATEGORIES = [
+    ('Salariu', 'Venit'), ('Investiții', 'Venit'), ('Cadouri', 'Venit'),
+    ('Mâncare', 'Cheltuială'), ('Transport', 'Cheltuială'),
+    ('Facturi', 'Cheltuială'), ('Divertisment', 'Cheltuială'),
+    ('Sănătate', 'Cheltuială'), ('Altele', 'Cheltuială')
+]
+
+def _migrate_1(c):
+    """ Original layout: text dates and categories, REAL amounts """
+    c.execute("CREATE TABLE IF NOT EXISTS tranzactii (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT, tip TEXT, categorie TEXT, suma REAL, descriere TEXT)")
+    c.execute("CREATE TABLE IF NOT EXISTS categorii (id INTEGER PRIMARY KEY AUTOINCREMENT, nume TEXT UNIQUE, tip TEXT)")
+
+def _migrate_2(c):
+    """ Normalized layout: operatiuni with integer keys, bani and day numbers; tranzactii becomes a view """
+    # totalurile pe text și triggerele lor se refac mai jos pe chei întregi
+    for name in ("trg_agregat_insert", "trg_agregat_delete", "trg_agregat_update"):
+        c.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for name in ("agregat_zi", "agregat_luna", "agregat_categorie", "agregat_pauza"):
+        c.execute(f"DROP TABLE IF EXISTS {name}")
+
+    c.execute("""CREATE TABLE categorii_v2 (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nume TEXT UNIQUE,                                   -- NULL după ștergere
+        tip INTEGER NOT NULL,                               -- 0 Venit, 1 Cheltuială
+        mutata_in INTEGER REFERENCES categorii(id))         -- categoria care preia tranzacțiile după ștergere""")
+    tip = SQL_TIP_CODE.format(x="tip")
+    c.execute(f"INSERT INTO categorii_v2 (id, nume, tip) SELECT id, nume, {tip} FROM categorii WHERE nume IS NOT NULL")
+    # categorii folosite în tranzacții dar lipsă din tabel
+    c.execute(f"INSERT OR IGNORE INTO categorii_v2 (nume, tip) SELECT categorie, MIN({tip}) FROM tranzactii "
+              "WHERE categorie IS NOT NULL GROUP BY categorie")
+    c.execute("INSERT OR IGNORE INTO categorii_v2 (nume, tip) VALUES (?, 1)", (OTHER_CATEGORY,))
+    c.execute("DROP TABLE categorii")
+    c.execute("ALTER TABLE categorii_v2 RENAME TO categorii")
+
+    c.execute("""CREATE TABLE operatiuni (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        zi INTEGER NOT NULL,                                -- date.toordinal()
+        tip INTEGER NOT NULL,
+        categorie_id INTEGER NOT NULL REFERENCES categorii(id),
+        bani INTEGER NOT NULL,
+        descriere TEXT NOT NULL DEFAULT '')""")
+    c.execute(f"""INSERT INTO operatiuni (id, zi, tip, categorie_id, bani, descriere)
+        SELECT t.id, {SQL_DAY.format(x="t.data")}, {SQL_TIP_CODE.format(x="t.tip")},
+               COALESCE(c.id, (SELECT id FROM categorii WHERE nume = ?)),
+               {SQL_BANI.format(x="COALESCE(t.suma, 0)")}, COALESCE(t.descriere, '')
+        FROM tranzactii t LEFT JOIN categorii c ON c.nume = t.categorie
+        WHERE julianday(t.data) IS NOT NULL ORDER BY t.id""", (OTHER_CATEGORY,))
+    # rândurile cu date ilizibile rămân deoparte pentru corectare manuală
+    if c.execute("SELECT 1 FROM tranzactii WHERE julianday(data) IS NULL LIMIT 1").fetchone():
+        c.execute("CREATE TABLE tranzactii_invalide AS SELECT * FROM tranzactii WHERE julianday(data) IS NULL")
+    # id-urile noi continuă după cele vechi, chiar dacă ultimele rânduri fuseseră șterse
+    last = c.execute("SELECT MAX(seq) FROM sqlite_sequence WHERE name IN ('tranzactii', 'operatiuni')").fetchone()[0]
+    c.execute("DELETE FROM sqlite_sequence WHERE name = 'operatiuni'")
+    if last:
+        c.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('operatiuni', ?)", (last,))
+    c.execute("DROP TABLE tranzactii")
+
+    c.execute("CREATE INDEX idx_operatiuni_zi ON operatiuni(zi)")
+    c.execute("CREATE INDEX idx_operatiuni_categorie_zi ON operatiuni(categorie_id, zi)")
+    _create_view(c)
+    init_aggregates(c)
+
+def _view_select(source="operatiuni"):
+    return f"""SELECT o.id AS id, {SQL_DATE.format(x="o.zi")} AS data, {SQL_TIP_NAME.format(x="o.tip")} AS tip,
+               COALESCE(m.nume, c.nume) AS categorie, o.bani / 100.0 AS suma, o.descriere AS descriere,
+               o.zi AS zi, o.categorie_id AS categorie_id, o.tip AS tip_cod, o.bani AS bani
+        FROM {source} o
+        JOIN categorii c ON c.id = o.categorie_id
+        LEFT JOIN categorii m ON m.id = c.mutata_in"""
+
+def _create_view(c):
+    """ tranzactii keeps the old columns (plus zi, categorie_id, tip_cod and bani) for the UI, export and ad-hoc SQL """
+    c.execute(f"CREATE VIEW tranzactii AS\n        {_view_select()}")
+    # scrierile prin view (SQL vechi) ajung în operatiuni; aplicația folosește direct funcțiile de mai jos
+    cat_id = "(SELECT id FROM categorii WHERE nume = NEW.categorie)"
+    ensure_cat = f"INSERT OR IGNORE INTO categorii (nume, tip) VALUES (NEW.categorie, {SQL_TIP_CODE.format(x='NEW.tip')});"
+    c.execute(f"""CREATE TRIGGER tranzactii_insert INSTEAD OF INSERT ON tranzactii BEGIN
+        {ensure_cat}
+        INSERT INTO operatiuni (id, zi, tip, categorie_id, bani, descriere)
+        VALUES (NEW.id, {SQL_DAY.format(x="NEW.data")}, {SQL_TIP_CODE.format(x="NEW.tip")}, {cat_id},
+                {SQL_BANI.format(x="NEW.suma")}, COALESCE(NEW.descriere, ''));
+    END""")
+    c.execute(f"""CREATE TRIGGER tranzactii_update INSTEAD OF UPDATE ON tranzactii BEGIN
+        {ensure_cat}
+        UPDATE operatiuni SET zi = {SQL_DAY.format(x="NEW.data")}, tip = {SQL_TIP_CODE.format(x="NEW.tip")},
+            categorie_id = CASE WHEN NEW.categorie IS OLD.categorie THEN categorie_id ELSE {cat_id} END,
+            bani = {SQL_BANI.format(x="NEW.suma")}, descriere = COALESCE(NEW.descriere, '')
+        WHERE id = OLD.id;
+    END""")
+    c.execute("CREATE TRIGGER tranzactii_delete INSTEAD OF DELETE ON tranzactii BEGIN "
+              "DELETE FROM operatiuni WHERE id = OLD.id; END")
+
+def _migrate_3(c):
+    """ Undo journal: batch deletes copy their rows here first """
+    c.execute("""CREATE TABLE loturi_sterse (
+        lot INTEGER PRIMARY KEY,
+        sters_la INTEGER NOT NULL,                          -- secunde unix
+        nr INTEGER NOT NULL)""")
+    c.execute("""CREATE TABLE jurnal_stergeri (
+        lot INTEGER NOT NULL REFERENCES loturi_sterse(lot),
+        id INTEGER NOT NULL,
+        zi INTEGER NOT NULL,
+        tip INTEGER NOT NULL,
+        categorie_id INTEGER NOT NULL,
+        bani INTEGER NOT NULL,
+        descriere TEXT NOT NULL)""")
+    c.execute("CREATE INDEX idx_jurnal_stergeri_lot ON jurnal_stergeri(lot)")
+
+# fără conținut propriu: textul rămâne doar în operatiuni; remove_diacritics 2 acoperă ă â î ș ț (și ş ţ cu sedilă)
+SEARCH_OPTIONS = "descriere, content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+
+def _migrate_4(c):
+    """ Full-text index over descriere, kept in sync by triggers """
+    c.execute(f"CREATE VIRTUAL TABLE cautare USING fts5({SEARCH_OPTIONS})")
+    delete = "INSERT INTO cautare (cautare, rowid, descriere) VALUES ('delete', OLD.id, OLD.descriere);"
+    insert = "INSERT INTO cautare (rowid, descriere) VALUES (NEW.id, NEW.descriere);"
+    c.execute(f"CREATE TRIGGER trg_cautare_insert AFTER INSERT ON operatiuni BEGIN {insert} END")
+    c.execute(f"CREATE TRIGGER trg_cautare_delete AFTER DELETE ON operatiuni BEGIN {delete} END")
+    c.execute(f"CREATE TRIGGER trg_cautare_update AFTER UPDATE OF descriere ON operatiuni BEGIN {delete} {insert} END")
+    c.execute("INSERT INTO cautare (rowid, descriere) SELECT id, descriere FROM operatiuni")
+
+def _migrate_5(c):
+    """ Registry of the closed years moved into their own files (see ARCHIVE) """
+    c.execute("""CREATE TABLE arhive (
+        an INTEGER PRIMARY KEY,
+        fisier TEXT NOT NULL,                               -- relativ la dosarul bazei principale
+        nr INTEGER NOT NULL,
+        arhivat_la INTEGER NOT NULL)""")
+
+# coloanele sortabile din listă care nu au deja un index: (coloană, zi), rowid-ul completează cheia
+SORT_INDEXES = {
+    "idx_operatiuni_tip_zi": "operatiuni(tip, zi)",
+    "idx_operatiuni_bani_zi": "operatiuni(bani, zi)",
+    "idx_operatiuni_descriere_zi": "operatiuni(descriere COLLATE NOCASE, zi)",
+}
+
+def _migrate_6(c):
+    """ Indexes for sorting the list by type, amount and description; the view exposes tip_cod and bani """
+    c.execute("DROP VIEW tranzactii")       # triggerele INSTEAD OF dispar odată cu view-ul
+    _create_view(c)
+    for name, table in SORT_INDEXES.items():
+        c.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}")
+    # arhivele deja create primesc aceiași indecși, fiecare pe conexiunea ei
+    folder = os.path.dirname(next(f for _, name, f in c.execute("PRAGMA database_list") if name == "main"))
+    for fisier, in c.execute("SELECT fisier FROM arhive").fetchall():
+        path = os.path.join(folder, fisier)
+        if os.path.exists(path):
+            with closing(sqlite3.connect(path)) as part:
+                _create_partition(part, "main")
+                part.commit()
+
+def _migrate_7(c):
+    """ The search insert trigger can be paused, so bulk_insert fills cautare with one statement per batch """
+    c.execute("CREATE TABLE IF NOT EXISTS cautare_pauza (x INTEGER)")
+    c.execute("DROP TRIGGER IF EXISTS trg_cautare_insert")
+    c.execute("CREATE TRIGGER trg_cautare_insert AFTER INSERT ON operatiuni WHEN NOT EXISTS (SELECT 1 FROM cautare_pauza) "
+              "BEGIN INSERT INTO cautare (rowid, descriere) VALUES (NEW.id, NEW.descriere); END")
+
+MIGRATIONS = [_migrate_1, _migrate_2, _migrate_3, _migrate_4, _migrate_5, _migrate_6, _migrate_7]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate(db=None):
+    """ Bring the file up to SCHEMA_VERSION (PRAGMA user_version), one transaction per step; returns the old version """
+    db = db or get_db()
+    version = db.fetchone("PRAGMA user_version")[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Baza de date are schema v{version}, mai nouă decât aplicația (v{SCHEMA_VERSION}).")
+    for step in range(version, SCHEMA_VERSION):
+        with db.transaction() as c:
+            MIGRATIONS[step](c)
+            c.execute(f"PRAGMA user_version = {step + 1}")
+    if version < SCHEMA_VERSION and db._categories is not None:
+        db._categories.invalidate()
+    return version
+
+def init_db(db=None):
+    """ Migrate the file; the default categories are added only when the schema was just created or upgraded,
+    so an up-to-date file costs one PRAGMA read and the categories the user deleted stay deleted """
+    db = db or get_db()
+    if migrate(db) < SCHEMA_VERSION:
+        with db.transaction() as c:
+            c.executemany('INSERT OR IGNORE INTO categorii (nume, tip) VALUES (?,?)',
+                          [(name, tip_code(tip)) for name, tip in DEFAULT_CATEGORIES])
+
+# -------------------- CATEGORIES --------------------
+class CategoryRegistry:
+    """ The `categorii` table loaded once and kept in memory as sorted per-type lists.
+    add/delete/rename write through to SQLite and notify subscribers with (event, name, tip),
+    event being 'add', 'delete', 'rename' (name is the new name) or 'reload'. """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = db._lock       # același lacăt ca baza de date: fără inversiuni de ordine
+        # (nume -> tip, nume -> id, tip -> nume sortate, id -> id-urile categoriilor șterse mutate în ea);
+        # scrierile înlocuiesc tot tuplul, așa că citirile nu iau lacătul și nu așteaptă o tranzacție lungă
+        self._tables = None
+        self._listeners = []
+
+    def _ensure(self):
+        """ The loaded tables; reading them from SQLite needs the lock, looking them up afterwards does not """
+        tables = self._tables
+        if tables is None:
+            with self._lock:
+                if self._tables is None:
+                    tips, ids, by_tip, redirects = {}, {}, {}, {}
+                    for cid, name, tip, moved in self.db.fetchall("SELECT id, nume, tip, mutata_in FROM categorii"):
+                        if moved is not None:
+                            redirects.setdefault(moved, []).append(cid)
+                        if name is None:
+                            continue
+                        tip = TIP_NAMES[tip]
+                        tips[name], ids[name] = tip, cid
+                        by_tip.setdefault(tip, []).append(name)
+                    for names in by_tip.values():
+                        names.sort()
+                    self._tables = tips, ids, by_tip, redirects
+                tables = self._tables
+        return tables
+
+    def _copy(self):
+        # copie pentru o scriere (sub lacăt); listele din by_tip se copiază doar când se modifică
+        tips, ids, by_tip, redirects = self._ensure()
+        return dict(tips), dict(ids), dict(by_tip), dict(redirects)
+
+    def invalidate(self):
+        with self._lock:
+            self._tables = None
+
+    def reload(self):
+        with self._lock:
+            self._tables = None
+            self._ensure()
+        self._notify("reload", None, None)
+
+    def names(self, tip=None):
+        by_tip = self._ensure()[2]
+        if tip:
+            return list(by_tip.get(tip, []))
+        return [n for t in sorted(by_tip) for n in by_tip[t]]
+
+    def tip_of(self, name):
+        return self._ensure()[0].get(name)
+
+    def id_of(self, name):
+        return self._ensure()[1].get(name)
+
+    def ids_for(self, name):
+        """ Ids whose transactions show under this name: its own plus the deleted categories moved into it """
+        _, ids, _, redirects = self._ensure()
+        cid = ids.get(name)
+        return [] if cid is None else [cid] + redirects.get(cid, [])
+
+    def __contains__(self, name):
+        return self.tip_of(name) is not None
+
+    def add(self, name, tip):
+        with self._lock:
+            if name in self._ensure()[0]:
+                return False
+            self.db.execute('INSERT OR IGNORE INTO categorii (nume,tip) VALUES (?,?)', (name, tip_code(tip)))
+            cid, code = self.db.fetchone('SELECT id, tip FROM categorii WHERE nume=?', (name,))
+            tip = TIP_NAMES[code]
+            tips, ids, by_tip, redirects = self._copy()
+            tips[name], ids[name] = tip, cid
+            by_tip[tip] = sorted(by_tip.get(tip, []) + [name])
+            self._tables = tips, ids, by_tip, redirects
+        self._notify("add", name, tip)
+        return True
+
+    def delete(self, name):
+        """ One row changes: the name is cleared and the category points at 'Altele', which then shows its transactions """
+        if name == OTHER_CATEGORY:
+            raise ValueError("Categoria 'Altele' nu poate fi ștearsă.")
+        self.add(OTHER_CATEGORY, "Cheltuială")
+        with self._lock:
+            tips, ids, by_tip, redirects = self._copy()
+            cid = ids.get(name)
+            if cid is None:
+                return
+            other = ids[OTHER_CATEGORY]
+            with self.db.transaction() as c:
+                c.execute('UPDATE categorii SET mutata_in=? WHERE mutata_in=?', (other, cid))
+                c.execute('UPDATE categorii SET nume=NULL, mutata_in=? WHERE id=?', (other, cid))
+            redirects[other] = redirects.get(other, []) + redirects.pop(cid, []) + [cid]
+            del ids[name]
+            tip = tips.pop(name)
+            by_tip[tip] = [n for n in by_tip[tip] if n != name]
+            self._tables = tips, ids, by_tip, redirects
+        self._notify("delete", name, tip)
+
+    def rename(self, old, new):
+        with self._lock:
+            tips, ids, by_tip, redirects = self._copy()
+            cid = ids.get(old)
+            if cid is None or new in tips:
+                return False
+            self.db.execute('UPDATE categorii SET nume=? WHERE id=?', (new, cid))
+            ids[new] = ids.pop(old)
+            tip = tips[new] = tips.pop(old)
+            by_tip[tip] = sorted([n for n in by_tip[tip] if n != old] + [new])
+            self._tables = tips, ids, by_tip, redirects
+        self._notify("rename", new, tip)
+        return True
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        self._listeners.remove(callback)
+
+    def _notify(self, event, name, tip):
+        # în interiorul unei tranzacții evenimentul așteaptă COMMIT-ul ei (și se pierde la ROLLBACK)
+        with self._lock:
+            if self.db._depth:
+                self.db._pending.append((event, name, tip))
+                return
+        self._send(event, name, tip)
+
+    def _send(self, event, name, tip):
+        for callback in list(self._listeners):
+            callback(event, name, tip)
+
+def get_categories(tip=None, db=None):
+    return (db or get_db()).categories.names(tip)
+
+def add_category(name, tip, db=None):
+    return (db or get_db()).categories.add(name, tip)
+
+def delete_category(name, db=None):
+    (db or get_db()).categories.delete(name)
+
+def rename_category(old, new, db=None):
+    return (db or get_db()).categories.rename(old, new)
+
+def category_clause(name, db=None, column="categorie_id"):
+    """ (SQL predicate, params) matching a category by id, including the deleted categories moved into it """
+    ids = (db or get_db()).categories.ids_for(name) or [0]     # nume necunoscut: niciun rând
+    if len(ids) == 1:
+        return f"{column} = ?", ids
+    return f"{column} IN ({','.join('?' * len(ids))})", ids
+
+# -------------------- SEARCH --------------------
+def fold_text(text):
+    """ Lowercase without diacritics, the way the cautare tokenizer sees text """
+    return "".join(ch for ch in unicodedata.normalize("NFKD", text.lower()) if not unicodedata.combining(ch))
+
+def search_terms(text):
+    """ The words of text as the unicode61 tokenizer splits them: letters and digits, "_" is a separator """
+    return re.findall(r"[^\W_]+", fold_text(text or ""))
+
+# peste atâtea potriviri e mai ieftin să parcurgem idx_operatiuni_zi în ordinea afișării și să verificăm fiecare rând
+# decât să citim și să sortăm toate rândurile găsite; sub prag, indexul FTS conduce interogarea
+SEARCH_SCAN_MIN = 5000
+SEARCH_SOURCE = "SELECT rowid FROM cautare WHERE cautare MATCH ?"
+
+def search_clause(text, db=None, scan_min=SEARCH_SCAN_MIN):
+    """ (SQL predicate, params) over operatiuni / tranzactii: every word of `text` must start a word
+    of the description (FTS5 prefix query) or of the category name. Above scan_min estimated matches
+    the predicate only filters rows found through the other indexes instead of driving the query """
+    db = db or get_db()
+    categories = db.categories
+    names = [(name, search_terms(name)) for name in categories.names()]
+    # cuvintele care nu apar în nicio categorie merg într-o singură interogare FTS (AND implicit);
+    # cele care pot fi și nume de categorie primesc câte un OR pe categorie_id
+    words, groups = [], []
+    for term in search_terms(text):
+        ids = [cid for name, terms in names if any(w.startswith(term) for w in terms)
+               for cid in categories.ids_for(name)]
+        if ids:
+            groups.append((f'"{term}"*', ids))
+        else:
+            words.append(f'"{term}"*')
+    if words:
+        groups.insert(0, (" ".join(words), []))
+    hint = ""
+    if groups:
+        estimate = None
+        for query, ids in groups:
+            n = db.fetchone("SELECT COUNT(*) FROM cautare WHERE cautare MATCH ?", (query,))[0]
+            if ids:
+                n += db.fetchone(f"SELECT COALESCE(SUM(nr), 0) FROM agregat_categorie WHERE categorie_id IN "
+                                 f"({','.join('?' * len(ids))})", ids)[0]
+            estimate = n if estimate is None else min(estimate, n)
+        # "+" oprește folosirea coloanei ca index, deci planificatorul rămâne pe ordinea din idx_operatiuni_zi
+        hint = "+" if estimate > scan_min else ""
+    clauses, params = [], []
+    for query, ids in groups:
+        clause = f"{hint}id IN ({SEARCH_SOURCE})"
+        if ids:
+            clause = f"({clause} OR {hint}categorie_id IN ({','.join('?' * len(ids))}))"
+        clauses.append(clause)
+        params += [query] + ids
+    return " AND ".join(clauses), params
+
+# -------------------- TRANSACTIONS --------------------
+def insert_transaction(data, tip, categorie, suma, descriere="", db=None):
+    """ Insert one row, creating its category if needed; returns the new id """
+    db = db or get_db()
+    with db.transaction() as c:
+        db.categories.add(categorie, tip)
+        return c.execute("INSERT INTO operatiuni (zi,tip,categorie_id,bani,descriere) VALUES (?,?,?,?,?)",
+                         (day_number(data), tip_code(tip), db.categories.id_of(categorie),
+                          to_bani(suma), descriere or "")).lastrowid
+
+def update_transaction(tid, data, categorie, suma, descriere="", db=None):
+    db = db or get_db()
+    cid = db.categories.id_of(categorie)
+    if cid is None:
+        raise ValueError(f"Categorie necunoscută: {categorie}")
+    _reactivate([tid], db)
+    db.execute("UPDATE operatiuni SET zi=?, categorie_id=?, bani=?, descriere=? WHERE id=?",
+               (day_number(data), cid, to_bani(suma), descriere or "", tid))
+
+# -------------------- DELETE / UNDO --------------------
+# jurnalul păstrează loturile din ultimele UNDO_MAX_AGE_DAYS zile, cel mult UNDO_MAX_ROWS rânduri (lotul cel mai nou rămâne mereu)
+UNDO_MAX_AGE_DAYS = 30
+UNDO_MAX_ROWS = 200000
+OP_COLUMNS = "id, zi, tip, categorie_id, bani, descriere"
+
+def delete_transactions(ids, db=None):
+    """ Delete the ids with set-based statements in one transaction, copying the rows into the undo journal first;
+    returns the journal batch number, or None when none of the ids existed """
+    db = db or get_db()
+    ids = list(ids)
+    _reactivate(ids, db)
+    with db.transaction() as c:
+        c.execute("CREATE TEMP TABLE IF NOT EXISTS sterse_ids (id INTEGER PRIMARY KEY)")
+        c.execute("DELETE FROM temp.sterse_ids")
+        c.executemany("INSERT OR IGNORE INTO temp.sterse_ids VALUES (?)", ((tid,) for tid in ids))
+        lot = c.execute("INSERT INTO loturi_sterse (sters_la, nr) VALUES (?, 0)", (int(time.time()),)).lastrowid
+        n = c.execute(f"INSERT INTO jurnal_stergeri (lot, {OP_COLUMNS}) SELECT ?, {OP_COLUMNS} FROM operatiuni "
+                      "WHERE id IN (SELECT id FROM temp.sterse_ids)", (lot,)).rowcount
+        if not n:
+            c.execute("DELETE FROM loturi_sterse WHERE lot=?", (lot,))
+            return None
+        c.execute("UPDATE loturi_sterse SET nr=? WHERE lot=?", (n, lot))
+        with _aggregates_paused(c):
+            c.execute("DELETE FROM operatiuni WHERE id IN (SELECT id FROM temp.sterse_ids)")
+            _shift_aggregates(c, "jurnal_stergeri", "t.lot = ?", [lot], -1)
+        _trim_journal(c, lot)
+    return lot
+
+def undo_delete(lot=None, db=None):
+    """ Put a journaled batch (the newest by default) back with its original ids;
+    returns the restored (id, data, tip, categorie, suma, descriere) rows """
+    db = db or get_db()
+    with db.transaction() as c:
+        if lot is None:
+            lot = c.execute("SELECT MAX(lot) FROM loturi_sterse").fetchone()[0]
+            if lot is None:
+                return []
+        with _aggregates_paused(c):
+            c.execute(f"INSERT INTO operatiuni ({OP_COLUMNS}) SELECT {OP_COLUMNS} FROM jurnal_stergeri WHERE lot=?", (lot,))
+            _shift_aggregates(c, "jurnal_stergeri", "t.lot = ?", [lot], 1)
+        rows = c.execute("SELECT id,data,tip,categorie,suma,descriere FROM tranzactii "
+                         "WHERE id IN (SELECT id FROM jurnal_stergeri WHERE lot=?)", (lot,)).fetchall()
+        c.execute("DELETE FROM jurnal_stergeri WHERE lot=?", (lot,))
+        c.execute("DELETE FROM loturi_sterse WHERE lot=?", (lot,))
+    return rows
+
+def last_deleted(db=None):
+    """ (batch, row count) that undo_delete() would restore, or None """
+    return (db or get_db()).fetchone("SELECT lot, nr FROM loturi_sterse ORDER BY lot DESC LIMIT 1")
+
+def _trim_journal(c, newest):
+    cutoff = int(time.time()) - UNDO_MAX_AGE_DAYS * 86400
+    total, old = 0, []
+    for lot, sters_la, nr in c.execute("SELECT lot, sters_la, nr FROM loturi_sterse ORDER BY lot DESC").fetchall():
+        total += nr
+        if lot != newest and (sters_la < cutoff or total > UNDO_MAX_ROWS):
+            old.append((lot,))
+    if old:
+        c.executemany("DELETE FROM jurnal_stergeri WHERE lot=?", old)
+        c.executemany("DELETE FROM loturi_sterse WHERE lot=?", old)
+
+# -------------------- AGGREGATES --------------------
+# Totaluri pe zi, lună și categorie (separat pe Venit / Cheltuială), ținute la zi de triggere.
+AGGREGATE_TABLES = {
+    # tabel: (coloana cheie, expresia din operatiuni)
+    "agregat_zi": ("zi", "{t}.zi"),
+    "agregat_luna": ("luna", "CAST(strftime('%Y%m', {t}.zi + " + str(ORDINAL_JD) + ") AS INTEGER)"),   # AAAALL
+    "agregat_categorie": (None, None),
+}
+
+def _bucket_columns(table):
+    key = AGGREGATE_TABLES[table][0]
+    return ([key] if key else []) + ["categorie_id", "tip"]
+
+def _bucket_values(table, t):
+    expr = AGGREGATE_TABLES[table][1]
+    return ([expr.format(t=t)] if expr else []) + [f"{t}.categorie_id", f"{t}.tip"]
+
+def _aggregate_triggers():
+    add, sub = [], []
+    for table in AGGREGATE_TABLES:
+        cols = _bucket_columns(table)
+        new_vals = _bucket_values(table, "NEW")
+        old_vals = _bucket_values(table, "OLD")
+        add.append(f"INSERT INTO {table} ({', '.join(cols)}, bani, nr) VALUES ({', '.join(new_vals)}, NEW.bani, 1) "
+                   f"ON CONFLICT({', '.join(cols)}) DO UPDATE SET bani = bani + excluded.bani, nr = nr + 1;")
+        match = " AND ".join(f"{c} = {v}" for c, v in zip(cols, old_vals))
+        sub.append(f"UPDATE {table} SET bani = bani - OLD.bani, nr = nr - 1 WHERE {match};")
+        sub.append(f"DELETE FROM {table} WHERE nr <= 0 AND {match};")
+    add, sub = "\n".join(add), "\n".join(sub)
+    # agregat_pauza are un rând doar în blocurile _aggregates_paused (bulk_insert, ștergeri, undo)
+    when = "WHEN NOT EXISTS (SELECT 1 FROM agregat_pauza)"
+    return {
+        "trg_agregat_insert": f"AFTER INSERT ON operatiuni {when} BEGIN\n{add}\nEND",
+        "trg_agregat_delete": f"AFTER DELETE ON operatiuni {when} BEGIN\n{sub}\nEND",
+        "trg_agregat_update": f"AFTER UPDATE OF zi, tip, categorie_id, bani ON operatiuni {when} BEGIN\n{sub}\n{add}\nEND",
+    }
+
+def init_aggregates(c):
+    """ Create the summary tables and triggers; fill them from operatiuni the first time """
+    existing = {r[0] for r in c.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    c.execute("CREATE TABLE IF NOT EXISTS agregat_pauza (x INTEGER)")
+    for table in AGGREGATE_TABLES:
+        cols = _bucket_columns(table)
+        c.execute(f"CREATE TABLE IF NOT EXISTS {table} ({' INTEGER, '.join(cols)} INTEGER, bani INTEGER NOT NULL, nr INTEGER NOT NULL, "
+                  f"PRIMARY KEY ({', '.join(cols)})) WITHOUT ROWID")
+    for name, body in _aggregate_triggers().items():
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    if not set(AGGREGATE_TABLES) <= existing:
+        _fill_aggregates(c)
+
+def _expected_aggregates(table, source="operatiuni"):
+    cols = _bucket_columns(table)
+    vals = _bucket_values(table, "t")
+    return (f"SELECT {', '.join(vals)}, SUM(t.bani), COUNT(*) FROM {source} t "
+            f"GROUP BY {', '.join(str(i + 1) for i in range(len(cols)))}")
+
+def _fill_aggregates(c):
+    for table in AGGREGATE_TABLES:
+        cols = _bucket_columns(table)
+        c.execute(f"DELETE FROM {table}")
+        c.execute(f"INSERT INTO {table} ({', '.join(cols)}, bani, nr) {_expected_aggregates(table)}")
+
+@contextmanager
+def _aggregates_paused(c):
+    """ Inside an open transaction: the per-row aggregate triggers are skipped """
+    # agregat_pauza are un rând doar pe durata blocului
+    c.execute("INSERT INTO agregat_pauza VALUES (1)")
+    try:
+        yield
+    finally:
+        c.execute("DELETE FROM agregat_pauza")
+
+@contextmanager
+def _search_paused(c):
+    """ Inside an open transaction: rows inserted in the block are not indexed by trg_cautare_insert;
+    the caller adds them to cautare itself """
+    c.execute("INSERT INTO cautare_pauza VALUES (1)")
+    try:
+        yield
+    finally:
+        c.execute("DELETE FROM cautare_pauza")
+
+def _shift_aggregates(c, source, where, params, sign):
+    """ Add (sign=1) or subtract (sign=-1) the rows of `source` matching `where` to the summary tables, set-based """
+    for table in AGGREGATE_TABLES:
+        cols = ", ".join(_bucket_columns(table))
+        vals = ", ".join(_bucket_values(table, "t"))
+        group = ", ".join(str(i + 1) for i in range(len(_bucket_columns(table))))
+        c.execute(f"INSERT INTO {table} ({cols}, bani, nr) SELECT {vals}, {sign} * SUM(t.bani), {sign} * COUNT(*) "
+                  f"FROM {source} t WHERE {where} GROUP BY {group} "
+                  f"ON CONFLICT({cols}) DO UPDATE SET bani = bani + excluded.bani, nr = nr + excluded.nr", params)
+        if sign < 0:
+            c.execute(f"DELETE FROM {table} WHERE nr <= 0 AND ({cols}) IN (SELECT {vals} FROM {source} t WHERE {where})", params)
+
+def bulk_insert(rows, db=None):
+    """ Insert (data, tip, categorie, suma, descriere) rows whose categories already exist, in one transaction,
+    with the aggregate and search triggers paused: the summary tables are updated once from the batch, grouped
+    in Python, and cautare with one INSERT ... SELECT """
+    db = db or get_db()
+    cat_id = db.categories.id_of
+    ops = []
+    buckets = {table: {} for table in AGGREGATE_TABLES}
+    for data, tip, categorie, suma, descriere in rows:
+        d = date.fromisoformat(data)
+        op = (d.toordinal(), tip_code(tip), cat_id(categorie), to_bani(suma), descriere or "")
+        ops.append(op)
+        zi, code, cid, bani, _ = op
+        for table, key in (("agregat_zi", (zi, cid, code)),
+                           ("agregat_luna", (d.year * 100 + d.month, cid, code)),
+                           ("agregat_categorie", (cid, code))):
+            b = buckets[table].get(key)
+            if b:
+                b[0] += bani
+                b[1] += 1
+            else:
+                buckets[table][key] = [bani, 1]
+    with db.transaction() as c, _aggregates_paused(c), _search_paused(c):
+        # AUTOINCREMENT: rândurile noi au id-uri mai mari decât orice id existent
+        last = c.execute("SELECT COALESCE(MAX(id), 0) FROM operatiuni").fetchone()[0]
+        c.executemany("INSERT INTO operatiuni (zi,tip,categorie_id,bani,descriere) VALUES (?,?,?,?,?)", ops)
+        c.execute("INSERT INTO cautare (rowid, descriere) SELECT id, descriere FROM operatiuni WHERE id > ?", (last,))
+        for table, groups in buckets.items():
+            cols = _bucket_columns(table)
+            c.executemany(f"INSERT INTO {table} ({', '.join(cols)}, bani, nr) VALUES ({', '.join('?' * (len(cols) + 2))}) "
+                          f"ON CONFLICT({', '.join(cols)}) DO UPDATE SET bani = bani + excluded.bani, nr = nr + excluded.nr",
+                          [k + tuple(v) for k, v in groups.items()])
+    return len(ops)
+
+def rebuild_aggregates(db=None):
+    """ Recompute the summary tables from operatiuni and the archived years """
+    db = db or get_db()
+    schemas = [attach_partition(db, an) for an in archived_years(db)]
+    with db.transaction() as c:
+        _fill_aggregates(c)
+        for schema in schemas:
+            _shift_aggregates(c, f"{schema}.operatiuni", "1=1", [], 1)
+
+def verify_aggregates(db=None):
+    """ Compare the summary tables with a fresh GROUP BY over operatiuni and the archived years; return the mismatches """
+    db = db or get_db()
+    sources = ["main.operatiuni"] + [f"{attach_partition(db, an)}.operatiuni" for an in archived_years(db)]
+    problems = []
+    with db.transaction() as c:
+        for table in AGGREGATE_TABLES:
+            cols = _bucket_columns(table)
+            n = len(cols)
+            expected = {}
+            for source in sources:
+                for r in c.execute(_expected_aggregates(table, source)):
+                    b, nr = expected.get(r[:n], (0, 0))
+                    expected[r[:n]] = (b + r[n], nr + r[n + 1])
+            actual = {r[:n]: r[n:] for r in c.execute(f"SELECT {', '.join(cols)}, bani, nr FROM {table}")}
+            for key in expected.keys() | actual.keys():
+                e, a = expected.get(key, (0, 0)), actual.get(key, (0, 0))
+                if e != a:
+                    problems.append((table, key, e, a))
+    return problems
+
+def _aggregate_sources(start, end):
+    """ (table, WHERE clause, params) covering [start, end]: full months from agregat_luna,
+    the partial months at the edges from agregat_zi, everything from agregat_categorie """
+    if start is None:
+        return [("agregat_categorie", "1=1", [])]
+    sources = []
+    month_from = start if start.day == 1 else (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    month_to = (end + timedelta(days=1)).replace(day=1)   # exclusiv
+    if month_from < month_to:
+        sources.append(("agregat_luna", "luna >= ? AND luna < ?",
+                        [month_from.year * 100 + month_from.month, month_to.year * 100 + month_to.month]))
+        day_ranges = [(start, month_from - timedelta(days=1)), (month_to, end)]
+    else:
+        day_ranges = [(start, end)]
+    for a, b in day_ranges:
+        if a <= b:
+            sources.append(("agregat_zi", "zi BETWEEN ? AND ?", [a.toordinal(), b.toordinal()]))
+    return sources
+
+def aggregate_totals(start=None, end=None, category=None, db=None):
+    """ (count, income, expenses) for a date range and optional category, read from the summary tables """
+    db = db or get_db()
+    cat, cat_params = category_clause(category, db) if category else ("1=1", [])
+    count = bani_v = bani_c = 0
+    for table, where, params in _aggregate_sources(start, end):
+        for tip, bani, nr in db.fetchall(f"SELECT tip, bani, nr FROM {table} WHERE {where} AND {cat}", params + cat_params):
+            count += nr
+            if tip == 0:
+                bani_v += bani
+            else:
+                bani_c += bani
+    return count, bani_v / 100, bani_c / 100
+
+def category_totals(start=None, end=None, db=None):
+    """ {category: (count, income, expenses)} for a date range; deleted categories count under 'Altele' """
+    db = db or get_db()
+    totals = {}
+    for table, where, params in _aggregate_sources(start, end):
+        sql = (f"SELECT COALESCE(m.nume, c.nume), a.tip, SUM(a.bani), SUM(a.nr) FROM {table} a "
+               "JOIN categorii c ON c.id = a.categorie_id LEFT JOIN categorii m ON m.id = c.mutata_in "
+               f"WHERE {where} GROUP BY 1, 2")
+        for name, tip, bani, nr in db.fetchall(sql, params):
+            t = totals.setdefault(name, [0, 0, 0])
+            t[0] += nr
+            t[1 + tip] += bani
+    return {name: (n, v / 100, c / 100) for name, (n, v, c) in sorted(totals.items())}
+
+# -------------------- ARCHIVE --------------------
+# Anii încheiați se pot muta în fișiere separate, câte unul pe an (finante_2019.db lângă finante.db).
+# Fișierul principal păstrează categoriile, jurnalul de ștergeri și totalurile, care numără în continuare și
+# rândurile arhivate: soldurile, rapoartele și categoriile nu citesc arhivele. Doar interogările pe rânduri
+# (lista, căutarea, exportul) atașează cu ATTACH partițiile din perioada cerută.
+ARCHIVE_SCHEMA = "arhiva_{an}"
+MAX_ATTACHED = 8            # SQLite permite implicit 10 baze atașate pe o conexiune
+_attach_lock = threading.Lock()
+
+def _year_days(an):
+    return date(an, 1, 1).toordinal(), date(an, 12, 31).toordinal()
+
+def _main_file(db):
+    return next(f for _, name, f in db.fetchall("PRAGMA database_list") if name == "main")
+
+def archive_file(an, db=None):
+    """ Path of a year's partition, next to the main file: finante.db -> finante_2019.db """
+    base, ext = os.path.splitext(_main_file(db or get_db()))
+    return f"{base}_{an}{ext or '.db'}"
+
+def archived_years(db=None):
+    """ {year: partition file} for the years moved out of the main file """
+    db = db or get_db()
+    rows = db.fetchall("SELECT an, fisier FROM arhive ORDER BY an")
+    if not rows:
+        return {}
+    folder = os.path.dirname(_main_file(db))
+    return {an: os.path.join(folder, fisier) for an, fisier in rows}
+
+def _create_partition(c, schema):
+    """ operatiuni with the same columns and indexes (no triggers, no aggregates) and its own cautare index """
+    c.execute(f"""CREATE TABLE IF NOT EXISTS {schema}.operatiuni (
+        id INTEGER PRIMARY KEY,
+        zi INTEGER NOT NULL,
+        tip INTEGER NOT NULL,
+        categorie_id INTEGER NOT NULL,
+        bani INTEGER NOT NULL,
+        descriere TEXT NOT NULL DEFAULT '')""")
+    c.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_operatiuni_zi ON operatiuni(zi)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_operatiuni_categorie_zi ON operatiuni(categorie_id, zi)")
+    for name, table in SORT_INDEXES.items():
+        c.execute(f"CREATE INDEX IF NOT EXISTS {schema}.{name} ON {table}")
+    c.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.cautare USING fts5({SEARCH_OPTIONS})")
+
+def attach_partition(db, an, path=None, create=False):
+    """ ATTACH a year's partition to this connection (once) and return its schema name; the TEMP view
+    <schema>_tranzactii shows its rows like tranzactii, with the categories of the main file """
+    schema = ARCHIVE_SCHEMA.format(an=an)
+    with _attach_lock:
+        attached = [name for _, name, _ in db.fetchall("PRAGMA database_list")]
+        if schema in attached:
+            return schema
+        path = path or archive_file(an, db)
+        if not create and not os.path.exists(path):
+            raise FileNotFoundError(f"Lipsește fișierul arhivei {an}: {path}")
+        others = [name for name in attached if name.startswith("arhiva_")]
+        if len(others) >= MAX_ATTACHED:
+            for name in others:
+                try:
+                    db.execute(f"DETACH DATABASE {name}")
+                except sqlite3.OperationalError:
+                    pass        # folosită chiar acum de un cursor deschis
+        db.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        if create:
+            db.execute(f"PRAGMA {schema}.journal_mode=WAL")
+            with db.transaction() as c:
+                _create_partition(c, schema)
+        db.execute(f"CREATE TEMP VIEW IF NOT EXISTS {schema}_tranzactii AS {_view_select(schema + '.operatiuni')}")
+    return schema
+
+def closed_years(db=None, today=None):
+    """ {year: rows still in the main file} for the years before the current one """
+    db = db or get_db()
+    today = today or date.today()
+    first = db.fetchone("SELECT MIN(zi) FROM main.operatiuni")[0]
+    if first is None:
+        return {}
+    years = {}
+    for an in range(date.fromordinal(first).year, today.year):
+        n = db.fetchone("SELECT COUNT(*) FROM main.operatiuni WHERE zi BETWEEN ? AND ?", _year_days(an))[0]
+        if n:
+            years[an] = n
+    return years
+
+def archive_year(an, db=None, today=None):
+    """ Move a closed year's rows from the main file into its partition; returns the number of rows moved """
+    db = db or get_db()
+    today = today or date.today()
+    if an >= today.year:
+        raise ValueError(f"Anul {an} nu s-a încheiat și nu poate fi arhivat.")
+    days = _year_days(an)
+    if not db.fetchone("SELECT 1 FROM main.operatiuni WHERE zi BETWEEN ? AND ? LIMIT 1", days):
+        return 0
+    path = archive_file(an, db)
+    registered = an in archived_years(db)
+    schema = attach_partition(db, an, path, create=True)
+    year = "SELECT id FROM main.operatiuni WHERE zi BETWEEN ? AND ?"
+    with span("archive.year", "db", an=an) as s:
+        # în modul WAL un COMMIT pe mai multe fișiere nu e atomic: întâi se scrie copia din arhivă, apoi se
+        # șterge originalul; o întrerupere între cei doi pași lasă rândurile în ambele, iar o nouă arhivare le înlocuiește
+        with db.transaction() as c:
+            if not registered:
+                # fișier rămas după unarchive_year sau de la altă bază de date: nu are rânduri valabile
+                c.execute(f"DELETE FROM {schema}.operatiuni")
+                c.execute(f"INSERT INTO {schema}.cautare (cautare) VALUES ('delete-all')")
+            c.execute(f"INSERT INTO {schema}.cautare (cautare, rowid, descriere) SELECT 'delete', id, descriere "
+                      f"FROM {schema}.operatiuni WHERE id IN ({year})", days)
+            c.execute(f"DELETE FROM {schema}.operatiuni WHERE id IN ({year})", days)
+            n = c.execute(f"INSERT INTO {schema}.operatiuni ({OP_COLUMNS}) SELECT {OP_COLUMNS} FROM main.operatiuni "
+                          "WHERE zi BETWEEN ? AND ?", days).rowcount
+            c.execute(f"INSERT INTO {schema}.cautare (rowid, descriere) SELECT id, descriere FROM main.operatiuni "
+                      "WHERE zi BETWEEN ? AND ?", days)
+        with db.transaction() as c:
+            # totalurile rămân neschimbate: rândurile arhivate se numără în continuare
+            with _aggregates_paused(c):
+                c.execute("DELETE FROM main.operatiuni WHERE zi BETWEEN ? AND ?", days)
+            total = c.execute(f"SELECT COUNT(*) FROM {schema}.operatiuni").fetchone()[0]
+            c.execute("INSERT INTO arhive (an, fisier, nr, arhivat_la) VALUES (?, ?, ?, ?) ON CONFLICT(an) DO UPDATE "
+                      "SET nr = excluded.nr, arhivat_la = excluded.arhivat_la",
+                      (an, os.path.basename(path), total, int(time.time())))
+        s.set(rows=n)
+    return n
+
+def _restore_rows(db, an, where, params):
+    """ Move the rows of a partition matching where back into the main file; the totals already count them """
+    schema = attach_partition(db, an)
+    with db.transaction() as c, _aggregates_paused(c):
+        n = c.execute(f"INSERT INTO main.operatiuni ({OP_COLUMNS}) SELECT {OP_COLUMNS} FROM {schema}.operatiuni "
+                      f"WHERE {where}", params).rowcount
+    if n:
+        with db.transaction() as c:
+            c.execute(f"INSERT INTO {schema}.cautare (cautare, rowid, descriere) SELECT 'delete', id, descriere "
+                      f"FROM {schema}.operatiuni WHERE {where}", params)
+            c.execute(f"DELETE FROM {schema}.operatiuni WHERE {where}", params)
+            c.execute("UPDATE arhive SET nr = nr - ? WHERE an = ?", (n, an))
+    return n
+
+def _reactivate(ids, db):
+    """ Before an edit or delete: archived ids among `ids` go back into the main file, where the usual
+    triggers and the undo journal handle them; the main file may therefore hold rows of archived years """
+    years = archived_years(db)
+    if not years:
+        return 0
+    with db.transaction() as c:
+        c.execute("CREATE TEMP TABLE IF NOT EXISTS arhiva_ids (id INTEGER PRIMARY KEY)")
+        c.execute("DELETE FROM temp.arhiva_ids")
+        c.executemany("INSERT OR IGNORE INTO temp.arhiva_ids VALUES (?)", ((tid,) for tid in ids))
+        c.execute("DELETE FROM temp.arhiva_ids WHERE id IN (SELECT id FROM main.operatiuni)")
+        if not c.execute("SELECT 1 FROM temp.arhiva_ids LIMIT 1").fetchone():
+            return 0
+    moved = 0
+    for an in years:
+        moved += _restore_rows(db, an, "id IN (SELECT id FROM temp.arhiva_ids)", [])
+    return moved
+
+def unarchive_year(an, db=None):
+    """ Move a partition's rows back into the main file and forget the partition; the file stays, empty """
+    db = db or get_db()
+    if an not in archived_years(db):
+        return 0
+    n = _restore_rows(db, an, "1=1", [])
+    db.execute("DELETE FROM arhive WHERE an = ?", (an,))
+    return n
+
+# --- citire peste partiții ---
+def partition_where(where, schema):
+    """ The same predicate over a partition: the search subquery reads the partition's own cautare """
+    return where.replace(SEARCH_SOURCE, SEARCH_SOURCE.replace("FROM cautare", f"FROM {schema}.cautare"))
+
+def _and(where, clause):
+    return where + (" AND " if where else " WHERE ") + clause
+
+def _segments(years, bounds, order):
+    """ Consecutive (first, last, year or None) day ranges covering bounds in display order;
+    an archived year also reads its partition, the rest only the main file """
+    lo, hi = bounds or (1, date.max.toordinal())
+    out, cur = [], lo
+    for an in sorted(years):
+        first, last = _year_days(an)
+        if last < lo or first > hi:
+            continue
+        if cur < first:
+            out.append((cur, first - 1, None))
+        out.append((max(first, lo), min(last, hi), an))
+        cur = min(last, hi) + 1
+    if cur <= hi:
+        out.append((cur, hi, None))
+    return out[::-1] if order == "DESC" else out
+
+def partition_sources(bounds=None, db=None):
+    """ ("operatiuni" or "<schema>.operatiuni", schema or None) for the main file and every archived year
+    overlapping bounds (first, last day numbers), attached on the way """
+    db = db or get_db()
+    lo, hi = bounds or (1, date.max.toordinal())
+    sources = [("main.operatiuni", None)]
+    for an in archived_years(db):
+        first, last = _year_days(an)
+        if first <= hi and last >= lo:
+            schema = attach_partition(db, an)
+            sources.append((f"{schema}.operatiuni", schema))
+    return sources
+
+def partitioned_rows(columns, where="", params=(), bounds=None, order="DESC", limit=None, offset=0, db=None,
+                     slices=None):
+    """ Rows of tranzactii (the given columns) matching where, sorted on (zi, id), across the main file and the
+    archived years overlapping bounds. Segments are read one at a time in date order: an archived year merges
+    the main file and its partition with UNION ALL, so only one partition is attached per query.
+    slices: (clause, params) pieces read one after another, each in date order (e.g. one per category).
+    where must also be valid on operatiuni: offsets are counted and found there, on the indexes alone """
+    db = db or get_db()
+    params = list(params)
+    segments = _segments(archived_years(db), bounds, order)
+    if not any(an for _, _, an in segments):
+        segments = [(None, None, None)]     # fără arhive în perioadă: aceeași interogare ca înainte
+    slices = slices or [("", [])]
+    pieces = len(segments) * len(slices)
+    n = len(columns.split(","))
+    remaining = -1 if limit is None else limit
+    for clause, clause_params in slices:
+        slice_where, slice_params = (_and(where, clause), params + list(clause_params)) if clause else (where, params)
+        for first, last, an in segments:
+            if remaining == 0:
+                return
+            seg_where, seg_params = slice_where, slice_params
+            if first is not None:
+                seg_where, seg_params = _and(slice_where, "zi BETWEEN ? AND ?"), slice_params + [first, last]
+            schemas = ["main"] + ([attach_partition(db, an)] if an is not None else [])
+            if offset:
+                if pieces > 1:
+                    # bucățile sărite întregi se numără pe index, fără să fie citite
+                    size = sum(db.fetchone(f"SELECT COUNT(*) FROM {schema}.operatiuni{partition_where(seg_where, schema)}",
+                                           seg_params)[0] for schema in schemas)
+                    if offset >= size:
+                        offset -= size
+                        continue
+                key = _key_at(db, schemas, "zi", None, seg_where, seg_params, order, offset)
+                offset = 0
+                if key is None:
+                    continue
+                seg_where = _and(seg_where, f"(zi, id) {'<=' if order == 'DESC' else '>='} (?, ?)")
+                seg_params = seg_params + list(key[1:])
+            if len(schemas) == 1:
+                sql, args = f"SELECT {columns} FROM tranzactii{seg_where} ORDER BY zi {order}, id {order}", seg_params
+            else:
+                schema = schemas[1]
+                # ORDER BY pe numerele coloanelor: SQLite interclasează cele două ramuri, fiecare citită pe index
+                sql = (f"SELECT {columns}, zi, id FROM tranzactii{seg_where} UNION ALL "
+                       f"SELECT {columns}, zi, id FROM {schema}_tranzactii{partition_where(seg_where, schema)} "
+                       f"ORDER BY {n + 1} {order}, {n + 2} {order}")
+                args = seg_params + seg_params
+            got = 0
+            for row in db.execute(sql + " LIMIT ?", args + [remaining]):
+                got += 1
+                yield row if len(schemas) == 1 else row[:n]
+            if remaining > 0:
+                remaining = max(remaining - got, 0)
+
+def _key_at(db, schemas, sort, collate, where, params, order, offset):
+    """ (sort value, zi, id) of the row at offset in operatiuni of the given schemas, merged: only the covering
+    (sort, zi) index is read, not the view and its join with categorii for every skipped row """
+    collation = f" COLLATE {collate}" if collate else ""
+    column = TABLE_COLUMNS.get(sort, sort)
+    sql = " UNION ALL ".join(f"SELECT {column}, zi, id FROM {schema}.operatiuni{partition_where(where, schema)}"
+                             for schema in schemas)
+    return db.fetchone(sql + f" ORDER BY 1{collation} {order}, 2 {order}, 3 {order} LIMIT 1 OFFSET ?",
+                       list(params) * len(schemas) + [offset])
+
+# coloanele din tranzactii care în operatiuni au alt nume
+TABLE_COLUMNS = {"tip_cod": "tip"}
+_NOCASE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+def sort_value(value, collate=None):
+    """ value as SQLite compares it under a collation (NOCASE folds only A-Z) """
+    return value.translate(_NOCASE) if collate == "NOCASE" and value is not None else value
+
+def merged_rows(columns, sort, collate=None, where="", params=(), bounds=None, order="DESC", limit=None, offset=0,
+                db=None):
+    """ Rows of tranzactii sorted on (sort, zi, id), sort being an indexed column of the view, across the main
+    file and the archived years overlapping bounds, merged by one UNION ALL (groups of MAX_ATTACHED files).
+    With an offset, where must also be valid on operatiuni (see partitioned_rows) """
+    db = db or get_db()
+    params = list(params)
+    lo, hi = bounds or (1, date.max.toordinal())
+    sources = ["main"] + [an for an in archived_years(db) if _year_days(an)[0] <= hi and _year_days(an)[1] >= lo]
+    groups = [sources[i:i + MAX_ATTACHED] for i in range(0, len(sources), MAX_ATTACHED)]
+    n = len(columns.split(","))
+    collation = f" COLLATE {collate}" if collate else ""
+
+    def schemas(group):
+        return [s if s == "main" else attach_partition(db, s) for s in group]
+
+    if offset:
+        # poziția se găsește pe indexul (sort, zi), apoi citirea pornește de la cheia ei
+        keys = [_key_at(db, schemas(group), sort, collate, where, params, order, offset) if len(groups) == 1 else None
+                for group in groups]
+        if len(groups) > 1:
+            column = TABLE_COLUMNS.get(sort, sort)
+            found = []
+            for group in groups:
+                arms = " UNION ALL ".join(f"SELECT {column}, zi, id FROM {schema}.operatiuni{partition_where(where, schema)}"
+                                          for schema in schemas(group))
+                found.append(db.fetchall(arms + f" ORDER BY 1{collation} {order}, 2 {order}, 3 {order} LIMIT ?",
+                                         params * len(group) + [offset + 1]))
+            merged = heapq.merge(*found, key=lambda r: (sort_value(r[0], collate), r[1], r[2]), reverse=order == "DESC")
+            keys = [next(itertools.islice(merged, offset, None), None)]
+        if keys[0] is None:
+            return
+        where = _and(where, f"({sort}{collation}, zi, id) {'<=' if order == 'DESC' else '>='} (?, ?, ?)")
+        params = params + list(keys[0])
+
+    def query(group, lim):
+        arms = [f"SELECT {columns}, {sort}, zi, id FROM "
+                + (f"tranzactii{where}" if schema == "main" else f"{schema}_tranzactii{partition_where(where, schema)}")
+                for schema in schemas(group)]
+        sql = " UNION ALL ".join(arms) + f" ORDER BY {n + 1}{collation} {order}, {n + 2} {order}, {n + 3} {order} LIMIT ?"
+        return db.execute(sql, params * len(group) + [lim])
+
+    lim = -1 if limit is None else limit
+    if len(groups) == 1:
+        for row in query(groups[0], lim):
+            yield row[:n]
+        return
+    # peste MAX_ATTACHED fișiere: fiecare grup se citește întreg (atașările se schimbă între grupuri), apoi se interclasează
+    results = [query(group, lim).fetchall() for group in groups]
+    merged = heapq.merge(*results, key=lambda r: (sort_value(r[n], collate), r[n + 1], r[n + 2]), reverse=order == "DESC")
+    for row in itertools.islice(merged, limit):
+        yield row[:n]
+
+# -------------------- RUN --------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Întreținere finante.db")
+    ap.add_argument("--db", default=DB_FILE, help="fișierul bazei de date")
+    ap.add_argument("--rebuild-aggregates", action="store_true", help="recalculează tabelele de totaluri din operatiuni")
+    ap.add_argument("--verify-aggregates", action="store_true", help="compară tabelele de totaluri cu operatiuni")
+    ap.add_argument("--archive-year", type=int, action="append", default=[], metavar="AN",
+                    help="mută un an încheiat într-un fișier separat (se poate repeta)")
+    ap.add_argument("--archive-before", type=int, metavar="AN", help="arhivează toți anii încheiați dinaintea lui AN")
+    ap.add_argument("--unarchive", type=int, action="append", default=[], metavar="AN", help="readuce un an arhivat în fișierul principal")
+    ap.add_argument("--list-archives", action="store_true", help="listează anii arhivați")
+    args = ap.parse_args(argv)
+    db = use_database(args.db)
+    init_db(db)
+    years = list(args.archive_year)
+    if args.archive_before:
+        years += [an for an in closed_years(db) if an < args.archive_before and an not in years]
+    for an in sorted(years):
+        print(f"{an}: {archive_year(an, db)} tranzacții mutate în {archive_file(an, db)}")
+    for an in args.unarchive:
+        print(f"{an}: {unarchive_year(an, db)} tranzacții readuse în fișierul principal")
+    if args.list_archives:
+        for an, path in archived_years(db).items():
+            nr = db.fetchone("SELECT nr FROM arhive WHERE an=?", (an,))[0]
+            print(f"{an}  {nr:>10} tranzacții  {path}")
+    if args.rebuild_aggregates:
+        rebuild_aggregates(db)
+        print("Totalurile au fost recalculate.")
+    if args.verify_aggregates:
+        problems = verify_aggregates(db)
+        for table, key, expected, actual in problems:
+            print(f"{table} {key}: așteptat suma={expected[0] / 100:.2f} nr={expected[1]}, găsit suma={actual[0] / 100:.2f} nr={actual[1]}")
+        print("Totalurile sunt corecte." if not problems else f"{len(problems)} diferențe găsite.")
+        return 1 if problems else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
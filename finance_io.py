@@ -0,0 +1,302 @@
+import argparse
+import csv
+import gzip
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime
+
+from finance_db import (DB_FILE, get_db, use_database, init_db, get_categories, add_category, bulk_insert, day_number,
+                        partitioned_rows)
+
+EXPORT_HEADER = ["Data", "Tip", "Categorie", "Sumă", "Descriere"]
+EXPORT_COLUMNS = "data,tip,categorie,suma,descriere"
+BATCH_SIZE = 2000
+
+def open_text(path, mode, encoding="utf-8"):
+    """ Text file handle; '.gz' paths are transparently gzip-compressed """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", newline="", encoding=encoding)
+    return open(path, mode, newline="", encoding=encoding)
+
+# -------------------- EXPORT --------------------
+def export_csv(path, where="", params=(), db=None, batch_size=BATCH_SIZE, progress=None, cancel=None, bounds=None):
+    """ Stream the rows matching a filter into a CSV file, batch by batch, newest first; bounds (first, last day
+    numbers) limits the archived years read. Returns the number of rows written, or None if `cancel` was set. """
+    db = db or get_db()
+    written = 0
+    cancelled = False
+    with db.reader() as conn, open_text(path, "w") as f:
+        w = csv.writer(f)
+        w.writerow(EXPORT_HEADER)
+        rows = partitioned_rows(EXPORT_COLUMNS, where, params, bounds, db=conn)
+        try:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    cancelled = True
+                    break
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                w.writerows(batch)
+                written += len(batch)
+                if progress:
+                    progress(written)
+        finally:
+            rows.close()
+    if cancelled:
+        os.remove(path)
+        return None
+    return written
+
+# -------------------- IMPORT --------------------
+IMPORT_BATCH = 50000
+MAX_REPORTED_ERRORS = 20
+
+# Aceeași structură ca export_csv; pentru extrase bancare se dă un fișier JSON cu aceleași chei.
+DEFAULT_MAPPING = {
+    "columns": {"data": "Data", "tip": "Tip", "categorie": "Categorie", "suma": "Sumă", "descriere": "Descriere"},
+    "date_formats": ["%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y"],
+    "decimal": ".",
+    "delimiter": ",",
+    "encoding": "utf-8-sig",
+    "default_category": "Altele",
+}
+
+class InvalidRow(ValueError):
+    pass
+
+def load_mapping(path=None, **overrides):
+    """ DEFAULT_MAPPING updated from a JSON file and/or keyword overrides """
+    mapping = dict(DEFAULT_MAPPING)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            mapping.update(json.load(f))
+    mapping.update({k: v for k, v in overrides.items() if v is not None})
+    return mapping
+
+def _date_parser(formats):
+    cache = {}
+
+    def parse(value):
+        value = value.strip()
+        if value in cache:
+            return cache[value]
+        for fmt in formats:
+            try:
+                if fmt == "%Y-%m-%d":
+                    d = date.fromisoformat(value)
+                else:
+                    d = datetime.strptime(value, fmt).date()
+                break
+            except ValueError:
+                continue
+        else:
+            raise InvalidRow(f"dată invalidă: {value!r}")
+        cache[value] = iso = d.isoformat()
+        return iso
+    return parse
+
+MAX_AMOUNT = 1e15       # în bani încape în INTEGER-ul de 64 de biți al SQLite
+
+def parse_amount(value, decimal="."):
+    """ '1.234,56 RON' / '-1,234.56' / '(12.50)' -> float; the sign is kept """
+    amount = None
+    if decimal == ".":
+        try:
+            amount = float(value)
+        except ValueError:
+            pass
+    if amount is None:
+        v = value.strip().replace("RON", "").replace("lei", "").replace(" ", "").replace("\xa0", "")
+        negative = v.startswith("(") and v.endswith(")")
+        v = v.strip("()")
+        if decimal == ",":
+            v = v.replace(".", "").replace(",", ".")
+        else:
+            v = v.replace(",", "")
+        try:
+            amount = float(v)
+        except ValueError:
+            raise InvalidRow(f"sumă invalidă: {value!r}") from None
+        if negative:
+            amount = -amount
+    # float() acceptă și "nan", "inf", "1e400": ar opri bulk_insert cu tot lotul
+    if not math.isfinite(amount) or abs(amount) >= MAX_AMOUNT:
+        raise InvalidRow(f"sumă invalidă: {value!r}")
+    return amount
+
+TIP_VALUES = {"Venit": "Venit", "Cheltuială": "Cheltuială"}
+
+def normalize_tip(value):
+    if value in TIP_VALUES:
+        return TIP_VALUES[value]
+    v = value.strip().lower()
+    if v.startswith("venit") or v in ("income", "credit"):
+        return "Venit"
+    if v.startswith("chelt") or v in ("expense", "debit"):
+        return "Cheltuială"
+    raise InvalidRow(f"tip invalid: {value!r}")
+
+def row_hash(data, tip, categorie, suma, descriere):
+    # hash-ul e folosit doar în procesul curent, deci hash() pe conținutul normalizat ajunge
+    return hash((data, tip, categorie, round(suma * 100), descriere or ""))
+
+def _read_rows(reader, mapping, stats):
+    header = next(reader, [])
+    cols = mapping["columns"]
+    missing = [cols[k] for k in ("data", "suma") if cols.get(k) not in header]
+    if missing:
+        raise ValueError(f"Lipsesc coloanele: {', '.join(missing)}")
+    pos = {k: header.index(v) for k, v in cols.items() if v in header}
+    parse_date = _date_parser(mapping["date_formats"])
+    decimal = mapping["decimal"]
+    default_category = mapping["default_category"]
+    i_data, i_suma = pos["data"], pos["suma"]
+    i_tip, i_cat, i_desc = pos.get("tip"), pos.get("categorie"), pos.get("descriere")
+    width = len(header)
+    for rec in reader:
+        stats["read"] += 1
+        try:
+            if len(rec) < width:
+                rec += [""] * (width - len(rec))
+            d = parse_date(rec[i_data])
+            amount = parse_amount(rec[i_suma], decimal)
+            # fără coloană de tip (extrase bancare): semnul sumei decide
+            if i_tip is not None and rec[i_tip]:
+                tip = normalize_tip(rec[i_tip])
+            else:
+                tip = "Cheltuială" if amount < 0 else "Venit"
+            cat = (rec[i_cat].strip() if i_cat is not None else "") or default_category
+            desc = rec[i_desc].strip() if i_desc is not None else ""
+        except InvalidRow as e:
+            stats["invalid"] += 1
+            if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                stats["errors"].append(f"linia {reader.line_num}: {e}")
+            continue
+        yield d, tip, cat, round(abs(amount), 2), desc
+
+def has_columns(path, mapping=None):
+    """ True if the file header contains the date and amount columns of a mapping """
+    mapping = mapping or DEFAULT_MAPPING
+    with open_text(path, "r", mapping.get("encoding", "utf-8-sig")) as f:
+        header = next(csv.reader(f, delimiter=mapping.get("delimiter", ",")), [])
+    return all(mapping["columns"].get(k) in header for k in ("data", "suma"))
+
+def import_csv(path, mapping=None, db=None, batch_size=IMPORT_BATCH, progress=None, cancel=None):
+    """ Stream a CSV (export layout or a mapped bank statement) into tranzactii.
+    Rows already in the database (same content hash, counted as a multiset) are skipped;
+    missing categories are created through add_category. Returns the import statistics. """
+    db = db or get_db()
+    mapping = mapping or DEFAULT_MAPPING
+    stats = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "categories": 0, "errors": [],
+             "seconds": 0.0, "cancelled": False}
+    known_categories = set(get_categories(db=db))
+    existing = Counter()        # hash -> rânduri identice deja în baza de date, neconsumate
+    loaded_dates = set()
+    t0 = time.perf_counter()
+
+    def load_existing(dates):
+        dates = sorted(dates - loaded_dates)
+        loaded_dates.update(dates)
+        for i in range(0, len(dates), 500):
+            chunk = dates[i:i + 500]
+            days = [day_number(d) for d in chunk]
+            # zilele din anii arhivați se caută și în partițiile lor
+            with db.reader() as conn:
+                for r in partitioned_rows(EXPORT_COLUMNS, f" WHERE zi IN ({','.join('?' * len(chunk))})", days,
+                                          (days[0], days[-1]), db=conn):
+                    existing[row_hash(*r)] += 1
+
+    def flush(batch):
+        load_existing({r[0] for r in batch})
+        new_rows = []
+        for r in batch:
+            h = row_hash(*r)
+            if existing[h]:
+                existing[h] -= 1
+                stats["duplicates"] += 1
+            else:
+                new_rows.append(r)
+        with db.transaction():
+            for cat, tip in {(r[2], r[1]) for r in new_rows if r[2] not in known_categories}:
+                if cat not in known_categories:
+                    add_category(cat, tip, db=db)
+                    known_categories.add(cat)
+                    stats["categories"] += 1
+            # sortate după dată: inserări aproape secvențiale în indexul pe zi
+            new_rows.sort()
+            bulk_insert(new_rows, db=db)
+        stats["inserted"] += len(new_rows)
+        if progress:
+            progress(stats)
+
+    with open_text(path, "r", mapping.get("encoding", "utf-8-sig")) as f:
+        reader = csv.reader(f, delimiter=mapping.get("delimiter", ","))
+        batch = []
+        for row in _read_rows(reader, mapping, stats):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+                if cancel is not None and cancel.is_set():
+                    stats["cancelled"] = True
+                    break
+        if batch and not stats["cancelled"]:
+            flush(batch)
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+def format_import_stats(stats):
+    rate = stats["read"] / stats["seconds"] if stats["seconds"] else 0
+    lines = [f"{stats['read']} rânduri citite în {stats['seconds']:.2f} s ({rate:,.0f} rânduri/s)",
+             f"{stats['inserted']} inserate, {stats['duplicates']} duplicate, {stats['invalid']} invalide, "
+             f"{stats['categories']} categorii noi"]
+    if stats["cancelled"]:
+        lines.append("Importul a fost oprit înainte de final.")
+    lines += stats["errors"]
+    return "\n".join(lines)
+
+# -------------------- RUN --------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import / export CSV pentru finante.db")
+    ap.add_argument("--db", default=DB_FILE, help="fișierul bazei de date")
+    sub = ap.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="importă un CSV (formatul exportului sau un extras bancar)")
+    imp.add_argument("file")
+    imp.add_argument("--mapping", help="fișier JSON cu maparea coloanelor (vezi DEFAULT_MAPPING)")
+    imp.add_argument("--map", action="append", default=[], metavar="CÂMP=COLOANĂ",
+                     help="mapează un câmp (data, tip, categorie, suma, descriere) pe o coloană din fișier")
+    imp.add_argument("--date-format", action="append", dest="date_formats", help="format strptime, ex. %%d.%%m.%%Y")
+    imp.add_argument("--decimal", choices=[".", ","])
+    imp.add_argument("--delimiter")
+    imp.add_argument("--encoding")
+    imp.add_argument("--batch-size", type=int, default=IMPORT_BATCH)
+    exp = sub.add_parser("export", help="exportă toate tranzacțiile (.gz = comprimat)")
+    exp.add_argument("file")
+    args = ap.parse_args(argv)
+
+    db = use_database(args.db)
+    init_db(db)
+    if args.command == "export":
+        n = export_csv(args.file, db=db)
+        print(f"{n} tranzacții exportate în {args.file}")
+        return 0
+    mapping = load_mapping(args.mapping, date_formats=args.date_formats, decimal=args.decimal,
+                           delimiter=args.delimiter, encoding=args.encoding)
+    if args.map:
+        mapping["columns"] = dict(mapping["columns"], **dict(m.split("=", 1) for m in args.map))
+    try:
+        stats = import_csv(args.file, mapping, db=db, batch_size=args.batch_size)
+    except ValueError as e:
+        print(f"Eroare: {e}", file=sys.stderr)
+        return 1
+    print(format_import_stats(stats))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# FINANCE_TRACE=1 pornește măsurătorile; FINANCE_TRACE=fisier.json le scrie și în fișier la ieșire
+ENV_VAR = "FINANCE_TRACE"
+MAX_EVENTS = 200000         # cele mai vechi evenimente se pierd, statisticile rămân complete
+NAME_CHARS = 120
+
+# -------------------- SPANS --------------------
+class _NoSpan:
+    """ What span() returns while tracing is off: entering, leaving and set() do nothing """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+NO_SPAN = _NoSpan()
+
+class Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["eroare"] = exc_type.__name__
+        self.tracer._finish(self, end)
+        return False
+
+    def set(self, **args):
+        """ Attach values (e.g. rows=n) to the span; they show up in the trace and in the stats """
+        self.args.update(args)
+
+def _label(name):
+    # instrucțiunile SQL pe mai multe rânduri devin un singur rând scurt
+    return " ".join(name.split())[:NAME_CHARS]
+
+# -------------------- TRACER --------------------
+class Tracer:
+    """ Timing spans, row counts and counters, kept in memory while enabled and exported as a
+    Chrome trace (chrome://tracing, Perfetto, speedscope). Disabled, span() is a single attribute check. """
+
+    def __init__(self):
+        self.enabled = False
+        self.output = None
+        self._lock = threading.Lock()
+        self._exit_hook = False
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.events = deque(maxlen=MAX_EVENTS)
+            self.stats = {}         # nume -> [categorie, apeluri, ns total, ns maxim, rânduri]
+            self.counters = {}
+            self.threads = {}
+            self.dropped = 0
+            self.t0 = time.perf_counter_ns()
+
+    def enable(self, output=None):
+        """ Start recording; with output, the trace is written there when the process exits """
+        self.enabled = True
+        if output:
+            self.output = output
+            if not self._exit_hook:
+                atexit.register(self._write_at_exit)
+                self._exit_hook = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name, cat="app", **args):
+        return Span(self, name, cat, args) if self.enabled else NO_SPAN
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def _finish(self, span, end):
+        dur = end - span.start
+        tid = threading.get_ident()
+        with self._lock:
+            if len(self.events) == MAX_EVENTS:
+                self.dropped += 1
+            self.events.append((span.name, span.cat, span.start, dur, tid, span.args))
+            stat = self.stats.get(span.name)
+            if stat is None:
+                stat = self.stats[span.name] = [span.cat, 0, 0, 0, 0]
+            stat[1] += 1
+            stat[2] += dur
+            stat[3] = max(stat[3], dur)
+            stat[4] += span.args.get("rows", 0)
+            if tid not in self.threads:
+                self.threads[tid] = threading.current_thread().name
+
+    # --- citire ---
+    def summary(self):
+        """ Per-span stats sorted by total time: dicts with name, cat, count, total_ms, mean_ms, max_ms, rows """
+        with self._lock:
+            stats = [(name,) + tuple(s) for name, s in self.stats.items()]
+        out = [{"name": _label(name), "cat": cat, "count": n, "total_ms": total / 1e6, "mean_ms": total / n / 1e6,
+                "max_ms": peak / 1e6, "rows": rows} for name, cat, n, total, peak, rows in stats]
+        out.sort(key=lambda s: -s["total_ms"])
+        return out
+
+    def counter_values(self):
+        """ The counters plus the number of SQL statements issued """
+        with self._lock:
+            counters = dict(self.counters)
+            counters["db.queries"] = sum(s[1] for s in self.stats.values() if s[0] == "sql")
+        return counters
+
+    def chrome_trace(self):
+        """ The recorded spans in the Trace Event Format ("X" complete events, times in µs) """
+        with self._lock:
+            events, threads, t0, dropped = list(self.events), dict(self.threads), self.t0, self.dropped
+        pid = os.getpid()
+        trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in threads.items()]
+        for name, cat, start, dur, tid, args in events:
+            event = {"name": _label(name), "cat": cat, "ph": "X", "ts": (start - t0) / 1000, "dur": dur / 1000,
+                     "pid": pid, "tid": tid}
+            if cat == "sql":
+                event["args"] = dict(args, sql=name)
+            elif args:
+                event["args"] = args
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms",
+                "otherData": {"counters": self.counter_values(), "dropped_events": dropped}}
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+        return path
+
+    def _write_at_exit(self):
+        if self.output and (self.events or self.counters):
+            self.write(self.output)
+
+tracer = Tracer()
+span = tracer.span
+count = tracer.count
+
+_env = os.environ.get(ENV_VAR, "")
+if _env and _env != "0":
+    tracer.enable(None if _env == "1" else _env)
@@ -1,13 +1,25 @@
+import time
+STARTUP_T0 = time.perf_counter()    # înainte de importurile grele: --startup-time măsoară de aici
 import customtkinter as ctk
 from tkcalendar import DateEntry
 from tkinter import ttk, messagebox, filedialog
+import threading
+import queue
 import sqlite3
-import csv
-from datetime import datetime, date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import os # PENTRU ICONIȚĂ
 import sys # PENTRU ICONIȚĂ
 
-DB_FILE = "finante.db"
+from finance_core import (get_db, init_db, get_categories, add_category, delete_category, rename_category,
+                          aggregate_totals, insert_transaction, update_transaction, delete_transactions,
+                          undo_delete, last_deleted,
+                          PERIOD_OPTIONS, build_filter, filter_bounds, row_matches, filter_totals, trend_report,
+                          seek_key, fetch_page, get_transaction, closed_years, archive_year,
+                          SORT_COLUMNS, DEFAULT_SORT, sort_key, to_bani)
+import finance_backup
+import finance_io
+from finance_trace import tracer, span
 
 # NOU: Funcție esențială pentru a găsi fișierele (ca icon.ico)
 # atât în modul de dezvoltare (script .py) cât și în .exe (PyInstaller)
@@ -22,64 +34,354 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
-# -------------------- DATABASE --------------------
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("CREATE TABLE IF NOT EXISTS tranzactii (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT, tip TEXT, categorie TEXT, suma REAL, descriere TEXT)")
-    c.execute("CREATE TABLE IF NOT EXISTS categorii (id INTEGER PRIMARY KEY AUTOINCREMENT, nume TEXT UNIQUE, tip TEXT)")
-    conn.commit()
-    defaults = [
-        ('Salariu', 'Venit'), ('Investiții', 'Venit'), ('Cadouri', 'Venit'),
-        ('Mâncare', 'Cheltuială'), ('Transport', 'Cheltuială'),
-        ('Facturi', 'Cheltuială'), ('Divertisment', 'Cheltuială'),
-        ('Sănătate', 'Cheltuială'), ('Altele', 'Cheltuială')
-    ]
-    for n, t in defaults:
+# -------------------- BACKGROUND EXECUTOR --------------------
+REFRESH_DEBOUNCE_MS = 120
+REPORT_CHART_MONTHS = 24     # graficul din panoul de rapoarte arată ultimele luni ale perioadei
+BACKUP_FIRST_CHECK_MS = 30 * 1000       # prima verificare după pornire, când lista s-a încărcat
+BACKUP_CHECK_MS = 60 * 60 * 1000
+BACKUP_COMPRESS = True
+
+class QueryExecutor:
+    """ Runs database loads on worker threads and hands the results back to the Tk mainloop """
+    POLL_MS = 15
+
+    def __init__(self, widget, workers=2):
+        self.widget = widget
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self.results = queue.Queue()
+        self.generation = {}     # cheie -> ultima cerere; rezultatele mai vechi sunt aruncate
+        self.running = {}        # cheie -> (generația, conexiunea) care execută acum cererea
+        # înregistrarea / ștergerea din running și interrupt() se fac sub același lacăt: o conexiune
+        # întoarsă în pool (și luată de altcineva) nu mai poate fi întreruptă din greșeală
+        self._running_lock = threading.Lock()
+        self.timers = {}
+        self.in_flight = 0
+        self._queued = []        # cheile pornite și încă nepreluate de _poll
+        self._polling = False
+
+    def submit(self, key, work, on_done, delay=0):
+        """ Run work(db) on a pooled reader and call on_done(result, error) on the UI thread.
+        A newer submit with the same key supersedes the older one: a pending (debounced) start
+        is dropped, a running query is interrupted and a late result is discarded. """
+        gen = self.generation.get(key, 0) + 1
+        self.generation[key] = gen
+        timer = self.timers.pop(key, None)
+        if timer:
+            self.widget.after_cancel(timer)
+        with self._running_lock:
+            running = self.running.get(key)
+            if running:
+                running[1].interrupt()
+        if delay:
+            self.timers[key] = self.widget.after(delay, lambda: self._start(key, gen, work, on_done))
+        else:
+            self._start(key, gen, work, on_done)
+
+    def pending(self, key):
+        return key in self.timers or key in self._queued
+
+    def _start(self, key, gen, work, on_done):
+        self.timers.pop(key, None)
+        self.in_flight += 1
+        self._queued.append(key)
+        self.pool.submit(self._run, key, gen, work, on_done)
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.POLL_MS, self._poll)
+
+    def _run(self, key, gen, work, on_done):
+        # fir de lucru: nu atinge widget-urile, doar pune rezultatul în coadă
+        result = error = None
         try:
-            c.execute('INSERT OR IGNORE INTO categorii (nume, tip) VALUES (?,?)', (n, t))
-        except:
-            pass
-    conn.commit()
-    conn.close()
-
-def get_categories(tip=None):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    if tip:
-        c.execute('SELECT nume FROM categorii WHERE tip=? ORDER BY nume', (tip,))
-    else:
-        c.execute('SELECT nume FROM categorii ORDER BY tip,nume')
-    r = [x[0] for x in c.fetchall()]
-    conn.close()
-    return r
-
-def add_category(name, tip):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute('INSERT OR IGNORE INTO categorii (nume,tip) VALUES (?,?)', (name, tip))
-    conn.commit()
-    conn.close()
-
-def delete_category(name):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute('UPDATE tranzactii SET categorie=? WHERE categorie=?', ('Altele', name))
-    c.execute('DELETE FROM categorii WHERE nume=?', (name,))
-    conn.commit()
-    conn.close()
-
-# -------------------- HELPERS FOR DATES --------------------
-def start_of_week(d):
-    # assuming week starts on Monday
-    return d - timedelta(days=d.weekday())
-
-def end_of_week(d):
-    return start_of_week(d) + timedelta(days=6)
+            if self.generation.get(key) == gen:
+                # și deschiderea cititorului poate eșua (fișier corupt): eroarea ajunge tot la on_done
+                with get_db().reader() as db:
+                    with self._running_lock:
+                        self.running[key] = (gen, db)
+                    try:
+                        result = work(db)
+                    finally:
+                        # înainte ca cititorul să se întoarcă în pool; o cerere mai nouă cu aceeași cheie rămâne
+                        with self._running_lock:
+                            if self.running.get(key, (None, None))[0] == gen:
+                                del self.running[key]
+        except Exception as e:
+            error = e
+        finally:
+            self.results.put((key, gen, on_done, result, error))
+
+    def _poll(self):
+        while True:
+            try:
+                key, gen, on_done, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.in_flight -= 1
+            self._queued.remove(key)
+            if self.generation.get(key) != gen:
+                continue
+            if isinstance(error, sqlite3.OperationalError) and "interrupt" in str(error):
+                continue
+            on_done(result, error)
+        if self.in_flight:
+            self.widget.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    def shutdown(self):
+        for timer in self.timers.values():
+            self.widget.after_cancel(timer)
+        self.timers.clear()
+        with self._running_lock:
+            for _, db in self.running.values():
+                db.interrupt()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+# -------------------- VIRTUAL TREEVIEW --------------------
+class VirtualTree:
+    """ Keeps only the visible rows of a ttk.Treeview materialized; the rest is paged from SQLite """
+    BUFFER = 60
+
+    def __init__(self, tree, scrollbar):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.where, self.params = "", []
+        self.bounds = None       # perioada filtrului: anii arhivați citiți la derulare
+        self.sort = DEFAULT_SORT
+        self.total = 0
+        self.top = 0
+        self.visible = 20
+        self.cache = []          # rândurile încărcate: fereastra vizibilă + buffer
+        self.cache_start = 0     # poziția absolută a primului rând din cache
+        self.selected = {}       # id -> rând; rămâne valabil și pentru rândurile nematerializate
+        self._replace_selection = False
+
+        scrollbar.configure(command=self.on_scrollbar)
+        tree.bind("<<TreeviewSelect>>", self._on_select)
+        tree.bind("<Configure>", self._on_configure)
+        tree.bind("<Button-1>", self._on_click, add="+")
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        tree.bind("<Button-5>", lambda e: self._scroll_by(3))
+        tree.bind("<Up>", lambda e: self._on_arrow(e, -1))
+        tree.bind("<Down>", lambda e: self._on_arrow(e, 1))
+        tree.bind("<Prior>", lambda e: self._scroll_by(-self.visible))
+        tree.bind("<Next>", lambda e: self._scroll_by(self.visible))
+        tree.bind("<Home>", lambda e: self.scroll_to(0))
+        tree.bind("<End>", lambda e: self.scroll_to(self.total))
+
+    # --- date ---
+    def load(self, where, params, total, rows=None, bounds=None, sort=DEFAULT_SORT):
+        """ Show a new filter / sort; rows, if given, are its first rows already fetched (e.g. in the background) """
+        self.where, self.params, self.bounds, self.sort = where, list(params), bounds, sort
+        self.total = total
+        self.top = 0
+        self.cache = list(rows or [])
+        self.cache_start = 0
+        self.selected.clear()
+        self.render()
+
+    def _ensure_window(self, top, end):
+        cache_end = self.cache_start + len(self.cache)
+        if self.cache and self.cache_start <= top and end <= cache_end:
+            return
+        # cititor din pool: derularea nu așteaptă după tranzacțiile unui import sau ale unei arhivări
+        with get_db().reader() as db:
+            if self.cache and self.cache_start <= top <= cache_end:
+                # derulare în jos: continuăm de la ultima cheie din cache
+                self.cache += fetch_page(self.where, self.params, self.cache[-1], "after", end - cache_end + self.BUFFER,
+                                         db=db, bounds=self.bounds, sort=self.sort)
+            elif self.cache and top < self.cache_start <= end:
+                # derulare în sus: citim înaintea primei chei din cache
+                rows = fetch_page(self.where, self.params, self.cache[0], "before", self.cache_start - top + self.BUFFER,
+                                  db=db, bounds=self.bounds, sort=self.sort)
+                self.cache = rows + self.cache
+                self.cache_start -= len(rows)
+            else:
+                # salt (bara de derulare): căutăm cheia de start doar în index
+                start = max(0, top - self.BUFFER)
+                key = seek_key(self.where, self.params, start, self.bounds, db=db, sort=self.sort) if start else None
+                self.cache = fetch_page(self.where, self.params, key, "from", end - start + self.BUFFER, db=db,
+                                        bounds=self.bounds, sort=self.sort)
+                self.cache_start = start
+        # păstrăm doar fereastra vizibilă + buffer
+        lo = max(self.cache_start, top - self.BUFFER)
+        hi = end + self.BUFFER
+        self.cache = self.cache[lo - self.cache_start:hi - self.cache_start]
+        self.cache_start = lo
+
+    # --- modificări incrementale ---
+    def apply_changes(self, removed=(), added=()):
+        """ Patch the window for deleted/inserted rows (all matching the current filter) and redraw only the visible rows """
+        for r in removed:
+            self._remove(r)
+        for r in added:
+            self._insert(r)
+        self.render()
+
+    def _insert(self, row):
+        self.total += 1
+        if not self.cache:
+            return
+        i = 0
+        while i < len(self.cache) and self._precedes(self.cache[i], row):
+            i += 1
+        if i == 0 and self.cache_start > 0:
+            # rândul cade înaintea ferestrei încărcate
+            self.cache_start += 1
+            self.top += 1
+        elif i == len(self.cache) and self.cache_start + len(self.cache) < self.total - 1:
+            # rândul cade după fereastra încărcată
+            return
+        else:
+            self.cache.insert(i, row)
+            if self.cache_start + i < self.top:
+                self.top += 1
+
+    def _remove(self, row):
+        self.total -= 1
+        self.selected.pop(row[0], None)
+        for i, r in enumerate(self.cache):
+            if r[0] == row[0]:
+                del self.cache[i]
+                if self.cache_start + i < self.top:
+                    self.top -= 1
+                return
+        if self.cache and self._precedes(row, self.cache[0]):
+            self.cache_start -= 1
+            self.top -= 1
+
+    def _precedes(self, a, b):
+        """ Whether row a is listed before row b in the current sort """
+        ka, kb = sort_key(a, self.sort), sort_key(b, self.sort)
+        return ka > kb if self.sort[1] else ka < kb
+
+    def rename_category(self, old, new):
+        self.cache = [r[:3] + (new,) + r[4:] if r[3] == old else r for r in self.cache]
+        for tid, r in self.selected.items():
+            if r[3] == old:
+                self.selected[tid] = r[:3] + (new,) + r[4:]
+        self.render()
+
+    def rows_visible(self):
+        return self.cache[self.top - self.cache_start:self.top - self.cache_start + self.visible]
+
+    def row(self, tid):
+        if tid in self.selected:
+            return self.selected[tid]
+        for r in self.cache:
+            if r[0] == tid:
+                return r
+        return get_transaction(tid)
+
+    def selected_ids(self):
+        return list(self.selected)
+
+    # --- afișare ---
+    def render(self):
+        self.top = max(0, min(self.top, self.total - self.visible))
+        end = min(self.top + self.visible, self.total)
+        if end > self.top:
+            with span("tree.window"):
+                self._ensure_window(self.top, end)
+        rows = self.rows_visible() if end > self.top else []
+        with span("tree.rebuild", rows=len(rows)):
+            self.tree.delete(*self.tree.get_children())
+            for r in rows:
+                tid, dt, tip, cat, suma, desc = r
+                self.tree.insert("", "end", iid=str(tid), values=(tid, dt, tip, cat, f"{suma:.2f}", desc))
+            self.tree.selection_set([str(r[0]) for r in rows if r[0] in self.selected])
+        if self.total:
+            self.scrollbar.set(self.top / self.total, min(1.0, (self.top + self.visible) / self.total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, top):
+        top = max(0, min(top, self.total - self.visible))
+        if top != self.top:
+            self.top = top
+            self.render()
+        return "break"
+
+    def _scroll_by(self, n):
+        return self.scroll_to(self.top + n)
+
+    def _rows_fit(self):
+        height = self.tree.winfo_height()
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else ""
+        if bbox:
+            return max(1, (height - bbox[1]) // bbox[3])
+        try:
+            rowheight = int(ttk.Style().lookup("Treeview", "rowheight"))
+        except (TypeError, ValueError):
+            rowheight = 20
+        return max(1, height // rowheight - 1)
+
+    # --- evenimente ---
+    def on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            n = int(args[1])
+            self._scroll_by(n * self.visible if args[2] == "pages" else n)
+
+    def _on_configure(self, event):
+        fit = self._rows_fit()
+        if fit != self.visible:
+            self.visible = fit
+            self.render()
+
+    def _on_wheel(self, event):
+        step = -3 if event.delta > 0 else 3
+        return self._scroll_by(step)
+
+    def _on_click(self, event):
+        # click simplu (fără Ctrl/Shift) pe un rând înlocuiește selecția, inclusiv rândurile nevizibile;
+        # antetul, separatoarele și spațiul gol nu schimbă selecția
+        if not event.state & 0x0005 and self.tree.identify_region(event.x, event.y) == "cell":
+            self._replace_selection = True
+
+    def _on_arrow(self, event, step):
+        children = self.tree.get_children()
+        if not children:
+            return None
+        if not event.state & 0x0001:
+            self._replace_selection = True
+        edge = children[0] if step < 0 else children[-1]
+        if self.tree.focus() != edge:
+            return None
+        before = self.top
+        self._scroll_by(step)
+        if self.top == before:
+            self._replace_selection = False
+            return "break"
+        children = self.tree.get_children()
+        item = children[0] if step < 0 else children[-1]
+        self.tree.focus(item)
+        if event.state & 0x0001:
+            self.tree.selection_add(item)
+        else:
+            self.tree.selection_set(item)
+        self.tree.see(item)
+        return "break"
+
+    def _on_select(self, event):
+        # sincronizăm selecția persistentă cu rândurile vizibile
+        if self._replace_selection:
+            self.selected.clear()
+            self._replace_selection = False
+        sel = set(self.tree.selection())
+        for r in self.rows_visible():
+            if str(r[0]) in sel:
+                self.selected[r[0]] = r
+            else:
+                self.selected.pop(r[0], None)
 
 # -------------------- APP --------------------
 class FinanceApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, startup_report=False):
+        imported = time.perf_counter() - STARTUP_T0
         super().__init__()
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
@@ -103,16 +405,29 @@ class FinanceApp(ctk.CTk):
         self.custom_from = None
         self.custom_to = None
         self.category_filter_var = ctk.StringVar(value="Toate")
+        self.sort = DEFAULT_SORT    # (coloană, descrescător), schimbată din capul coloanelor
+        self.totals = {"Venit": 0, "Cheltuială": 0}
+        self.executor = QueryExecutor(self)
+        self.ready = False          # baza de date e deschisă și migrată (vezi _start_loading)
+        self.startup_report = startup_report
+        self.startup = {}
+        self._startup_mark("importuri", imported)
 
         self.create_sidebar()
         self.create_main_area()
-        self.refresh_categories()
-        self.update_filter_categories() 
-        self.refresh_data()
+        self._startup_mark("widget-uri")
+        # fereastra apare întâi; baza de date se deschide și lista se încarcă după primul desen
+        self.after_idle(self._start_loading)
 
         self.edit_frame = None
         self.category_manager_frame = None
         self.category_manager_visible = False
+        self.report_frame = None
+        self.report_visible = False
+        self.diagnostics_window = None
+        self.background_job = None
+        self.job_stall_ms = 0
+        self.after(BACKUP_FIRST_CHECK_MS, self.auto_backup)
 
     # -------------------- SIDEBAR --------------------
     def create_sidebar(self):
@@ -124,26 +439,25 @@ class FinanceApp(ctk.CTk):
         # --- FILTRU PERIOADĂ ---
         ctk.CTkLabel(sidebar, text="Filtru perioadă:").pack(anchor="w", padx=10)
         self.period_var = ctk.StringVar(value="Toate")
-        period_values = ["Toate", "Azi", "Săptămâna curentă", "Luna curentă", "Anul curent", "Custom"]
-        self.period_menu = ctk.CTkOptionMenu(sidebar, variable=self.period_var, values=period_values, command=self.on_period_change)
+        self.period_menu = ctk.CTkOptionMenu(sidebar, variable=self.period_var, values=PERIOD_OPTIONS, command=self.on_period_change)
         self.period_menu.pack(padx=10, pady=(0,8), fill="x")
 
-        # custom date range (hidden unless Custom selected)
-        self.custom_frame = ctk.CTkFrame(sidebar)
-        # will be packed when needed
-        ctk.CTkLabel(self.custom_frame, text="De la:").grid(row=0, column=0, sticky='w', padx=(0,6))
-        self.custom_from_entry = DateEntry(self.custom_frame, date_pattern='yyyy-mm-dd')
-        self.custom_from_entry.grid(row=0, column=1, padx=(0,6))
-        ctk.CTkLabel(self.custom_frame, text="Până la:").grid(row=1, column=0, sticky='w', padx=(0,6))
-        self.custom_to_entry = DateEntry(self.custom_frame, date_pattern='yyyy-mm-dd')
-        self.custom_to_entry.grid(row=1, column=1, padx=(0,6))
-        ctk.CTkButton(self.custom_frame, text="Aplică filtru", command=self.apply_custom_filter).grid(row=2, column=0, columnspan=2, pady=(6,0))
+        # custom date range (hidden unless Custom selected): built on first use, see _create_custom_range
+        self.sidebar = sidebar
+        self.custom_frame = None
 
         # --- FILTRU CATEGORIE ---
         ctk.CTkLabel(sidebar, text="Filtru categorie:").pack(anchor="w", padx=10, pady=(8,0))
         self.category_filter_menu = ctk.CTkOptionMenu(sidebar, variable=self.category_filter_var, values=["Toate"], command=self.on_category_filter_change)
         self.category_filter_menu.pack(padx=10, pady=(0,8), fill="x")
 
+        # --- CĂUTARE ---
+        ctk.CTkLabel(sidebar, text="Caută:").pack(anchor="w", padx=10, pady=(8,0))
+        self.search_entry = ctk.CTkEntry(sidebar, placeholder_text="Descriere sau categorie")
+        self.search_entry.pack(padx=10, pady=(0,8), fill="x")
+        self.search_text = ""
+        self.search_entry.bind("<KeyRelease>", self.on_search_change)
+
         # --- DATE TRANZACȚIE ---
         ctk.CTkLabel(sidebar, text="Data tranzacției:").pack(anchor="w", padx=10, pady=(8,0))
         self.date_entry = DateEntry(sidebar, date_pattern="yyyy-mm-dd")
@@ -172,9 +486,14 @@ class FinanceApp(ctk.CTk):
 
         ctk.CTkButton(sidebar, text="Adaugă tranzacție", command=self.add_transaction).pack(padx=10, pady=(0, 8), fill="x")
         ctk.CTkButton(sidebar, text="Export CSV", command=self.export_csv).pack(padx=10, pady=(0, 8), fill="x")
+        ctk.CTkButton(sidebar, text="Import CSV", command=self.import_csv).pack(padx=10, pady=(0, 8), fill="x")
+        ctk.CTkButton(sidebar, text="Arhivează anii încheiați", command=self.archive_closed_years).pack(padx=10, pady=(0, 8), fill="x")
+        ctk.CTkButton(sidebar, text="Backup acum", command=self.backup_now).pack(padx=10, pady=(0, 8), fill="x")
         
         self.cat_manager_button = ctk.CTkButton(sidebar, text="Gestionarea categoriilor", command=self.toggle_category_manager)
         self.cat_manager_button.pack(padx=10, pady=(0, 8), fill="x")
+        self.report_button = ctk.CTkButton(sidebar, text="Rapoarte", command=self.toggle_report_panel)
+        self.report_button.pack(padx=10, pady=(0, 8), fill="x")
         
         ctk.CTkButton(sidebar, text="Ieșire", fg_color="red", command=self.quit).pack(side="bottom", padx=10, pady=12, fill="x")
 
@@ -188,19 +507,36 @@ class FinanceApp(ctk.CTk):
         if cats:
             self.cat_menu.set(cats[0])
 
+    def _create_custom_range(self):
+        self.custom_frame = ctk.CTkFrame(self.sidebar)
+        ctk.CTkLabel(self.custom_frame, text="De la:").grid(row=0, column=0, sticky='w', padx=(0,6))
+        self.custom_from_entry = DateEntry(self.custom_frame, date_pattern='yyyy-mm-dd')
+        self.custom_from_entry.grid(row=0, column=1, padx=(0,6))
+        ctk.CTkLabel(self.custom_frame, text="Până la:").grid(row=1, column=0, sticky='w', padx=(0,6))
+        self.custom_to_entry = DateEntry(self.custom_frame, date_pattern='yyyy-mm-dd')
+        self.custom_to_entry.grid(row=1, column=1, padx=(0,6))
+        ctk.CTkButton(self.custom_frame, text="Aplică filtru", command=self.apply_custom_filter).grid(row=2, column=0, columnspan=2, pady=(6,0))
+
     def on_period_change(self, value):
         if value == "Custom":
+            if self.custom_frame is None:
+                self._create_custom_range()
             self.custom_frame.pack(padx=10, pady=(6,8), fill="x")
         else:
-            try:
+            if self.custom_frame is not None:
                 self.custom_frame.forget()
-            except:
-                pass
             self.refresh_data()
 
     def on_category_filter_change(self, value):
         self.refresh_data()
 
+    def on_search_change(self, event=None):
+        text = self.search_entry.get().strip()
+        if text != self.search_text:
+            # refresh_data are debounce, deci tastarea rapidă produce o singură interogare
+            self.search_text = text
+            self.refresh_data()
+
     def apply_custom_filter(self):
         try:
             d1 = self.custom_from_entry.get_date()
@@ -221,23 +557,92 @@ class FinanceApp(ctk.CTk):
 
         ctk.CTkLabel(self.main_area, text="Tranzacții", font=("Arial", 20, "bold")).pack(pady=(8, 10))
 
+        tree_frame = ctk.CTkFrame(self.main_area, fg_color="transparent")
+        tree_frame.pack(fill="both", expand=True, padx=12, pady=(6, 4))
         cols = ("id", "data", "tip", "categorie", "suma", "descriere")
-        self.tree = ttk.Treeview(self.main_area, columns=cols, show="headings", selectmode="extended")
+        self.tree = ttk.Treeview(tree_frame, columns=cols, show="headings", selectmode="extended")
+        self.column_titles = {}
         for col, text, w in [
             ("id", "ID", 40), ("data", "Data", 100), ("tip", "Tip", 80),
             ("categorie", "Categorie", 140), ("suma", "Sumă (RON)", 100), ("descriere", "Descriere", 260)
         ]:
-            self.tree.heading(col, text=text)
+            self.column_titles[col] = text
+            if col in SORT_COLUMNS:
+                self.tree.heading(col, text=text, command=lambda c=col: self.sort_by(c))
+            else:
+                self.tree.heading(col, text=text)
             self.tree.column(col, width=w, anchor="center" if col in ["id", "data", "tip"] else "w")
-        self.tree.pack(fill="both", expand=True, padx=12, pady=(6, 4))
+        self._show_sort()
+        tree_scroll = ttk.Scrollbar(tree_frame, orient="vertical")
+        tree_scroll.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.vtree = VirtualTree(self.tree, tree_scroll)
 
         bottom = ctk.CTkFrame(self.main_area)
         bottom.pack(fill="x", padx=12, pady=(4, 12))
-        self.label_balanta = ctk.CTkLabel(bottom, text="Balanță: 0 RON", font=("Arial", 16, "bold"))
+        self.label_balanta = ctk.CTkLabel(bottom, text="Se încarcă...", font=("Arial", 16, "bold"))
         self.label_balanta.pack(side="left", padx=(6, 12))
 
         ctk.CTkButton(bottom, text="Editează tranzacție", command=self.show_edit_section).pack(side="left", padx=6)
         ctk.CTkButton(bottom, text="Șterge selectate", fg_color="#e53935", command=self.delete_selected).pack(side="left", padx=6)
+        self.undo_button = ctk.CTkButton(bottom, text="Anulează ștergerea", fg_color="#9e9e9e", state="disabled",
+                                         command=self.undo_last_delete)
+        self.undo_button.pack(side="left", padx=6)
+        self.backup_label = ctk.CTkLabel(bottom, text="", text_color="#9e9e9e")
+        self.backup_label.pack(side="right", padx=(6, 12))
+        self.bind("<Control-z>", lambda e: self.undo_last_delete())
+        # panoul de diagnosticare nu are buton: Ctrl+Shift+D
+        self.bind("<Control-Shift-D>", lambda e: self.show_diagnostics())
+
+    def sort_by(self, column):
+        """ Heading click: sort the list by the column, or reverse it if it is already the sort column """
+        current, descending = self.sort
+        # data și suma încep cu valorile mari (cele mai noi), textele în ordine alfabetică
+        self.sort = (column, not descending) if column == current else (column, column in ("data", "suma"))
+        self._show_sort()
+        self.refresh_data(delay=0)
+
+    def _show_sort(self):
+        column, descending = self.sort
+        for col, text in self.column_titles.items():
+            self.tree.heading(col, text=text + ((" ▼" if descending else " ▲") if col == column else ""))
+
+    # -------------------- STARTUP --------------------
+    def _start_loading(self):
+        """ Runs once the window is on screen: opens / migrates the database and warms the categories on a
+        worker thread, then fills the menus and starts the first load of the list and the balance """
+        self._startup_mark("prima afișare")
+
+        def work(db):
+            with span("startup.init_db"):
+                init_db()
+            return get_db().categories.names(), last_deleted(db)
+
+        def done(result, error):
+            if error:
+                messagebox.showerror("Eroare", f"Baza de date nu a putut fi deschisă: {error}")
+                self.destroy()
+                return
+            _, last = result
+            self._startup_mark("bază de date")
+            self.ready = True
+            self.refresh_categories()
+            self.update_filter_categories()
+            get_db().categories.subscribe(self._on_categories_changed)
+            self._show_undo(last)
+            self.refresh_data(delay=0)
+
+        self.executor.submit("startup", work, done)
+
+    def _startup_mark(self, stage, seconds=None):
+        """ Seconds since the process started (STARTUP_T0) for a startup stage; --startup-time prints them """
+        self.startup[stage] = time.perf_counter() - STARTUP_T0 if seconds is None else seconds
+        if not self.startup_report:
+            return
+        print(f"{stage:<16}{self.startup[stage] * 1000:>9.1f} ms", flush=True)
+        if stage == "interactiv":
+            # modul de măsurare se închide singur, ca să poată fi repetat din script
+            self.after(0, self.quit)
 
     # -------------------- REFRESH --------------------
     def refresh_categories(self):
@@ -256,59 +661,78 @@ class FinanceApp(ctk.CTk):
         if current_val not in filter_values:
             self.category_filter_var.set("Toate")
 
-    def _rows_in_date_range(self, rows):
-        per = self.period_var.get()
-        today = date.today()
-        filtered = []
-        for r in rows:
-            try:
-                r_date = datetime.strptime(r[1], "%Y-%m-%d").date()
-            except:
-                continue
-            if per == "Toate":
-                include = True
-            elif per == "Azi":
-                include = (r_date == today)
-            elif per == "Săptămâna curentă":
-                include = (start_of_week(today) <= r_date <= end_of_week(today))
-            elif per == "Luna curentă":
-                include = (r_date.year == today.year and r_date.month == today.month)
-            elif per == "Anul curent":
-                include = (r_date.year == today.year)
-            elif per == "Custom" and self.custom_from and self.custom_to:
-                include = (self.custom_from <= r_date <= self.custom_to)
-            else:
-                include = True
-            if include:
-                filtered.append(r)
-        return filtered
-
-    def refresh_data(self):
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT id,data,tip,categorie,suma,descriere FROM tranzactii ORDER BY date(data) DESC")
-        rows = c.fetchall()
-        conn.close()
-
-        rows = self._rows_in_date_range(rows)
-
-        selected_cat = self.category_filter_var.get()
-        if selected_cat != "Toate":
-            rows = [r for r in rows if r[3] == selected_cat]
-
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        
-        total_v = total_c = 0
-        for r in rows:
-            tid, dt, tip, cat, suma, desc = r
-            self.tree.insert("", "end", values=(tid, dt, tip, cat, f"{suma:.2f}", desc))
-            if tip == "Venit":
-                total_v += suma
-            else:
-                total_c += suma
-
-        bal = total_v - total_c
+    def _current_filter_args(self):
+        return (self.period_var.get(), self.category_filter_var.get(), self.custom_from, self.custom_to)
+
+    def _current_filter(self, db=None):
+        return build_filter(*self._current_filter_args(), search=self.search_text, db=db)
+
+    def _current_bounds(self):
+        period, _, custom_from, custom_to = self._current_filter_args()
+        return filter_bounds(period, custom_from, custom_to)
+
+    def _current_summary(self, db=None):
+        # fără căutare, balanța și numărul de rânduri vin din tabelele de totaluri, nu din tranzactii
+        return filter_totals(*self._current_filter_args(), search=self.search_text, db=db)
+
+    def _matches_filter(self, row):
+        return row_matches(row, *self._current_filter_args(), search=self.search_text)
+
+    def refresh_data(self, delay=REFRESH_DEBOUNCE_MS):
+        """ Reload totals and the first page in the background; bursts within `delay` ms collapse into one load """
+        if not self.ready:
+            return      # filtrele schimbate până atunci intră în prima încărcare (_start_loading)
+        args, search, bounds, sort = self._current_filter_args(), self.search_text, self._current_bounds(), self.sort
+        limit = self.vtree.visible + 2 * VirtualTree.BUFFER
+
+        def work(db):
+            # și filtrul se construiește pe fir: căutarea estimează numărul de potriviri în indexul FTS
+            with span("refresh.filter"):
+                where, params = build_filter(*args, search=search, db=db)
+            with span("refresh.totals"):
+                totals = filter_totals(*args, search=search, db=db)
+            with span("refresh.query") as s:
+                rows = fetch_page(where, params, limit=limit, db=db, bounds=bounds, sort=sort)
+                s.set(rows=len(rows))
+            return (where, params), totals, rows
+
+        def done(result, error):
+            if error:
+                messagebox.showerror("Eroare", f"Datele nu au putut fi încărcate: {error}")
+                return
+            (where, params), (count, total_v, total_c), rows = result
+            with span("refresh.tree", rows=len(rows)):
+                self.vtree.load(where, params, count, rows, bounds, sort)
+            with span("refresh.balance"):
+                self.totals = {"Venit": total_v, "Cheltuială": total_c}
+                self._show_balance()
+            self.refresh_report()
+            if "interactiv" not in self.startup:
+                self._startup_mark("interactiv")
+
+        self.executor.submit("refresh", work, done, delay=delay)
+
+    def apply_changes(self, removed=(), added=()):
+        """ Update the tree and the balance for changed rows instead of reloading everything """
+        if self.executor.pending("refresh"):
+            # o reîncărcare e deja în drum și poate fi anterioară modificării: o repornim
+            self.refresh_data(delay=0)
+            return
+        self.refresh_report()
+        with span("apply.filter", rows=len(removed) + len(added)):
+            removed = [r for r in removed if self._matches_filter(r)]
+            added = [r for r in added if self._matches_filter(r)]
+        if not (removed or added):
+            return
+        for sign, rows in ((-1, removed), (1, added)):
+            for r in rows:
+                key = "Venit" if r[2] == "Venit" else "Cheltuială"
+                self.totals[key] += sign * r[4]
+        self.vtree.apply_changes(removed, added)
+        self._show_balance()
+
+    def _show_balance(self):
+        bal = round(self.totals["Venit"] - self.totals["Cheltuială"], 2) + 0.0
         color = "#00FF7F" if bal >= 0 else "#FF4C4C"
         sign = "+" if bal >= 0 else ""
         self.label_balanta.configure(text=f"Balanță: {sign}{bal:.2f} RON", text_color=color)
@@ -330,50 +754,63 @@ class FinanceApp(ctk.CTk):
             messagebox.showwarning("Eroare", "Suma trebuie numerică.")
             return
 
-        add_category(categorie, tip)
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("INSERT INTO tranzactii (data,tip,categorie,suma,descriere) VALUES (?,?,?,?,?)", (data, tip, categorie, suma, descriere))
-        conn.commit()
-        conn.close()
+        tid = insert_transaction(data, tip, categorie, suma, descriere)
         self.entry_suma.delete(0, 'end')
         self.entry_categorie.delete(0, 'end')
         self.entry_descriere.delete(0, 'end')
-        self.refresh_categories()
-        
-        self.update_filter_categories() 
-        self.refresh_data()
+        # suma ca în view: to_bani rotunjește jumătățile departe de zero, round() ar rotunji la par
+        self.apply_changes(added=[(tid, data, tip, categorie, to_bani(suma) / 100, descriere)])
 
     def delete_selected(self):
-        sels = self.tree.selection()
+        sels = self.vtree.selected_ids()
         if not sels:
             messagebox.showwarning("Atenție", "Selectează una sau mai multe tranzacții pentru ștergere.")
             return
         if not messagebox.askyesno("Confirmare", f"Sigur ștergi {len(sels)} tranzacții selectate?"):
             return
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        for s in sels:
-            tid = self.tree.item(s)["values"][0]
-            c.execute("DELETE FROM tranzactii WHERE id=?", (tid,))
-        conn.commit()
-        conn.close()
-        self.refresh_data()
-        messagebox.showinfo("Succes", f"{len(sels)} tranzacții au fost șterse.")
+        rows = [r for r in (self.vtree.row(tid) for tid in sels) if r]
+        delete_transactions(sels)
+        self.apply_changes(removed=rows)
+        self._update_undo_button()
+        messagebox.showinfo("Succes", f"{len(sels)} tranzacții au fost șterse. Le poți recupera cu „Anulează ștergerea” (Ctrl+Z).")
+
+    def undo_last_delete(self):
+        if self.undo_button.cget("state") == "disabled":
+            return      # Ctrl+Z fără nimic de anulat, sau înainte ca baza de date să fie deschisă
+        # readuce ultimul lot din jurnal, cu id-urile originale
+        rows = undo_delete()
+        if rows:
+            self.apply_changes(added=rows)
+        self._update_undo_button()
+
+    def _update_undo_button(self):
+        self._show_undo(last_deleted())
+
+    def _show_undo(self, last):
+        if last:
+            self.undo_button.configure(state="normal", text=f"Anulează ștergerea ({last[1]})")
+        else:
+            self.undo_button.configure(state="disabled", text="Anulează ștergerea")
 
     # -------------------- EDIT SECTION --------------------
     def show_edit_section(self):
         if self.category_manager_visible:
             self.toggle_category_manager()
+        if self.report_visible:
+            self.toggle_report_panel()
             
         if self.edit_frame:
             self.edit_frame.destroy()
-        sel = self.tree.selection()
+        sel = self.vtree.selected_ids()
         if not sel:
             messagebox.showwarning("Atenție", "Selectează o tranzacție pentru editare.")
             return
-        vals = self.tree.item(sel[0])["values"]
-        tid, dt, tip, cat, suma, desc = vals
+        row = self.vtree.row(sel[0])
+        if not row:
+            return
+        tid, dt, tip, cat, suma, desc = row
+        suma = f"{suma:.2f}"
+        desc = desc or ""
 
         self.edit_frame = ctk.CTkFrame(self.main_area)
         self.edit_frame.pack(side="bottom", fill="x", padx=12, pady=(0, 10))
@@ -415,13 +852,13 @@ class FinanceApp(ctk.CTk):
         except:
             messagebox.showerror("Eroare", "Sumă invalidă.")
             return
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("UPDATE tranzactii SET data=?, categorie=?, suma=?, descriere=? WHERE id=?", (new_date, new_cat, new_sum, new_desc, tid))
-        conn.commit()
-        conn.close()
+        old = get_transaction(tid)
+        if not old:
+            return
+        update_transaction(tid, new_date, new_cat, new_sum, new_desc)
         messagebox.showinfo("Succes", "Tranzacția a fost actualizată.")
-        self.refresh_data()
+        # suma citită înapoi ca în view: exact valoarea salvată de to_bani
+        self.apply_changes(removed=[old], added=[(tid, new_date, old[2], new_cat, to_bani(new_sum) / 100, new_desc)])
         self.edit_frame.destroy()
 
 
@@ -438,6 +875,8 @@ class FinanceApp(ctk.CTk):
             if self.edit_frame:
                 self.edit_frame.destroy()
                 self.edit_frame = None
+            if self.report_visible:
+                self.toggle_report_panel()
             
             self.create_category_manager_ui()
             self.cat_manager_button.configure(text="Închide secțiunea categorii")
@@ -466,6 +905,7 @@ class FinanceApp(ctk.CTk):
         self.ven_new_entry = ctk.CTkEntry(ven_frame, placeholder_text="Nume categorie")
         self.ven_new_entry.pack(side="left", fill="x", expand=True, padx=(0,6))
         ctk.CTkButton(ven_frame, text="Adaugă", command=lambda: self._add_cat_from_manager("Venit", "ven")).pack(side="left")
+        ctk.CTkButton(ven_frame, text="Redenumește", command=lambda: self._rename_cat_from_manager("ven")).pack(side="left", padx=(6,0))
         ctk.CTkButton(ven_frame, text="Șterge", fg_color="#e53935", command=lambda: self._delete_cat_from_manager("ven")).pack(side="left", padx=(6,0))
 
         # Right - Cheltuială
@@ -478,6 +918,7 @@ class FinanceApp(ctk.CTk):
         self.che_new_entry = ctk.CTkEntry(che_frame, placeholder_text="Nume categorie")
         self.che_new_entry.pack(side="left", fill="x", expand=True, padx=(0,6))
         ctk.CTkButton(che_frame, text="Adaugă", command=lambda: self._add_cat_from_manager("Cheltuială", "che")).pack(side="left")
+        ctk.CTkButton(che_frame, text="Redenumește", command=lambda: self._rename_cat_from_manager("che")).pack(side="left", padx=(6,0))
         ctk.CTkButton(che_frame, text="Șterge", fg_color="#e53935", command=lambda: self._delete_cat_from_manager("che")).pack(side="left", padx=(6,0))
 
         self._populate_category_lists()
@@ -490,13 +931,28 @@ class FinanceApp(ctk.CTk):
         ven = get_categories("Venit")
         che = get_categories("Cheltuială")
         for v in ven:
-            self.list_venit.insert("", "end", values=(v,))
+            self.list_venit.insert("", "end", iid=v, values=(v,))
         for c in che:
-            self.list_chelt.insert("", "end", values=(c,))
-        
-        self.refresh_categories()
-        self.update_filter_categories() 
-        self.refresh_data() 
+            self.list_chelt.insert("", "end", iid=c, values=(c,))
+
+    def _on_categories_changed(self, event, name, tip):
+        # abonat la registrul de categorii: widget-urile se actualizează fără interogări
+        if threading.current_thread() is not threading.main_thread():
+            return  # importul din fundal reîmprospătează listele când se termină
+        if event in ("reload", "rename") or tip == self.entry_tip.get():
+            self.refresh_categories()
+        self.update_filter_categories()
+        if self.edit_frame and self.edit_frame.winfo_exists():
+            self.edit_cat.configure(values=sorted(get_categories()))
+        if self.category_manager_visible:
+            if event in ("reload", "rename"):
+                self._populate_category_lists()
+                return
+            tree = self.list_venit if tip == "Venit" else self.list_chelt
+            if event == "add":
+                tree.insert("", get_categories(tip).index(name), iid=name, values=(name,))
+            elif tree.exists(name):
+                tree.delete(name)
 
     def _add_cat_from_manager(self, tip, side):
         name = (self.ven_new_entry.get().strip() if side=="ven" else self.che_new_entry.get().strip())
@@ -504,45 +960,420 @@ class FinanceApp(ctk.CTk):
             messagebox.showwarning("Atenție", "Introdu numele categoriei.")
             return
         add_category(name, tip)
-        self._populate_category_lists()
         if side=="ven":
             self.ven_new_entry.delete(0, 'end')
         else:
             self.che_new_entry.delete(0, 'end')
 
+    def _rename_cat_from_manager(self, side):
+        tree = self.list_venit if side=="ven" else self.list_chelt
+        entry = self.ven_new_entry if side=="ven" else self.che_new_entry
+        sel = tree.selection()
+        new = entry.get().strip()
+        if not sel or not new:
+            messagebox.showwarning("Atenție", "Selectează o categorie și scrie noul nume.")
+            return
+        old = sel[0]
+        filter_cat = self.category_filter_var.get()
+        if not rename_category(old, new):
+            messagebox.showwarning("Atenție", f"Categoria '{new}' există deja.")
+            return
+        entry.delete(0, 'end')
+        if filter_cat == old:
+            self.category_filter_var.set(new)
+        # un singur rând schimbat în categorii; rândurile afișate se recitesc cu noul nume
+        self.refresh_data()
+
     def _delete_cat_from_manager(self, side):
         tree = self.list_venit if side=="ven" else self.list_chelt
         sel = tree.selection()
         if not sel:
             messagebox.showwarning("Atenție", "Selectează o categorie pentru ștergere.")
             return
-        name = tree.item(sel[0])['values'][0]
+        name = sel[0]  # iid-ul rândului este numele categoriei
         if name in ['Altele']:
              messagebox.showwarning("Atenție", "Categoria 'Altele' nu poate fi ștearsă.")
              return
         if not messagebox.askyesno("Confirmare", f"Ștergi categoria '{name}'? (Toate tranzacțiile vor fi mutate în 'Altele')"):
             return
+        filter_cat = self.category_filter_var.get()
         delete_category(name)
-        self._populate_category_lists()
+        if filter_cat in (name, "Altele") or self.sort[0] == "categorie":
+            # filtrul s-a resetat, primește rândurile mutate sau ordinea se schimbă: reîncărcare completă
+            self.refresh_data()
+        else:
+            self.vtree.rename_category(name, "Altele")
+
+    # -------------------- BACKGROUND JOBS --------------------
+    def _start_job(self, text, work, on_done, total=None):
+        """ Run work(progress, cancel) on a worker thread with a progress bar and a cancel button;
+        on_done(result, error) is called back on the UI thread """
+        frame = ctk.CTkFrame(self.main_area)
+        frame.pack(side="bottom", fill="x", padx=12, pady=(0, 10))
+        label = ctk.CTkLabel(frame, text=f"{text}...")
+        label.pack(side="left", padx=(12, 6))
+        bar = ctk.CTkProgressBar(frame, mode="determinate" if total else "indeterminate")
+        bar.pack(side="left", fill="x", expand=True, padx=6)
+        if total:
+            bar.set(0)
+        else:
+            bar.start()
+        cancel = threading.Event()
+        ctk.CTkButton(frame, text="Anulează", fg_color="#9e9e9e", width=90, command=cancel.set).pack(side="left", padx=(6, 12), pady=6)
+
+        # firul de lucru scrie doar în job; UI-ul îl citește periodic cu after()
+        # stall: cea mai mare întârziere a acestor citiri, adică cât a stat blocată interfața în timpul lucrului
+        job = {"count": 0, "result": None, "error": None, "finished": False, "last": time.perf_counter(), "stall": 0.0}
+
+        def progress(n):
+            job["count"] = n
+
+        def run():
+            try:
+                job["result"] = work(progress, cancel)
+            except Exception as e:
+                job["error"] = e
+            job["finished"] = True
+
+        def poll():
+            now = time.perf_counter()
+            job["stall"] = max(job["stall"], (now - job["last"]) * 1000 - 100)
+            job["last"] = now
+            if not job["finished"]:
+                if total:
+                    bar.set(job["count"] / total)
+                    label.configure(text=f"{text}: {job['count']} / {total}")
+                else:
+                    label.configure(text=f"{text}: {job['count']}")
+                self.after(100, poll)
+                return
+            frame.destroy()
+            self.background_job = None
+            self.job_stall_ms = job["stall"]
+            on_done(job["result"], job["error"])
+
+        self.background_job = threading.Thread(target=run, daemon=True)
+        self.background_job.start()
+        self.after(100, poll)
+
+    # -------------------- REPORTS --------------------
+    def toggle_report_panel(self):
+        if self.report_visible:
+            if self.report_frame:
+                self.report_frame.destroy()
+            self.report_frame = None
+            self.report_button.configure(text="Rapoarte")
+            self.report_visible = False
+        else:
+            if self.edit_frame:
+                self.edit_frame.destroy()
+                self.edit_frame = None
+            if self.category_manager_visible:
+                self.toggle_category_manager()
+            self.create_report_ui()
+            self.report_button.configure(text="Închide rapoartele")
+            self.report_visible = True
+            self.refresh_report()
+
+    def create_report_ui(self):
+        self.report_frame = ctk.CTkFrame(self.main_area, corner_radius=8)
+        self.report_frame.pack(side="bottom", fill="x", expand=False, padx=12, pady=(6, 12))
+        self.report_title = ctk.CTkLabel(self.report_frame, text="📊 Rapoarte", font=("Arial", 16, "bold"))
+        self.report_title.pack(anchor="w", pady=(6, 2), padx=12)
+        self.report_summary = ctk.CTkLabel(self.report_frame, text="Se calculează...", justify="left")
+        self.report_summary.pack(anchor="w", padx=12, pady=(0, 6))
+
+        body = ctk.CTkFrame(self.report_frame, fg_color="transparent")
+        body.pack(fill="x", padx=12, pady=(0, 12))
+        self.report_chart = ctk.CTkCanvas(body, height=200, bg="#2b2b2b", highlightthickness=0)
+        self.report_chart.pack(side="left", fill="both", expand=True, padx=(0, 6))
+        self.report_chart.bind("<Configure>", lambda e: self._draw_report_chart())
+        self.report_months = []
+
+        cols = ("categorie", "suma", "pondere", "medie")
+        self.report_cats = ttk.Treeview(body, columns=cols, show="headings", height=8)
+        for col, text, w in [("categorie", "Categorie", 120), ("suma", "Total (RON)", 100),
+                             ("pondere", "% din tip", 70), ("medie", "Medie/lună", 90)]:
+            self.report_cats.heading(col, text=text)
+            self.report_cats.column(col, width=w, anchor="w" if col == "categorie" else "e")
+        self.report_cats.pack(side="left", fill="y", padx=(6, 0))
+
+    def refresh_report(self):
+        """ Recompute the report panel in the background; results are cached until the next write """
+        if not self.report_visible:
+            return
+        period, custom_from, custom_to = self.period_var.get(), self.custom_from, self.custom_to
+
+        def work(db):
+            with span("report.query"):
+                return trend_report(period, custom_from, custom_to, db=db)
+
+        def done(report, error):
+            if not (self.report_visible and self.report_frame.winfo_exists()):
+                return
+            if error:
+                self.report_summary.configure(text=f"Raportul nu a putut fi calculat: {error}")
+                return
+            self.report_title.configure(text=f"📊 Rapoarte — {period}")
+            self.report_months = report["luni"][-REPORT_CHART_MONTHS:]
+            if report["luni"]:
+                avg, daily = report["medii"], report["zilnic"]
+                self.report_summary.configure(text=(
+                    f"Medie lunară: venituri {avg['venituri_lunar']:.2f}, cheltuieli {avg['cheltuieli_lunar']:.2f} RON  ·  "
+                    f"Pe zi: medie {daily['medie']:.2f}, mediană {daily['p50']:.2f}, p90 {daily['p90']:.2f} RON  ·  "
+                    f"Top: " + ", ".join(c["categorie"] for c in report["top_cheltuieli"][:3])))
+            else:
+                self.report_summary.configure(text="Nu există tranzacții în perioada aleasă.")
+            self.report_cats.delete(*self.report_cats.get_children())
+            for c in report["categorii"]:
+                sign = "+" if c["tip"] == "Venit" else "-"
+                self.report_cats.insert("", "end", values=(c["categorie"], f"{sign}{c['suma']:.2f}",
+                                                           f"{c['pondere']:.1f}", f"{c['medie_lunara']:.2f}"))
+            with span("report.draw", rows=len(self.report_months)):
+                self._draw_report_chart()
+
+        self.executor.submit("report", work, done)
+
+    def _draw_report_chart(self):
+        """ Monthly income / expense bars with the rolling average of expenses as a line """
+        canvas = self.report_chart
+        canvas.delete("all")
+        months = self.report_months
+        w, h = canvas.winfo_width(), canvas.winfo_height()
+        if not months or w < 50:
+            return
+        top = max(max(m["venituri"], m["cheltuieli"]) for m in months) or 1
+        left, bottom, plot_h = 8, h - 18, h - 34
+        slot = (w - left - 8) / len(months)
+        bar = max(1, slot * 0.35)
+        line = []
+        for i, m in enumerate(months):
+            x = left + i * slot + slot / 2
+            for dx, value, color in ((-bar, m["venituri"], "#00FF7F"), (0, m["cheltuieli"], "#FF4C4C")):
+                canvas.create_rectangle(x + dx, bottom - value / top * plot_h, x + dx + bar, bottom, fill=color, outline="")
+            line += [x, bottom - m["medie_mobila"] / top * plot_h]
+            if i % max(1, len(months) // 8) == 0:
+                canvas.create_text(x, bottom + 9, text=m["luna"], fill="#bbbbbb", font=("Arial", 8))
+        if len(line) >= 4:
+            canvas.create_line(*line, fill="#FFD54F", width=2)
+        canvas.create_text(left, 8, anchor="w", fill="#bbbbbb", font=("Arial", 8),
+                           text=f"max {top:.0f} RON · verde venituri, roșu cheltuieli, galben media mobilă a cheltuielilor")
+
+    # -------------------- DIAGNOSTICS --------------------
+    def show_diagnostics(self):
+        if self.diagnostics_window and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.focus()
+            return
+        win = self.diagnostics_window = ctk.CTkToplevel(self)
+        win.title("Diagnosticare")
+        win.geometry("900x460")
+        top = ctk.CTkFrame(win)
+        top.pack(fill="x", padx=10, pady=(10, 6))
+        self.diag_status = ctk.CTkLabel(top, text="")
+        self.diag_status.pack(side="left", padx=6)
+        self.diag_toggle = ctk.CTkButton(top, text="", width=150, command=self._toggle_tracing)
+        self.diag_toggle.pack(side="right", padx=4)
+        ctk.CTkButton(top, text="Exportă trace JSON", command=self._export_trace).pack(side="right", padx=4)
+        ctk.CTkButton(top, text="Golește", fg_color="#9e9e9e", command=self._clear_trace).pack(side="right", padx=4)
+        ctk.CTkButton(top, text="Reîmprospătează", command=self._fill_diagnostics).pack(side="right", padx=4)
+
+        frame = ctk.CTkFrame(win, fg_color="transparent")
+        frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        cols = ("name", "cat", "count", "total", "mean", "max", "rows")
+        self.diag_tree = ttk.Treeview(frame, columns=cols, show="headings")
+        for col, text, w in [("name", "Etapă / instrucțiune SQL", 380), ("cat", "Tip", 50), ("count", "Apeluri", 70),
+                             ("total", "Total (ms)", 90), ("mean", "Medie (ms)", 90), ("max", "Maxim (ms)", 90), ("rows", "Rânduri", 80)]:
+            self.diag_tree.heading(col, text=text)
+            self.diag_tree.column(col, width=w, anchor="w" if col == "name" else "e")
+        scroll = ttk.Scrollbar(frame, orient="vertical", command=self.diag_tree.yview)
+        self.diag_tree.configure(yscrollcommand=scroll.set)
+        scroll.pack(side="right", fill="y")
+        self.diag_tree.pack(side="left", fill="both", expand=True)
+        self._fill_diagnostics()
+
+    def _fill_diagnostics(self):
+        if not (self.diagnostics_window and self.diagnostics_window.winfo_exists()):
+            return
+        counters = tracer.counter_values()
+        state = "pornite" if tracer.enabled else "oprite (FINANCE_TRACE=1 sau --trace le pornesc la start)"
+        self.diag_status.configure(text=f"Măsurători {state}  ·  " + ", ".join(f"{k}: {v}" for k, v in sorted(counters.items())))
+        self.diag_toggle.configure(text="Oprește măsurătorile" if tracer.enabled else "Pornește măsurătorile")
+        self.diag_tree.delete(*self.diag_tree.get_children())
+        for s in tracer.summary():
+            self.diag_tree.insert("", "end", values=(s["name"], s["cat"], s["count"], f"{s['total_ms']:.2f}",
+                                                     f"{s['mean_ms']:.3f}", f"{s['max_ms']:.2f}", s["rows"] or ""))
+
+    def _toggle_tracing(self):
+        if tracer.enabled:
+            tracer.disable()
+        else:
+            tracer.enable()
+        self._fill_diagnostics()
+
+    def _clear_trace(self):
+        tracer.reset()
+        self._fill_diagnostics()
+
+    def _export_trace(self):
+        fpath = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Trace JSON", "*.json")])
+        if fpath:
+            tracer.write(fpath)
+            messagebox.showinfo("Trace exportat", f"Se deschide în chrome://tracing sau ui.perfetto.dev:\n{fpath}",
+                                parent=self.diagnostics_window)
 
     # -------------------- EXPORT --------------------
     def export_csv(self):
-        fpath = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv")])
+        if self.background_job:
+            messagebox.showwarning("Atenție", "O operație de import/export este deja în curs.")
+            return
+        where, params, bounds = "", [], None
+        count = None
+        if self.period_var.get() != "Toate" or self.category_filter_var.get() != "Toate" or self.search_text:
+            answer = messagebox.askyesnocancel("Export CSV", "Exporți doar tranzacțiile din filtrul curent?\n(Nu = toate tranzacțiile)")
+            if answer is None:
+                return
+            if answer:
+                where, params = self._current_filter()
+                bounds = self._current_bounds()
+                count = self._current_summary()[0]
+        if count is None:
+            count = aggregate_totals()[0]
+        fpath = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv"), ("CSV comprimat (gzip)", "*.csv.gz")])
+        if not fpath:
+            return
+
+        def work(progress, cancel):
+            return finance_io.export_csv(fpath, where, params, progress=progress, cancel=cancel, bounds=bounds)
+
+        def done(written, error):
+            if error:
+                messagebox.showerror("Eroare", f"Exportul a eșuat: {error}")
+            elif written is None:
+                messagebox.showinfo("Export anulat", "Exportul a fost anulat.")
+            else:
+                messagebox.showinfo("Export complet", f"{written} tranzacții au fost exportate în {fpath}")
+
+        self._start_job("Export", work, done, total=count)
+
+    # -------------------- ARCHIVE --------------------
+    def archive_closed_years(self):
+        """ Move the closed years still in the main file into one archive file per year, in the background """
+        if self.background_job:
+            messagebox.showwarning("Atenție", "O operație de import/export este deja în curs.")
+            return
+        years = closed_years()
+        if not years:
+            messagebox.showinfo("Arhivare", "Nu există ani încheiați de arhivat.")
+            return
+        lines = "\n".join(f"{an}: {n} tranzacții" for an, n in years.items())
+        if not messagebox.askyesno("Arhivare", f"Muți acești ani în fișiere separate?\n\n{lines}\n\n"
+                                   "Lista, soldul, rapoartele și exportul îi vor include în continuare."):
+            return
+
+        def work(progress, cancel):
+            moved = 0
+            for an in years:
+                # anul în curs de mutare se termină; anularea oprește doar anii următori
+                if cancel.is_set():
+                    break
+                moved += archive_year(an)
+                progress(moved)
+            return moved
+
+        def done(moved, error):
+            if error:
+                messagebox.showerror("Eroare", f"Arhivarea a eșuat: {error}")
+            else:
+                messagebox.showinfo("Arhivare", f"{moved} tranzacții au fost mutate în fișierele de arhivă.")
+            self.refresh_data(delay=0)
+
+        self._start_job("Arhivare", work, done, total=sum(years.values()))
+
+    # -------------------- BACKUP --------------------
+    def backup_now(self):
+        if self.background_job:
+            messagebox.showwarning("Atenție", "O operație de import/export este deja în curs.")
+            return
+        self._run_backup(auto=False)
+
+    def auto_backup(self):
+        """ Scheduled snapshot: runs when the newest one is older than finance_backup.INTERVAL_HOURS """
+        self.after(BACKUP_CHECK_MS, self.auto_backup)
+        try:
+            due = finance_backup.backup_due()
+        except OSError:
+            return
+        if due and not self.background_job:
+            self._run_backup(auto=True)
+        elif not self.backup_label.cget("text"):
+            last = finance_backup.list_backups()
+            if last:
+                self.backup_label.configure(text=f"Ultimul backup: {datetime.fromtimestamp(last[0]['creat']):%d.%m %H:%M}")
+
+    def _run_backup(self, auto):
+        """ Online snapshot of the database and its archives on a worker thread; the list stays usable meanwhile """
+        total = max(1, finance_backup.backup_size() >> 20)
+
+        def work(progress, cancel):
+            return finance_backup.backup(compress=BACKUP_COMPRESS, progress=lambda b: progress(b >> 20), cancel=cancel)
+
+        def done(m, error):
+            if isinstance(error, finance_backup.BackupCancelled):
+                return
+            if error:
+                self.backup_label.configure(text="Backup eșuat")
+                if not auto:
+                    messagebox.showerror("Eroare", f"Backup-ul a eșuat: {error}")
+                return
+            text = (f"{m['bytes'] / 2**20:.1f} MB copiați în {m['seconds']:.1f} s; interfața a așteptat cel mult "
+                    f"{self.job_stall_ms:.0f} ms")
+            self.backup_label.configure(text=f"Ultimul backup: {datetime.fromtimestamp(m['creat']):%d.%m %H:%M}  ·  "
+                                             f"{m['seconds']:.1f} s  ·  UI ≤ {self.job_stall_ms:.0f} ms")
+            if not auto:
+                messagebox.showinfo("Backup", f"Copia a fost salvată în {m['folder']}\n{text}")
+
+        self._start_job("Backup (MB)", work, done, total=total)
+
+    # -------------------- IMPORT --------------------
+    def import_csv(self):
+        if self.background_job:
+            messagebox.showwarning("Atenție", "O operație de import/export este deja în curs.")
+            return
+        fpath = filedialog.askopenfilename(filetypes=[("CSV", "*.csv *.csv.gz"), ("Toate fișierele", "*.*")])
         if not fpath:
             return
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT data,tip,categorie,suma,descriere FROM tranzactii ORDER BY date(data) DESC")
-        rows = c.fetchall()
-        conn.close()
-        with open(fpath, "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(["Data", "Tip", "Categorie", "Sumă", "Descriere"])
-            w.writerows(rows)
-        messagebox.showinfo("Export complet", f"Datele au fost exportate în {fpath}")
+        mapping = finance_io.DEFAULT_MAPPING
+        try:
+            if not finance_io.has_columns(fpath):
+                # extras bancar: maparea coloanelor vine dintr-un fișier JSON
+                mpath = filedialog.askopenfilename(title="Alege maparea coloanelor (JSON)", filetypes=[("JSON", "*.json")])
+                if not mpath:
+                    return
+                mapping = finance_io.load_mapping(mpath)
+        except Exception as e:
+            messagebox.showerror("Eroare", f"Fișierul nu poate fi citit: {e}")
+            return
+
+        def work(progress, cancel):
+            return finance_io.import_csv(fpath, mapping, progress=lambda stats: progress(stats["read"]), cancel=cancel)
+
+        def done(stats, error):
+            if error:
+                messagebox.showerror("Eroare", f"Importul a eșuat: {error}")
+                return
+            self._on_categories_changed("reload", None, None)
+            self.refresh_data()
+            messagebox.showinfo("Import complet", finance_io.format_import_stats(stats))
+
+        self._start_job("Import", work, done)
 
 # -------------------- RUN --------------------
 if __name__ == "__main__":
-    init_db()
-    app = FinanceApp()
-    app.mainloop()
\ No newline at end of file
+    if "--trace" in sys.argv:
+        # --trace [fișier.json]: pornește măsurătorile; fișierul primește trace-ul la închidere
+        i = sys.argv.index("--trace")
+        tracer.enable(sys.argv[i + 1] if i + 1 < len(sys.argv) and sys.argv[i + 1].endswith(".json") else None)
+    # --startup-time: afișează timpii până la prima afișare și până la lista încărcată, apoi închide aplicația
+    app = FinanceApp(startup_report="--startup-time" in sys.argv)
+    app.mainloop()
+    app.executor.shutdown()
\ No newline at end of file
@@ -0,0 +1,100 @@
+import random
+from datetime import date
+
+import pytest
+
+import finance_analytics as fa
+import finance_db as fdb
+
+TODAY = date(2025, 6, 30)
+
+# -------------------- HELPERS --------------------
+def make_ledger(path):
+    """ A ledger over 18 months with a deleted category """
+    db = fdb.Database(str(path))
+    fdb.init_db(db)
+    rnd = random.Random(7)
+    fdb.add_category("Vacanță", "Cheltuială", db=db)
+    categories = fdb.DEFAULT_CATEGORIES + [("Vacanță", "Cheltuială")]
+    start = date(2024, 1, 1).toordinal()
+    rows = []
+    for _ in range(3000):
+        name, tip = rnd.choice(categories)
+        data = date.fromordinal(start + rnd.randrange(TODAY.toordinal() - start + 1)).isoformat()
+        rows.append((data, tip, name, rnd.randrange(1, 50000) / 100, ""))
+    fdb.bulk_insert(rows, db=db)
+    fdb.delete_category("Vacanță", db=db)
+    return db
+
+@pytest.fixture(params=["numpy", "array"])
+def db(request, tmp_path, monkeypatch):
+    """ The ledger read by the NumPy path and by the array fallback """
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(fa, "np", None)
+    monkeypatch.setattr(fa, "_cache", {})
+    db = make_ledger(tmp_path / "finante.db")
+    yield db
+    db.close()
+
+def months_sql(db):
+    """ {month: (income, expenses)} in bani, grouped by SQL over tranzactii """
+    out = {}
+    for luna, tip, bani in db.fetchall("SELECT substr(data, 1, 7), tip, SUM(CAST(round(suma * 100) AS INTEGER)) "
+                                       "FROM tranzactii GROUP BY 1, 2"):
+        v, c = out.get(luna, (0, 0))
+        out[luna] = (v + bani, c) if tip == "Venit" else (v, c + bani)
+    return out
+
+def categories_sql(db):
+    """ {(category, tip): (bani, rows)} grouped by SQL over tranzactii """
+    return {(name, tip): (bani, n) for name, tip, bani, n in
+            db.fetchall("SELECT categorie, tip, SUM(CAST(round(suma * 100) AS INTEGER)), COUNT(*) FROM tranzactii "
+                        "GROUP BY categorie, tip")}
+
+def months_report(r):
+    return {m["luna"]: (round(m["venituri"] * 100), round(m["cheltuieli"] * 100)) for m in r["luni"] if m["venituri"] or m["cheltuieli"]}
+
+def categories_report(r):
+    return {(c["categorie"], c["tip"]): (round(c["suma"] * 100), c["tranzactii"]) for c in r["categorii"]}
+
+# -------------------- REPORT --------------------
+def test_report_matches_sql_group_by(db):
+    r = fa.build_report(today=TODAY, db=db)
+    assert months_report(r) == months_sql(db)
+    assert categories_report(r) == categories_sql(db)
+    # categoria ștearsă se numără la cea în care a fost mutată
+    assert not any(c["categorie"] == "Vacanță" for c in r["categorii"])
+    r = fa.build_report(start="2025-01-01", end="2025-03-31", today=TODAY, db=db)
+    assert [m["luna"] for m in r["luni"]] == ["2025-01", "2025-02", "2025-03"]
+    assert months_report(r) == {k: v for k, v in months_sql(db).items() if "2025-01" <= k <= "2025-03"}
+
+def test_report_cache_follows_writes(db):
+    first = fa.report(today=TODAY, db=db)
+    assert fa.report(today=TODAY, db=db) is first
+    fdb.insert_transaction("2025-06-15", "Cheltuială", "Mâncare", 123.45, db=db)
+    second = fa.report(today=TODAY, db=db)
+    assert second is not first
+    assert months_report(second)["2025-06"][1] == months_report(first)["2025-06"][1] + 12345
+    assert months_report(second) == months_sql(db)
+    # o scriere din altă conexiune invalidează și ea rezultatul
+    other = fdb.Database(db.path)
+    try:
+        fdb.insert_transaction("2025-06-16", "Venit", "Salariu", 1000, db=other)
+    finally:
+        other.close()
+    third = fa.report(today=TODAY, db=db)
+    assert third is not second and months_report(third) == months_sql(db)
+
+def test_numpy_and_array_paths_agree(tmp_path, monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    db = make_ledger(tmp_path / "finante.db")
+    reports = []
+    try:
+        for np in (numpy, None):
+            monkeypatch.setattr(fa, "np", np)
+            reports.append(fa.build_report(start="2024-03-10", today=TODAY, db=db))
+    finally:
+        db.close()
+    assert reports[0] == reports[1]
@@ -0,0 +1,82 @@
+import hashlib
+import os
+from datetime import date
+
+import pytest
+
+import finance_db as fdb
+from finance_backup import backup, restore, list_backups, PREVIOUS_SUFFIX, RESTORE_SUFFIX
+
+TODAY = date(2025, 6, 30)
+
+# -------------------- HELPERS --------------------
+@pytest.fixture
+def db(tmp_path):
+    db = fdb.Database(str(tmp_path / "finante.db"))
+    fdb.init_db(db)
+    rows = [(date(2021 + i % 5, 1 + i % 12, 1 + i % 28).isoformat(), "Cheltuială" if i % 3 else "Venit",
+             "Mâncare" if i % 3 else "Salariu", i % 500 + 0.25, f"rand {i}") for i in range(5000)]
+    fdb.bulk_insert(rows, db=db)
+    for an in (2021, 2022):
+        fdb.archive_year(an, db=db, today=TODAY)
+    yield db
+    db.close()
+
+def state(db):
+    """ What a restore must bring back: the rows of every file and the summary tables """
+    rows = sorted(db.fetchall("SELECT id, data, tip, categorie, suma, descriere FROM tranzactii"))
+    for an in fdb.archived_years(db):
+        rows += sorted(db.fetchall(f"SELECT id, data, tip, categorie, suma, descriere FROM {fdb.attach_partition(db, an)}_tranzactii"))
+    tables = {t: sorted(db.fetchall(f"SELECT * FROM {t}")) for t in fdb.AGGREGATE_TABLES}
+    return rows, tables
+
+def digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+# -------------------- BACKUP / RESTORE --------------------
+@pytest.mark.parametrize("compress", [False, True])
+def test_restore_brings_back_the_snapshot_taken_during_a_write(db, compress):
+    before = state(db)
+    writes = []
+
+    def progress(done):
+        # o scriere pe conexiunea principală în timpul copierii: nu intră în snapshot
+        if not writes:
+            writes.append(fdb.insert_transaction("2025-03-03", "Venit", "Salariu", 42, "în timpul copiei", db=db))
+
+    m = backup(compress=compress, db=db, step_pages=2, pause=0, progress=progress)
+    assert writes and m["steps"] > 1
+    assert set(m["fisiere"]) == {"finante.db", "finante_2021.db", "finante_2022.db"}
+    assert [s["folder"] for s in list_backups(db=db)] == [m["folder"]]
+    assert state(db) != before
+
+    path = db.path
+    restored = restore(m["folder"], path, db=db)
+    assert sorted(os.path.basename(p) for p in restored) == sorted(m["fisiere"])
+    db2 = fdb.Database(path)
+    try:
+        assert state(db2) == before
+        assert fdb.verify_aggregates(db2) == []
+    finally:
+        db2.close()
+    # fișierele de dinainte rămân lângă cele restaurate
+    assert os.path.exists(path + PREVIOUS_SUFFIX)
+
+def test_restore_from_a_damaged_snapshot_changes_nothing(db):
+    m = backup(db=db, pause=0)
+    live = [db.path] + list(fdb.archived_years(db).values())
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    before = {path: digest(path) for path in live}
+    # arhiva 2022 se copiază după fișierul principal: restaurarea a pregătit deja o parte din fișiere
+    damaged = os.path.join(m["folder"], "finante_2022.db")
+    with open(damaged, "r+b") as f:
+        f.seek(4096)
+        f.write(b"\xff" * 8192)
+    with pytest.raises(ValueError, match="finante_2022.db"):
+        restore(m["folder"], db.path, db=db)
+    assert {path: digest(path) for path in live} == before
+    leftovers = [name for name in os.listdir(os.path.dirname(db.path)) if name.endswith((RESTORE_SUFFIX, PREVIOUS_SUFFIX))]
+    assert leftovers == []
+    # conexiunea nu a fost închisă și fișierul merge mai departe
+    assert fdb.verify_aggregates(db) == []
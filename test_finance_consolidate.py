@@ -0,0 +1,98 @@
+import random
+from datetime import date
+
+import pytest
+
+import finance_db as fdb
+from finance_core import filter_totals
+from finance_consolidate import _open, consolidate, consolidated_page
+
+TODAY = date(2025, 6, 30)
+DAYS = [date(2023, 12, 31), date(2024, 1, 1), date(2024, 7, 15), date(2025, 2, 28), date(2025, 3, 1)]
+
+# -------------------- HELPERS --------------------
+def make_ledger(path, n, seed):
+    """ A ledger whose rows fall on a few days shared with the other ledgers, so the merged list has ties """
+    rnd = random.Random(seed)
+    db = fdb.Database(str(path))
+    fdb.init_db(db)
+    rows = []
+    for _ in range(n):
+        name, tip = rnd.choice(fdb.DEFAULT_CATEGORIES)
+        rows.append((rnd.choice(DAYS).isoformat(), tip, name, rnd.randrange(1, 100000) / 100, rnd.choice(["lidl", "chirie", ""])))
+    fdb.bulk_insert(rows, db=db)
+    if seed == 1:
+        fdb.archive_year(2023, db=db, today=TODAY)
+    db.close()
+    return str(path)
+
+@pytest.fixture
+def ledgers(tmp_path):
+    return [make_ledger(tmp_path / "ana.db", 300, 1), make_ledger(tmp_path / "firma.db", 200, 2)]
+
+def all_rows(path):
+    """ Every (id, data, tip, categorie, suma, descriere) row of a ledger, archives included """
+    db = fdb.Database(path)
+    try:
+        rows = db.fetchall("SELECT id, data, tip, categorie, suma, descriere FROM tranzactii")
+        for an in fdb.archived_years(db):
+            rows += db.fetchall(f"SELECT id, data, tip, categorie, suma, descriere FROM {fdb.attach_partition(db, an)}_tranzactii")
+    finally:
+        db.close()
+    return rows
+
+# -------------------- CONSOLIDATION --------------------
+@pytest.mark.parametrize("search", ["", "lidl"])
+def test_consolidated_totals_add_up_the_ledgers(ledgers, search):
+    total = consolidate(ledgers, search=search, today=TODAY, workers=1)
+    count = venit = chelt = 0
+    for path, part in zip(ledgers, total["registre"]):
+        db = fdb.Database(path, readonly=True)
+        try:
+            n, v, c = filter_totals(search=search, today=TODAY, db=db)
+        finally:
+            db.close()
+        assert (part["tranzactii"], part["venituri"], part["cheltuieli"]) == (n, pytest.approx(v), pytest.approx(c))
+        count, venit, chelt = count + n, venit + v, chelt + c
+    assert total["tranzactii"] == count
+    assert total["venituri"] == pytest.approx(venit) and total["cheltuieli"] == pytest.approx(chelt)
+    assert total["balanta"] == pytest.approx(venit - chelt)
+    rows = all_rows(ledgers[0]) + all_rows(ledgers[1])
+    assert sum(n for n, _, _ in total["categorii"].values()) == len(rows)
+
+@pytest.mark.parametrize("limit", [1, 7, 100])
+def test_consolidated_pages_follow_the_merged_listing(ledgers, limit):
+    expected = sorted(((i,) + tuple(r) for i, path in enumerate(ledgers) for r in all_rows(path)),
+                      key=lambda r: (-date.fromisoformat(r[2]).toordinal(), r[0], -r[1]))
+    pages, key = [], None
+    # o cheie greșită ar relua aceleași rânduri la nesfârșit: cel mult câte o pagină pe rând
+    for _ in range(len(expected) + 1):
+        page = consolidated_page(ledgers, today=TODAY, key=key, limit=limit, workers=1)
+        assert len(page) <= limit
+        if not page:
+            break
+        pages += page
+        key = page[-1]
+    assert pages == expected
+
+def test_open_rejects_archives_and_old_ledgers(ledgers, tmp_path, monkeypatch):
+    db = fdb.Database(ledgers[0])
+    archive = fdb.archived_years(db)[2023]
+    db.close()
+    with pytest.raises(ValueError, match="nu este un registru"):
+        _open(archive)
+    with monkeypatch.context() as m:
+        m.setattr(fdb, "MIGRATIONS", fdb.MIGRATIONS[:-1])
+        m.setattr(fdb, "SCHEMA_VERSION", fdb.SCHEMA_VERSION - 1)
+        old = str(tmp_path / "vechi.db")
+        db = fdb.Database(old)
+        fdb.init_db(db)
+        db.close()
+    with pytest.raises(ValueError, match=f"schema v{fdb.SCHEMA_VERSION - 1}"):
+        _open(old)
+    with pytest.raises(ValueError):
+        consolidate(ledgers + [old], today=TODAY, workers=1)
+    # consolidarea nu actualizează registrul altcuiva
+    db = fdb.Database(old, readonly=True)
+    assert db.fetchone("PRAGMA user_version")[0] == fdb.SCHEMA_VERSION - 1
+    db.close()
@@ -0,0 +1,353 @@
+import csv
+import random
+import sqlite3
+from collections import Counter
+from contextlib import closing
+from datetime import date
+
+import pytest
+
+import finance_db as fdb
+from finance_core import build_filter, filter_bounds, fetch_page, seek_key, text_matches, SORT_COLUMNS
+from finance_io import import_csv
+
+TODAY = date(2025, 6, 30)
+WORDS = ["Lidl", "lidl", "Kaufland", "farmacie", "Farmacie", "chirie", "Șofer", "abonament", "", "zzz"]
+
+# -------------------- HELPERS --------------------
+def make_rows(n, seed=1):
+    """ (data, tip, categorie, suma, descriere) rows over 2021-2025 with repeated dates, amounts and descriptions """
+    rnd = random.Random(seed)
+    start = date(2021, 1, 1).toordinal()
+    rows = []
+    for _ in range(n):
+        name, tip = rnd.choice(fdb.DEFAULT_CATEGORIES)
+        data = date.fromordinal(start + rnd.randrange(date(2025, 6, 30).toordinal() - start)).isoformat()
+        rows.append((data, tip, name, rnd.choice([1, 12.5, 99.99, rnd.randrange(1, 5000) / 4]), rnd.choice(WORDS)))
+    return rows
+
+@pytest.fixture
+def db(tmp_path):
+    db = fdb.Database(str(tmp_path / "finante.db"))
+    fdb.init_db(db)
+    yield db
+    db.close()
+
+def operations(db):
+    """ Every (id, zi, tip, categorie_id, bani, descriere) row of the main file and the archives, read directly """
+    files = [db.path] + list(fdb.archived_years(db).values())
+    out = []
+    for path in files:
+        with closing(sqlite3.connect(path)) as c:
+            out += c.execute("SELECT id, zi, tip, categorie_id, bani, descriere FROM operatiuni").fetchall()
+    return out
+
+def listing(db):
+    """ The tranzactii rows as (id, data, tip, categorie, suma, descriere), computed in Python """
+    names, moved = {}, {}
+    for cid, name, target in db.fetchall("SELECT id, nume, mutata_in FROM categorii"):
+        names[cid], moved[cid] = name, target
+    return [(tid, date.fromordinal(zi).isoformat(), fdb.TIP_NAMES[tip], names[moved[cid] or cid], bani / 100, text)
+            for tid, zi, tip, cid, bani, text in operations(db)]
+
+def assert_aggregates(db):
+    """ The summary tables hold exactly the sums and counts of the rows, grouped in Python """
+    expected = {table: {} for table in fdb.AGGREGATE_TABLES}
+    for _, zi, tip, cid, bani, _ in operations(db):
+        d = date.fromordinal(zi)
+        for table, key in (("agregat_zi", (zi, cid, tip)), ("agregat_luna", (d.year * 100 + d.month, cid, tip)),
+                           ("agregat_categorie", (cid, tip))):
+            b, n = expected[table].get(key, (0, 0))
+            expected[table][key] = (b + bani, n + 1)
+    for table, groups in expected.items():
+        cols = ", ".join(fdb._bucket_columns(table))
+        actual = {r[:-2]: r[-2:] for r in db.fetchall(f"SELECT {cols}, bani, nr FROM {table}")}
+        assert actual == groups, table
+    assert fdb.verify_aggregates(db) == []
+
+def fold(text):
+    # COLLATE NOCASE: doar literele ASCII
+    return "".join(ch.lower() if ch.isascii() else ch for ch in text)
+
+def ordered(rows, sort):
+    column, descending = sort
+    value = {"data": lambda r: (), "tip": lambda r: (fdb.tip_code(r[2]),), "categorie": lambda r: (r[3],),
+             "suma": lambda r: (round(r[4] * 100),), "descriere": lambda r: (fold(r[5]),)}[column]
+    return sorted(rows, key=lambda r: value(r) + (fdb.day_number(r[1]), r[0]), reverse=descending)
+
+# -------------------- MIGRATIONS --------------------
+def test_migrate_baseline_file(tmp_path):
+    path = str(tmp_path / "vechi.db")
+    with closing(sqlite3.connect(path)) as c:
+        # structura fișierelor create de versiunea inițială a aplicației
+        c.execute("CREATE TABLE tranzactii (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT, tip TEXT, categorie TEXT, suma REAL, descriere TEXT)")
+        c.execute("CREATE TABLE categorii (id INTEGER PRIMARY KEY AUTOINCREMENT, nume TEXT UNIQUE, tip TEXT)")
+        c.executemany("INSERT INTO categorii (nume, tip) VALUES (?,?)", [("Salariu", "Venit"), ("Mâncare", "Cheltuială")])
+        c.executemany("INSERT INTO tranzactii (data, tip, categorie, suma, descriere) VALUES (?,?,?,?,?)", [
+            ("2024-01-05", "Venit", "Salariu", 5000.5, "ianuarie"),
+            ("2024-01-06", "Cheltuială", "Mâncare", 12.34, None),
+            ("2024-02-01", "Cheltuială", "Benzină", 200.1, "categorie lipsă din tabel"),
+            ("ieri", "Cheltuială", "Mâncare", 3, "dată ilizibilă"),
+            ("2024-03-01", "Cheltuială", "Mâncare", 1, "ștearsă înainte de migrare"),
+        ])
+        c.execute("DELETE FROM tranzactii WHERE id = 5")
+        c.commit()
+    db = fdb.Database(path)
+    try:
+        fdb.init_db(db)
+        assert db.fetchone("PRAGMA user_version")[0] == fdb.SCHEMA_VERSION
+        assert db.fetchall("SELECT id, data, tip, categorie, suma, descriere FROM tranzactii ORDER BY id") == [
+            (1, "2024-01-05", "Venit", "Salariu", 5000.5, "ianuarie"),
+            (2, "2024-01-06", "Cheltuială", "Mâncare", 12.34, ""),
+            (3, "2024-02-01", "Cheltuială", "Benzină", 200.1, "categorie lipsă din tabel"),
+        ]
+        assert db.fetchall("SELECT id, data, descriere FROM tranzactii_invalide") == [(4, "ieri", "dată ilizibilă")]
+        names = set(fdb.get_categories(db=db))
+        assert {"Benzină", fdb.OTHER_CATEGORY} | {name for name, _ in fdb.DEFAULT_CATEGORIES} <= names
+        assert_aggregates(db)
+        # id-urile continuă după cel mai mare id folosit vreodată
+        assert fdb.insert_transaction("2024-04-01", "Venit", "Salariu", 1, db=db) == 6
+        # o categorie implicită ștearsă nu revine la următoarea pornire
+        fdb.delete_category("Salariu", db=db)
+        fdb.init_db(db)
+        assert "Salariu" not in fdb.get_categories(db=db)
+    finally:
+        db.close()
+
+def test_migrate_is_idempotent(db):
+    assert fdb.migrate(db) == fdb.SCHEMA_VERSION
+    assert db.fetchone("PRAGMA user_version")[0] == fdb.SCHEMA_VERSION
+
+# -------------------- AGGREGATES --------------------
+def test_aggregates_follow_every_change(db):
+    fdb.bulk_insert(make_rows(3000), db=db)
+    assert_aggregates(db)
+    # al doilea lot cade peste aceleași zile / luni / categorii
+    fdb.bulk_insert(make_rows(500, seed=5), db=db)
+    assert_aggregates(db)
+    tid = fdb.insert_transaction("2023-05-05", "Cheltuială", "Categorie nouă", 10.01, "x", db=db)
+    assert_aggregates(db)
+    fdb.update_transaction(tid, "2024-02-29", "Mâncare", 7.5, "y", db=db)
+    assert_aggregates(db)
+    ids = [r[0] for r in db.fetchall("SELECT id FROM operatiuni WHERE id % 7 = 0")]
+    lot = fdb.delete_transactions(ids, db=db)
+    assert_aggregates(db)
+    fdb.undo_delete(lot, db=db)
+    assert_aggregates(db)
+    fdb.delete_category("Mâncare", db=db)
+    assert_aggregates(db)
+    for an in fdb.closed_years(db, TODAY):
+        fdb.archive_year(an, db=db, today=TODAY)
+    assert fdb.archived_years(db)
+    assert_aggregates(db)
+    # rânduri arhivate modificate / șterse se întorc întâi în fișierul principal
+    old = [r[0] for r in listing(db) if r[1] < "2022-01-01"][:50]
+    fdb.undo_delete(fdb.delete_transactions(old, db=db), db=db)
+    assert_aggregates(db)
+    fdb.unarchive_year(2021, db=db)
+    assert_aggregates(db)
+    count, venit, chelt = fdb.aggregate_totals(db=db)
+    rows = listing(db)
+    assert count == len(rows)
+    assert round(venit * 100) == sum(round(r[4] * 100) for r in rows if r[2] == "Venit")
+    assert round(chelt * 100) == sum(round(r[4] * 100) for r in rows if r[2] != "Venit")
+
+# -------------------- DELETE / UNDO --------------------
+def journal(db):
+    """ {batch: rows in jurnal_stergeri}, checked against the counts in loturi_sterse """
+    batches = dict(db.fetchall("SELECT lot, nr FROM loturi_sterse"))
+    assert dict(db.fetchall("SELECT lot, COUNT(*) FROM jurnal_stergeri GROUP BY lot")) == batches
+    return batches
+
+def test_undo_restores_rows_totals_and_search(db):
+    fdb.bulk_insert(make_rows(2000, seed=10), db=db)
+    fdb.archive_year(2021, db=db, today=TODAY)
+    before = sorted(listing(db))
+    lidl = [r for r in before if r[5].lower() == "lidl"]
+    # al doilea lot conține și rânduri din anul arhivat
+    fifth = [r for r in before if r[0] % 5 == 0 and r not in lidl]
+    assert any(r[1] < "2022-01-01" for r in fifth)
+    first = fdb.delete_transactions([r[0] for r in lidl], db=db)
+    second = fdb.delete_transactions([r[0] for r in fifth], db=db)
+    assert fdb.delete_transactions([10 ** 9], db=db) is None
+    assert fdb.last_deleted(db=db) == (second, journal(db)[second])
+    assert searched(db, "lidl") == []
+    assert_aggregates(db)
+    assert_search(db, SEARCHES)
+    # lotul mai vechi se poate anula înaintea celui nou
+    restored = fdb.undo_delete(first, db=db)
+    assert sorted(restored) == lidl
+    assert list(journal(db)) == [second]
+    assert_aggregates(db)
+    assert_search(db, SEARCHES)
+    assert sorted(fdb.undo_delete(db=db)) == fifth
+    assert journal(db) == {} and fdb.last_deleted(db=db) is None and fdb.undo_delete(db=db) == []
+    assert sorted(listing(db)) == before
+    assert_aggregates(db)
+    assert_search(db, SEARCHES)
+
+def test_undo_journal_is_trimmed(db, monkeypatch):
+    monkeypatch.setattr(fdb, "UNDO_MAX_ROWS", 50)
+    fdb.bulk_insert(make_rows(500, seed=11), db=db)
+    ids = iter(sorted(r[0] for r in listing(db)))
+    lots = [fdb.delete_transactions([next(ids) for _ in range(20)], db=db) for _ in range(4)]
+    # cele mai noi loturi până la UNDO_MAX_ROWS rânduri; primul care trece de limită iese cu tot ce e mai vechi
+    assert journal(db) == {lots[3]: 20, lots[2]: 20}
+    assert fdb.undo_delete(lots[0], db=db) == []
+    # loturile mai vechi de UNDO_MAX_AGE_DAYS zile ies și sub limita de rânduri
+    db.execute("UPDATE loturi_sterse SET sters_la = sters_la - ?", ((fdb.UNDO_MAX_AGE_DAYS + 1) * 86400,))
+    last = fdb.delete_transactions([next(ids)], db=db)
+    assert journal(db) == {last: 1}
+    # lotul cel mai nou rămâne chiar dacă singur trece de limită
+    big = fdb.delete_transactions([next(ids) for _ in range(60)], db=db)
+    assert journal(db) == {big: 60}
+    assert len(listing(db)) == 500 - 80 - 60 - 1
+    assert_aggregates(db)
+    assert_search(db, SEARCHES)
+
+# -------------------- KEYSET PAGES --------------------
+@pytest.mark.parametrize("archived", [False, True])
+@pytest.mark.parametrize("sort", [(column, desc) for column in SORT_COLUMNS for desc in (True, False)])
+def test_pages_match_sorted_listing(db, sort, archived):
+    fdb.bulk_insert(make_rows(1500, seed=2), db=db)
+    if archived:
+        for an in fdb.closed_years(db, TODAY):
+            fdb.archive_year(an, db=db, today=TODAY)
+    filters = [("Toate", "Toate", None, None), ("Custom", "Toate", date(2022, 3, 1), date(2024, 8, 31)),
+               ("Toate", "Mâncare", None, None)]
+    for period, category, start, end in filters:
+        where, params = build_filter(period, category, start, end, TODAY, db=db)
+        bounds = filter_bounds(period, start, end, TODAY)
+        expected = [r for r in listing(db) if (category == "Toate" or r[3] == category)
+                    and (start is None or start.isoformat() <= r[1] <= end.isoformat())]
+        expected = ordered(expected, sort)
+        # înainte, pagină cu pagină de la ultima cheie
+        pages, key = [], None
+        while True:
+            page = fetch_page(where, params, key, "after", 37, db=db, bounds=bounds, sort=sort)
+            if not page:
+                break
+            pages += page
+            key = page[-1]
+        assert pages == expected, (period, category)
+        # înapoi, de la ultimul rând
+        pages, key = [], expected[-1]
+        while True:
+            page = fetch_page(where, params, key, "before", 41, db=db, bounds=bounds, sort=sort)
+            if not page:
+                break
+            pages = page + pages
+            key = page[0]
+        assert pages == expected[:-1]
+        # salturi: seek_key găsește rândul de la o poziție
+        for offset in (1, 36, len(expected) // 2, len(expected) - 1):
+            key = seek_key(where, params, offset, bounds, db=db, sort=sort)
+            assert key == expected[offset]
+            assert fetch_page(where, params, key, "from", 5, db=db, bounds=bounds, sort=sort) == expected[offset:offset + 5]
+
+def test_merged_rows_offset_and_limit(db):
+    fdb.bulk_insert(make_rows(800, seed=3), db=db)
+    for an in fdb.closed_years(db, TODAY):
+        fdb.archive_year(an, db=db, today=TODAY)
+    expected = [(round(r[4] * 100), fdb.day_number(r[1]), r[0]) for r in ordered(listing(db), ("suma", False))]
+    for offset, limit in ((0, None), (0, 10), (123, 50), (790, 50)):
+        rows = list(fdb.merged_rows("bani, zi, id", "bani", None, order="ASC", limit=limit, offset=offset, db=db))
+        assert rows == expected[offset:None if limit is None else offset + limit]
+
+# -------------------- SEARCH --------------------
+def indexed(db, word):
+    return sorted(r[0] for r in db.fetchall("SELECT rowid FROM cautare WHERE cautare MATCH ?", (word,)))
+
+def test_bulk_insert_fills_the_search_index(db):
+    fdb.insert_transaction("2024-01-01", "Cheltuială", "Mâncare", 1, "Lidl", db=db)
+    fdb.bulk_insert(make_rows(600, seed=6), db=db)
+    fdb.bulk_insert(make_rows(600, seed=7), db=db)
+    rows = listing(db)
+    for word in ("lidl", "farmacie", "sofer"):
+        assert indexed(db, word) == sorted(r[0] for r in rows if fdb.fold_text(r[5]) == word)
+    assert db.fetchone("SELECT COUNT(*) FROM cautare_pauza")[0] == 0
+
+def searched(db, text, scan_min=fdb.SEARCH_SCAN_MIN):
+    clause, params = fdb.search_clause(text, db=db, scan_min=scan_min)
+    return sorted(r[0] for r in db.fetchall(f"SELECT id FROM tranzactii WHERE {clause}", params))
+
+def assert_search(db, texts):
+    """ search_clause (both query plans) finds exactly the rows of tranzactii text_matches accepts """
+    rows = db.fetchall("SELECT id, data, tip, categorie, suma, descriere FROM tranzactii")
+    for text in texts:
+        expected = sorted(r[0] for r in rows if text_matches(r, text))
+        assert searched(db, text) == expected, text
+        assert searched(db, text, scan_min=0) == expected, text
+
+SEARCHES = ["lidl", "LIDL", "farm", "sofer", "Șof", "mancare", "salar", "lidl mânc", "foo", "bar", "foo_bar", "zzz nimic"]
+
+def test_search_matches_python_twin(db):
+    fdb.bulk_insert(make_rows(800, seed=8), db=db)
+    for text in ("foo_bar", "Plată LIDL_cârd", "farmacia-tei"):
+        fdb.insert_transaction("2024-06-01", "Cheltuială", "Mâncare", 3, text, db=db)
+    assert_search(db, SEARCHES)
+    rows = listing(db)
+    # fără diacritice, prefix, numele categoriei și "_" ca separator, ca tokenizer-ul unicode61
+    assert {r[5] for r in rows if r[0] in searched(db, "sofer")} == {"Șofer"}
+    assert {r[5] for r in rows if r[0] in searched(db, "farm")} == {"farmacie", "Farmacie", "farmacia-tei"}
+    assert {r[3] for r in rows if r[0] in searched(db, "mancare")} == {"Mâncare"}
+    assert {r[5] for r in rows if r[0] in searched(db, "bar")} == {"foo_bar"}
+    assert {r[5] for r in rows if r[0] in searched(db, "card")} == {"Plată LIDL_cârd"}
+
+def test_search_index_follows_edit_delete_undo(db):
+    fdb.bulk_insert(make_rows(300, seed=9), db=db)
+    tid = fdb.insert_transaction("2024-06-01", "Cheltuială", "Mâncare", 3, "chirie iunie", db=db)
+    # save_edit scrie prin update_transaction
+    fdb.update_transaction(tid, "2024-06-02", "Transport", 3, "bilet tren", db=db)
+    assert tid in searched(db, "tren") and tid not in searched(db, "iunie")
+    ids = [r[0] for r in listing(db) if "lidl" in r[5].lower()] + [tid]
+    lot = fdb.delete_transactions(ids, db=db)
+    assert searched(db, "lidl") == [] and searched(db, "tren") == []
+    assert_search(db, SEARCHES + ["tren"])
+    fdb.undo_delete(lot, db=db)
+    assert tid in searched(db, "tren")
+    assert sorted(ids) == sorted(set(searched(db, "lidl")) | {tid})
+    assert_search(db, SEARCHES + ["tren", "iunie"])
+
+# -------------------- IMPORT --------------------
+def test_import_dedup_counts_identical_rows(db, tmp_path):
+    fdb.bulk_insert(make_rows(400, seed=4), db=db)
+    fdb.insert_transaction("2022-05-05", "Cheltuială", "Mâncare", 12.5, "lidl", db=db)
+    for an in fdb.closed_years(db, TODAY):
+        fdb.archive_year(an, db=db, today=TODAY)
+    before = Counter(r[1:] for r in listing(db))
+    # rândul din baza de date apare de trei ori în fișier: două copii sunt noi, una există deja (în arhiva 2022)
+    rows = [("2022-05-05", "Cheltuială", "Mâncare", "12.50", "lidl")] * 3 + [
+        ("2025-01-02", "Venit", "Bursă", "300", "categorie nouă"),
+        ("2025-01-02", "Cheltuială", "Mâncare", "12.5", "lidl")]
+    path = tmp_path / "extras.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Data", "Tip", "Categorie", "Sumă", "Descriere"])
+        w.writerows(rows)
+    stats = import_csv(str(path), db=db, batch_size=2)
+    assert (stats["inserted"], stats["duplicates"], stats["categories"]) == (4, 1, 1)
+    added = Counter((d, tip, cat, float(suma), text) for d, tip, cat, suma, text in rows)
+    added[("2022-05-05", "Cheltuială", "Mâncare", 12.5, "lidl")] -= 1
+    assert Counter(r[1:] for r in listing(db)) == before + added
+    # a doua oară fișierul întreg e deja în baza de date
+    stats = import_csv(str(path), db=db)
+    assert (stats["inserted"], stats["duplicates"]) == (0, 5)
+    assert_aggregates(db)
+
+def test_import_skips_non_finite_amounts(db, tmp_path):
+    path = tmp_path / "extras.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Data", "Tip", "Categorie", "Sumă", "Descriere"])
+        w.writerows([("2024-01-01", "Venit", "Salariu", "100", "bun"),
+                     ("2024-01-02", "Cheltuială", "Mâncare", "nan", "rău"),
+                     ("2024-01-03", "Cheltuială", "Mâncare", "inf", "rău"),
+                     ("2024-01-04", "Cheltuială", "Mâncare", "1e400", "rău"),
+                     ("2024-01-05", "Cheltuială", "Mâncare", "7.25", "bun")])
+    stats = import_csv(str(path), db=db)
+    assert (stats["inserted"], stats["invalid"]) == (2, 3)
+    assert [e.split(":")[0] for e in stats["errors"]] == ["linia 3", "linia 4", "linia 5"]
+    assert sorted(r[1:] for r in listing(db)) == [("2024-01-01", "Venit", "Salariu", 100.0, "bun"),
+                                                  ("2024-01-05", "Cheltuială", "Mâncare", 7.25, "bun")]
+    assert_aggregates(db)